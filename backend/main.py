@@ -60,6 +60,7 @@ try:
     from sherlock_project.sherlock import sherlock, SherlockFuturesSession
     from sherlock_project.result import QueryStatus
     from sherlock_project.sites import SitesInformation
+    from sherlock_project.cache import ResourceCache
     from sherlock_project.notify import QueryNotify
     SHERLOCK_AVAILABLE = True
     print("Sherlock module loaded successfully.")
@@ -475,8 +476,8 @@ async def perform_security_scan(scan_id: int, target_url: str, scan_type: str, d
         username = extract_username(target_url)
 
         # Initialize Sherlock
-        sites = SitesInformation()
-        site_data = {site.name: site.information for site in sites}
+        sites = SitesInformation(cache=ResourceCache())
+        site_data = sites.select()
         total_sites = len(site_data)
 
         # Create a custom notifier to send updates over WebSocket
@@ -487,11 +488,12 @@ async def perform_security_scan(scan_id: int, target_url: str, scan_type: str, d
             username,
             site_data,
             query_notify,
-            timeout=settings.sherlock_timeout
+            timeout=settings.sherlock_timeout,
+            keep_response_text=False
         )
 
         # Calculate security score
-        claimed_count = sum(1 for r in results.values() if r["status"].status == QueryStatus.CLAIMED)
+        claimed_count = sum(1 for r in results.values() if r.status == QueryStatus.CLAIMED)
         total_count = len(results)
         security_score = 100 - (claimed_count / total_count * 100) if total_count > 0 else 100
 
@@ -499,7 +501,7 @@ async def perform_security_scan(scan_id: int, target_url: str, scan_type: str, d
         scan.status = "completed"
         scan.completed_at = datetime.utcnow()
         scan.security_score = security_score
-        scan.findings = json.dumps({k: {"url_user": v["url_user"], "status": str(v["status"].status)} for k, v in results.items()})
+        scan.findings = json.dumps({k: {"url_user": v.site_url_user, "status": str(v.status)} for k, v in results.items()})
         db.commit()
 
         # Send completion notification
@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# This module measures how long it takes to import Sherlock, and how long
+# "sherlock --version" takes, so that cold starts stay cheap. It exits with an
+# error when the import takes longer than the given budget.
+import argparse
+import subprocess
+import sys
+import time
+
+# Modules which only some features need, and which must be imported lazily.
+LAZY_MODULES = ["pandas", "numpy", "openpyxl", "pyarrow", "stem", "webbrowser"]
+
+
+def import_times(module: str) -> list[tuple[str, int, int]]:
+    """Import the module in a fresh interpreter, and return its -X importtime
+    report as (name, self_us, cumulative_us) tuples."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, check=True,
+    )
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if self_us.strip().isdigit():
+            times.append((name.strip(), int(self_us), int(cumulative_us)))
+    return times
+
+
+def version_time() -> float:
+    """Wall time in seconds of `python -m sherlock_project --version`."""
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "sherlock_project", "--version"],
+        capture_output=True, check=True,
+    )
+    return time.perf_counter() - start
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Measure how long importing Sherlock takes.")
+    parser.add_argument("--module", default="sherlock_project.sherlock",
+                        help="Module to import (default: sherlock_project.sherlock)")
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="Fail if importing the module takes longer than this")
+    parser.add_argument("--top", type=int, default=10,
+                        help="Number of slowest imports to list")
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total_ms = next(cumulative for name, _, cumulative in times if name == args.module) / 1000
+    loaded = {name for name, _, _ in times}
+
+    print(f"import {args.module}: {total_ms:.1f} ms")
+    for name, _, cumulative in sorted(times, key=lambda t: t[2], reverse=True)[1:args.top + 1]:
+        print(f"  {cumulative / 1000:8.1f} ms  {name}")
+    print(f"sherlock --version: {version_time() * 1000:.1f} ms (including interpreter start-up)")
+
+    failed = False
+    eager = sorted(loaded.intersection(LAZY_MODULES))
+    if eager:
+        print(f"ERROR: imported eagerly: {', '.join(eager)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"ERROR: over the budget of {args.budget_ms:.0f} ms")
+        failed = True
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -10,7 +10,13 @@ networks.
 import sys
 
 
-if __name__ == "__main__":
+def main() -> None:
+    """Command line entry point.
+
+    Answers "--version" without importing the rest of Sherlock (and its
+    dependencies), and hands everything else over to sherlock.main().
+    """
+
     # Check if the user is using the correct version of Python
     python_version = sys.version.split()[0]
 
@@ -18,5 +24,14 @@ if __name__ == "__main__":
         print(f"Sherlock requires Python 3.9+\nYou are using Python {python_version}, which is not supported by Sherlock.")
         sys.exit(1)
 
+    if sys.argv[1:] == ["--version"]:
+        from sherlock_project import __shortname__, __version__
+        print(f"{__shortname__} v{__version__}")
+        return
+
     from sherlock_project import sherlock
     sherlock.main()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Sherlock Bandwidth Module
+
+This module supports accounting for the bytes transferred by queries, and
+keeping a run within a bytes budget.
+"""
+import csv
+from threading import Lock
+
+
+# Assumed cost (in bytes) of a probe before any probe of the same kind has
+# been measured.  Bodies are only downloaded by non-HEAD requests.
+DEFAULT_ESTIMATES = {"HEAD": 1_000, "GET": 50_000}
+
+# Detection methods which only need the status line and headers of a response.
+HEADER_ERROR_TYPES = ("status_code", "location", "content_length", "header")
+
+
+def measure(response):
+    """Measure Response.
+
+    Keyword Arguments:
+    response               -- Response object whose content has been read.
+                              Responses of followed redirects are included.
+
+    Return Value:
+    Tuple of the number of bytes sent, the number of bytes received over the
+    wire (compressed) and the number of bytes received once decompressed.
+    Status lines and headers are counted in all three, as an approximation
+    of their size on the wire.
+    """
+
+    sent = received = decoded = 0
+    for hop in list(response.history) + [response]:
+        request = hop.request
+        if request is not None:
+            sent += len(request.method) + len(request.path_url) + 12
+            sent += sum(len(k) + len(v) + 4 for k, v in request.headers.items()) + 2
+            body = request.body
+            if body is not None:
+                sent += len(body)
+
+        head = 17 + sum(len(k) + len(v) + 4 for k, v in hop.headers.items()) + 2
+        content = len(hop.content or b"")
+        try:
+            wire = hop.raw.tell()
+        except Exception:
+            wire = content
+        received += head + wire
+        decoded += head + content
+
+    return sent, received, decoded
+
+
+def probe_method(net_info):
+    """Get Probe Method.
+
+    Keyword Arguments:
+    net_info               -- Dictionary containing the site data.
+
+    Return Value:
+    String indicating the HTTP method used to probe the site.
+    """
+
+    if net_info.get("request_method") is not None:
+        return net_info["request_method"]
+    error_type = net_info.get("errorType")
+    if isinstance(error_type, str):
+        error_type = [error_type]
+    if error_type and all(errtype in HEADER_ERROR_TYPES for errtype in error_type):
+        return "HEAD"
+    return "GET"
+
+
+class BandwidthMeter:
+    """Bandwidth Meter Object.
+
+    Counts the bytes transferred by each site's probes and, optionally,
+    keeps the whole run within a budget.  Before each probe, its cost is
+    estimated from earlier probes of the same site (or of the same method)
+    and reserved.  Probes which would overrun the budget are refused.  Once
+    the soft limit is reached, probes which are more expensive than average
+    are refused as well, so that the rest of the budget covers as many sites
+    as possible.
+    """
+
+    def __init__(self, max_bytes=None, soft_limit=0.9):
+        """Create Bandwidth Meter Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        max_bytes              -- Integer indicating the budget in bytes (sent
+                                  and received over the wire).
+                                  Default of None for no budget.
+        soft_limit             -- Fraction of the budget after which only
+                                  cheaper than average probes are allowed.
+                                  Default of 0.9.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.max_bytes = max_bytes
+        self.soft_limit = soft_limit
+
+        # site name -> [probes, sent, received, decoded]
+        self.sites = {}
+        # method -> [probes, bytes]
+        self._methods = {}
+        self.spent = 0
+        self.reserved = 0
+        self.refused = 0
+
+        self._lock = Lock()
+
+        return
+
+    def estimate(self, site_name, net_info):
+        """Estimate Probe Cost.
+
+        Keyword Arguments:
+        self                   -- This object.
+        site_name              -- String which identifies site.
+        net_info               -- Dictionary containing the site data.
+
+        Return Value:
+        Expected number of bytes for one probe of the site.
+        """
+
+        stats = self.sites.get(site_name)
+        if stats and stats[0]:
+            return (stats[1] + stats[2]) // stats[0]
+
+        method = "HEAD" if probe_method(net_info) == "HEAD" else "GET"
+        probes, total = self._methods.get(method, (0, 0))
+        if probes:
+            return total // probes
+        return DEFAULT_ESTIMATES[method]
+
+    def admit(self, site_name, net_info):
+        """Admit Probe.
+
+        Keyword Arguments:
+        self                   -- This object.
+        site_name              -- String which identifies site.
+        net_info               -- Dictionary containing the site data.
+
+        Return Value:
+        Number of bytes reserved for the probe, to be handed back to record(),
+        or None if the probe should not be performed.
+        """
+
+        if self.max_bytes is None:
+            return 0
+
+        with self._lock:
+            cost = self.estimate(site_name, net_info)
+            committed = self.spent + self.reserved
+            refuse = committed + cost > self.max_bytes
+            if not refuse and committed >= self.soft_limit * self.max_bytes:
+                probes = sum(stats[0] for stats in self._methods.values())
+                if probes:
+                    average = sum(stats[1] for stats in self._methods.values()) / probes
+                    refuse = cost > average
+            if refuse:
+                self.refused += 1
+                return None
+            self.reserved += cost
+
+        return cost
+
+    def record(self, site_name, net_info, reserved=0, sent=0, received=0, decoded=0):
+        """Record Probe.
+
+        Keyword Arguments:
+        self                   -- This object.
+        site_name              -- String which identifies site.
+        net_info               -- Dictionary containing the site data.
+        reserved               -- Number of bytes reserved by admit().
+        sent                   -- Number of bytes sent.
+        received               -- Number of bytes received over the wire.
+        decoded                -- Number of bytes received, decompressed.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            self.reserved -= reserved
+            self.spent += sent + received
+            stats = self.sites.setdefault(site_name, [0, 0, 0, 0])
+            stats[0] += 1
+            stats[1] += sent
+            stats[2] += received
+            stats[3] += decoded
+            method = "HEAD" if probe_method(net_info) == "HEAD" else "GET"
+            method_stats = self._methods.setdefault(method, [0, 0])
+            method_stats[0] += 1
+            method_stats[1] += sent + received
+
+        return
+
+    def exhausted(self):
+        """Is Budget Exhausted.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Boolean indicating whether the whole budget has been spent.
+        """
+        return self.max_bytes is not None and self.spent >= self.max_bytes
+
+    def write_report(self, path):
+        """Write Report.
+
+        Write the bytes transferred per site to a CSV file, most expensive
+        sites first.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path to the report file.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            rows = sorted(self.sites.items(), key=lambda item: item[1][1] + item[1][2], reverse=True)
+
+        with open(path, "w", newline="", encoding="utf-8") as report:
+            writer = csv.writer(report)
+            writer.writerow(["name", "probes", "bytes_sent", "bytes_received", "bytes_decoded", "bytes_per_probe"])
+            for site_name, (probes, sent, received, decoded) in rows:
+                writer.writerow([site_name, probes, sent, received, decoded, (sent + received) // max(probes, 1)])
+
+        return
@@ -0,0 +1,273 @@
+"""Sherlock Batch Module
+
+This module supports sites declaring a batch probe in the site data:  an
+endpoint (e.g. a lookup or GraphQL API) answering about many usernames in a
+single request.  When several usernames are queried, those sites are asked
+about the usernames in batches, and the verdicts are handed out one by one.
+"""
+import re
+from concurrent.futures import Future
+from functools import partial
+from threading import Lock
+from urllib.parse import quote
+
+from sherlock_project.bandwidth import measure
+from sherlock_project.result import QueryResult, QueryStatus
+
+# Number of usernames per request, unless the site says otherwise.
+DEFAULT_BATCH_SIZE = 50
+
+
+def fill_template(template, usernames, separator=","):
+    """Fill Batch Template.
+
+    Keyword Arguments:
+    template               -- String, dictionary or list from the batch probe
+                              of a site.
+    usernames              -- List of strings containing the usernames.
+    separator              -- String joining the usernames.
+                              Default of ",".
+
+    Return Value:
+    The template with values of exactly "{}" replaced by the list of
+    usernames, and "{}" within other strings by the joined usernames.
+    """
+
+    if isinstance(template, str):
+        if template == "{}":
+            return list(usernames)
+        return template.replace("{}", separator.join(usernames))
+    elif isinstance(template, dict):
+        return {k: fill_template(v, usernames, separator) for k, v in template.items()}
+    elif isinstance(template, list):
+        return [fill_template(i, usernames, separator) for i in template]
+    return template
+
+
+def extract_claimed(document, path):
+    """Extract Claimed Usernames.
+
+    Keyword Arguments:
+    document               -- Parsed JSON response of a batch probe.
+    path                   -- String containing the dot separated path to the
+                              claimed usernames.  A "*" step goes through all
+                              the items of a list (or values of an object).
+                              e.g. "data.users.*.login"
+
+    Return Value:
+    Set of the claimed usernames, case folded.
+
+    NOTE:  Will raise KeyError if the response does not have the expected
+           shape.  Items of a "*" step which do not are skipped.
+    """
+
+    nodes = [document]
+    iterated = False
+    for step in path.split("."):
+        found = []
+        for node in nodes:
+            if step == "*":
+                found.extend(node.values() if isinstance(node, dict) else node)
+            elif isinstance(node, dict) and step in node:
+                found.append(node[step])
+            elif isinstance(node, list) and step.isdigit() and int(step) < len(node):
+                found.append(node[int(step)])
+            elif not iterated:
+                raise KeyError(step)
+        iterated = iterated or step == "*"
+        nodes = found
+
+    return {node.casefold() for node in nodes if isinstance(node, str)}
+
+
+class BatchProbe:
+    """Batch Probe Object.
+
+    Answers the queries of sites with a batch probe, for the usernames it was
+    given.  The usernames are split in batches in the order given, and the
+    first query about a username submits the request for its whole batch,
+    through the session of that query:  it is run by the scheduler, and
+    metered and captured, like the other requests.  Verdicts are handed out
+    once, after which they are forgotten.
+    """
+
+    def __init__(self, usernames, site_data):
+        """Create Batch Probe Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        usernames              -- List of strings containing the usernames
+                                  which will be queried.
+        site_data              -- Dictionary containing the site data.  Only
+                                  the sites with a "batchProbe" are used.
+
+        Return Value:
+        Nothing.
+        """
+
+        # Number of batch requests performed
+        self.requests = 0
+
+        # site name -> (site data, username -> batch number, batches)
+        self._sites = {}
+        for site_name, net_info in site_data.items():
+            probe = net_info.get("batchProbe")
+            if probe is None:
+                continue
+            # Usernames not allowed by the site are left to the normal query,
+            # which tells they are illegal without asking.
+            regex_check = net_info.get("regexCheck")
+            eligible = [
+                username for username in usernames
+                if not regex_check or re.search(regex_check, username) is not None
+            ]
+            size = probe.get("maxUsernames", DEFAULT_BATCH_SIZE)
+            batches = [eligible[i:i + size] for i in range(0, len(eligible), size)]
+            numbers = {username: i // size for i, username in enumerate(eligible)}
+            self._sites[site_name] = (net_info, numbers, batches)
+
+        # (site name, batch number) -> {username: Future()} for the usernames
+        # whose verdict has not been handed out yet.
+        self._members = {}
+        self._lock = Lock()
+
+        return
+
+    def submit(self, username, site_name, session, proxy=None, timeout=60, meter=None, capture=None):
+        """Submit Query.
+
+        Keyword Arguments:
+        self                   -- This object.
+        username               -- String indicating username of query.
+        site_name              -- String which identifies site.
+        session                -- Object of type SherlockFuturesSession() the
+                                  batch request is submitted through, if it
+                                  has not been already.
+        proxy                  -- String indicating the proxy URL.
+                                  Default is None.
+        timeout                -- Time in seconds to wait before timing out
+                                  request.
+                                  Default is 60 seconds.
+        meter                  -- Object of type BandwidthMeter() the batch
+                                  request is admitted and recorded by.
+                                  Default is None.
+        capture                -- Object of type WarcCapture() the exchange is
+                                  written to, once, with the first result of
+                                  the batch it wants.
+                                  Default is None.
+
+        Return Value:
+        Future for the QueryResult() object of the query, or for None if the
+        batch request failed (e.g. a WAF page or an error instead of the
+        expected JSON), after which the query should be performed normally.
+        None instead of a future if the site has no batch probe, the username
+        is not part of a batch or its verdict was already handed out, or the
+        meter refuses the batch request.
+        """
+
+        site = self._sites.get(site_name)
+        if site is None:
+            return None
+        net_info, numbers, batches = site
+        number = numbers.get(username)
+        if number is None:
+            return None
+
+        key = (site_name, number)
+        with self._lock:
+            members = self._members.get(key)
+            if members is None:
+                reservation = 0
+                if meter is not None:
+                    reservation = meter.admit(site_name, net_info)
+                    if reservation is None:
+                        return None
+                members = self._members[key] = {name: Future() for name in batches[number]}
+                self.requests += 1
+                self._submit(
+                    site_name, net_info, dict(members), session, proxy, timeout,
+                    meter, reservation, capture,
+                )
+            return members.pop(username, None)
+
+    def _submit(self, site_name, net_info, members, session, proxy, timeout, meter, reservation, capture):
+        probe = net_info["batchProbe"]
+        usernames = list(members)
+        separator = probe.get("separator", ",")
+        url = fill_template(
+            probe["url"], [quote(username, safe="") for username in usernames], separator
+        )
+        headers = {
+            "User-Agent": "Mozilla/5.0 (X11; Linux x86_64; rv:132.0) Gecko/20100101 Firefox/132.0",
+        }
+        headers.update(net_info.get("headers", {}))
+        payload = probe.get("request_payload")
+        if payload is not None:
+            payload = fill_template(payload, usernames, separator)
+        proxies = None
+        if proxy is not None:
+            proxies = {"http": proxy, "https": proxy}
+
+        future = session.request(
+            probe.get("request_method", "GET"),
+            url,
+            headers=headers,
+            json=payload,
+            proxies=proxies,
+            timeout=timeout,
+            label=site_name,
+            verdict=partial(
+                self._evaluate, site_name, net_info, usernames, meter, reservation, capture
+            ),
+        )
+        future.add_done_callback(partial(self._resolve, members))
+
+    @staticmethod
+    def _evaluate(site_name, net_info, usernames, meter, reservation, capture, outcome):
+        # Run by the worker thread of the batch request.
+        r = None
+        try:
+            r = outcome.result()
+            r.raise_for_status()
+            claimed = extract_claimed(r.json(), net_info["batchProbe"]["claimed"])
+        except Exception:
+            return None
+        finally:
+            if meter is not None:
+                transferred = measure(r) if r is not None else (0, 0, 0)
+                meter.record(site_name, net_info, reservation, *transferred)
+
+        results = {}
+        for username in usernames:
+            if username.casefold() in claimed:
+                status = QueryStatus.CLAIMED
+            else:
+                status = QueryStatus.AVAILABLE
+            results[username] = QueryResult(
+                username=username,
+                site_name=site_name,
+                site_url_user=net_info["url"].replace("{}", username.replace(" ", "%20")),
+                status=status,
+                query_time=getattr(r, "elapsed", None),
+                site_url_main=net_info.get("urlMain"),
+                http_status=r.status_code,
+            )
+
+        if capture is not None:
+            for result in results.values():
+                if capture.wants(result):
+                    capture.record(result, r)
+                    break
+
+        return results
+
+    @staticmethod
+    def _resolve(members, future):
+        try:
+            results = future.result()
+        except BaseException:
+            # Cancelled (e.g. CTRL-C) or failed:  the queries are performed
+            # normally, if at all.
+            results = None
+        for username, member in members.items():
+            member.set_result(None if results is None else results[username])
@@ -0,0 +1,187 @@
+"""Sherlock Cache Module
+
+This module supports keeping local copies of remote resources (such as the
+site manifest and the exclusions list), refreshed with conditional requests.
+"""
+import hashlib
+import json
+import os
+import threading
+from time import time
+
+import requests
+
+
+def default_cache_dir():
+    """Get Default Cache Directory.
+
+    Return Value:
+    String containing the directory given by the SHERLOCK_CACHE_DIR
+    environment variable, or else the "sherlock" directory of the user's
+    cache directory (XDG_CACHE_HOME, or ~/.cache).
+    """
+
+    if os.environ.get("SHERLOCK_CACHE_DIR"):
+        return os.environ["SHERLOCK_CACHE_DIR"]
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "sherlock")
+
+
+class ResourceCache:
+    """Resource Cache Object.
+
+    Local copies of remote resources, stored next to the validators (ETag,
+    Last-Modified) they were served with.  A copy younger than max_age is
+    used as is.  A copy younger than max_age + stale_while_revalidate is
+    used as is too, while it is refreshed in the background for the next
+    run.  Older copies are refreshed before use, with a conditional request
+    so that an unchanged resource is not downloaded again.  If the refresh
+    fails, the copy is used whatever its age.
+    """
+
+    def __init__(self, directory=None, max_age=3600, stale_while_revalidate=86400):
+        """Create Resource Cache Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        directory              -- String indicating path to the cache
+                                  directory.  It is created when needed.
+                                  Default of None uses default_cache_dir().
+        max_age                -- Time (in seconds) during which a copy is
+                                  used without checking for a newer one.
+                                  Default of one hour.
+        stale_while_revalidate -- Time (in seconds) past max_age during which
+                                  a copy is still used right away, while it
+                                  is refreshed in the background.
+                                  Default of one day.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.directory = directory or default_cache_dir()
+        self.max_age = max_age
+        self.stale_while_revalidate = stale_while_revalidate
+
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+        return
+
+    def path(self, url):
+        """Get Cache Path.
+
+        Keyword Arguments:
+        self                   -- This object.
+        url                    -- String containing URL of resource.
+
+        Return Value:
+        String indicating path of the local copy of the resource.  Its
+        validators are stored in the same path, with a ".meta" suffix.
+        """
+
+        name = os.path.basename(url.split("?")[0]) or "resource"
+        digest = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{digest}-{name}")
+
+    def _read(self, url):
+        path = self.path(url)
+        try:
+            with open(path + ".meta", "r", encoding="utf-8") as file:
+                meta = json.load(file)
+            with open(path, "rb") as file:
+                return file.read(), meta
+        except (OSError, ValueError):
+            return None, {}
+
+    def _write(self, url, content, meta):
+        # Write to temporary files first, so that a reader never sees a half
+        # written copy, even if the process is killed mid-way.
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(url)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        if content is not None:
+            with open(path + suffix, "wb") as file:
+                file.write(content)
+            os.replace(path + suffix, path)
+        with open(path + ".meta" + suffix, "w", encoding="utf-8") as file:
+            json.dump(meta, file)
+        os.replace(path + ".meta" + suffix, path + ".meta")
+
+    def _refresh(self, url, content, meta, timeout):
+        headers = {}
+        if content is not None:
+            if meta.get("etag"):
+                headers["If-None-Match"] = meta["etag"]
+            if meta.get("last_modified"):
+                headers["If-Modified-Since"] = meta["last_modified"]
+
+        response = requests.get(url=url, headers=headers, timeout=timeout)
+
+        if response.status_code == 304 and content is not None:
+            meta["fetched_at"] = time()
+            self._write(url, None, meta)
+            return content
+
+        if response.status_code != 200:
+            raise FileNotFoundError(f"Bad response while accessing URL '{url}'.")
+
+        self._write(url, response.content, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched_at": time(),
+        })
+        return response.content
+
+    def _refresh_in_background(self, url, content, meta, timeout):
+        with self._lock:
+            if url in self._refreshing:
+                return
+            self._refreshing.add(url)
+
+        def refresh():
+            try:
+                self._refresh(url, content, meta, timeout)
+            except Exception:
+                # The copy in use is still fine; try again next time.
+                pass
+            finally:
+                with self._lock:
+                    self._refreshing.discard(url)
+
+        threading.Thread(target=refresh, daemon=True).start()
+
+    def fetch(self, url, timeout=30):
+        """Fetch Resource.
+
+        Keyword Arguments:
+        self                   -- This object.
+        url                    -- String containing URL of resource.
+        timeout                -- Time in seconds to wait for the server,
+                                  when the resource has to be refreshed.
+                                  Default of 30 seconds.
+
+        Return Value:
+        Bytes of the resource.
+
+        NOTE:  Will raise an exception if there is no local copy of the
+               resource and it could not be downloaded.
+        """
+
+        content, meta = self._read(url)
+        if content is not None:
+            age = time() - meta.get("fetched_at", 0)
+            if 0 <= age < self.max_age:
+                return content
+            if 0 <= age < self.max_age + self.stale_while_revalidate:
+                self._refresh_in_background(url, content, meta, timeout)
+                return content
+
+        try:
+            return self._refresh(url, content, meta, timeout)
+        except Exception:
+            if content is not None:
+                # Out of date, but better than nothing.
+                return content
+            raise
@@ -0,0 +1,277 @@
+"""Sherlock Capture Module
+
+This module supports capturing the requests and responses of queries to a
+compressed WARC file, as evidence which can be inspected or replayed later
+with the usual web archive tools.  Captured exchanges are serialized and
+compressed by a background thread, so that capturing does not hold up the
+queries.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import os
+import uuid
+from datetime import datetime, timezone
+from queue import Queue
+from threading import Thread
+from urllib.parse import urlsplit
+
+from sherlock_project.__init__ import __shortname__, __version__
+
+# Headers describing the encoding of the body as sent; the body is captured
+# as decoded, so they are left out (and Content-Length is set to its size).
+_ENCODING_HEADERS = {"content-encoding", "transfer-encoding", "content-length"}
+
+
+def surt(url):
+    """Get SURT.
+
+    Keyword Arguments:
+    url                    -- String containing a URL.
+
+    Return Value:
+    String containing the Sort-friendly URI Reordering Transform of the URL
+    (e.g. "com,example)/blue?a=1" for "https://www.example.com/blue?a=1"),
+    as used to sort CDXJ indexes.
+    """
+
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    key = ",".join(reversed(host.split(".")))
+    if parts.port and parts.port not in (80, 443):
+        key += f":{parts.port}"
+    path = parts.path or "/"
+    if parts.query:
+        path += "?" + parts.query
+
+    return f"{key}){path.lower()}"
+
+
+class WarcCapture:
+    """WARC Capture Object.
+
+    Writes the exchanges of the queries to a WARC file:  for each probe, a
+    request record, a response record, and a metadata record holding the
+    site, username and verdict.  Each record is a gzip member of its own, so
+    that records can be read from their offset alone.  A CDXJ index of the
+    responses is written next to the file (with ".cdxj" appended to its
+    name) once it is closed.
+
+    Response bodies are captured as decoded by requests, so the headers
+    describing their encoding on the wire are replaced by the Content-Length
+    of the decoded body.
+    """
+
+    def __init__(self, path, sites=None, statuses=None, queue_size=256):
+        """Create WARC Capture Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path to the WARC file,
+                                  normally ending in ".warc.gz".
+        sites                  -- List of strings containing the names of the
+                                  sites to capture, whatever their case.
+                                  Default is None, for all sites.
+        statuses               -- List of QueryStatus() values, and integers
+                                  for HTTP status codes:  the queries with
+                                  any of them are captured.
+                                  Default is None, for all queries.
+        queue_size             -- Integer indicating the number of exchanges
+                                  waiting to be written, after which queries
+                                  wait for the writer.
+                                  Default is 256.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.path = path
+        self.sites = None if not sites else {site.casefold() for site in sites}
+        self.statuses = None if not statuses else set(statuses)
+        # Number of exchanges written, and of those which could not be
+        self.captured = 0
+        self.failed = 0
+
+        self._file = open(path, "wb")
+        self._offset = 0
+        self._index = []
+        self._queue = Queue(maxsize=queue_size)
+        self._thread = Thread(target=self._run, daemon=True)
+        self._write_record("warcinfo", None, "application/warc-fields", self._fields({
+            "software": f"{__shortname__} {__version__}",
+            "format": "WARC File Format 1.1",
+        }))
+        self._thread.start()
+
+        return
+
+    def wants(self, result):
+        """Wants Query.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() of the query.
+
+        Return Value:
+        Boolean indicating whether the query passes the filters.
+        """
+
+        if self.sites is not None and result.site_name.casefold() not in self.sites:
+            return False
+        if self.statuses is not None and not (
+            result.status in self.statuses or result.http_status in self.statuses
+        ):
+            return False
+        return True
+
+    def record(self, result, response):
+        """Record Exchange.
+
+        Queues the exchange of a query for writing, if it passes the filters.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() of the query.
+        response               -- Object of type requests.Response() of the
+                                  query.
+
+        Return Value:
+        Nothing.
+        """
+
+        if response is None or not self.wants(result):
+            return
+        self._queue.put((datetime.now(timezone.utc), result, response))
+
+        return
+
+    def close(self):
+        """Close Capture.
+
+        Waits for the queued exchanges to be written, then closes the file and
+        writes its index.  It is safe to call this more than once.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        if self._file is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._file.close()
+        self._file = None
+
+        self._index.sort()
+        with open(self.path + ".cdxj", "w", encoding="utf-8") as index:
+            for key, timestamp, fields in self._index:
+                index.write(f"{key} {timestamp} {json.dumps(fields)}\n")
+
+        return
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            try:
+                self._write_exchange(*item)
+                self.captured += 1
+            except Exception:
+                # A response which cannot be serialized must not stop the
+                # capture of the others, but is counted as missing.
+                self.failed += 1
+
+    @staticmethod
+    def _fields(fields):
+        return "".join(f"{name}: {value}\r\n" for name, value in fields.items()).encode("utf-8")
+
+    def _write_exchange(self, date, result, response):
+        url = response.url
+        request = response.request
+
+        # Request, as sent (apart from the headers added by urllib3).
+        target = urlsplit(request.url)
+        lines = [f"{request.method} {request.path_url} HTTP/1.1"]
+        headers = dict(request.headers)
+        headers.setdefault("Host", target.netloc)
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        body = request.body or b""
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        request_block = ("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1", "replace") + body
+        request_id = self._write_record(
+            "request", request.url, "application/http;msgtype=request", request_block, date,
+        )
+
+        # Response, with its decoded body.
+        version = {10: "1.0", 11: "1.1"}.get(getattr(response.raw, "version", 11), "1.1")
+        lines = [f"HTTP/{version} {response.status_code} {response.reason or ''}".rstrip()]
+        raw_headers = getattr(response.raw, "headers", None) or response.headers
+        lines.extend(
+            f"{name}: {value}" for name, value in raw_headers.items()
+            if name.lower() not in _ENCODING_HEADERS
+        )
+        content = response.content or b""
+        lines.append(f"Content-Length: {len(content)}")
+        response_block = ("\r\n".join(lines) + "\r\n\r\n").encode("iso-8859-1", "replace") + content
+        digest = "sha1:" + base64.b32encode(hashlib.sha1(content).digest()).decode("ascii")
+        offset = self._offset
+        response_id = self._write_record(
+            "response", url, "application/http;msgtype=response", response_block, date,
+            {"WARC-Concurrent-To": request_id, "WARC-Payload-Digest": digest},
+        )
+        length = self._offset - offset
+
+        self._write_record(
+            "metadata", url, "application/warc-fields",
+            self._fields({
+                "site": result.site_name,
+                "username": result.username,
+                "verdict": result.status.value,
+                "query-time": "" if result.query_time is None else result.query_time,
+            }),
+            date, {"WARC-Concurrent-To": response_id},
+        )
+
+        self._index.append((surt(url), date.strftime("%Y%m%d%H%M%S"), {
+            "url": url,
+            "mime": response.headers.get("Content-Type", "").split(";")[0].strip(),
+            "status": str(response.status_code),
+            "digest": digest,
+            "length": str(length),
+            "offset": str(offset),
+            "filename": os.path.basename(self.path),
+            "site": result.site_name,
+            "username": result.username,
+            "verdict": result.status.value,
+        }))
+
+    def _write_record(self, kind, url, content_type, block, date=None, extra=None):
+        record_id = f"<urn:uuid:{uuid.uuid4()}>"
+        headers = {
+            "WARC-Type": kind,
+            "WARC-Record-ID": record_id,
+            "WARC-Date": (date or datetime.now(timezone.utc)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        }
+        if url is not None:
+            headers["WARC-Target-URI"] = url
+        if kind == "warcinfo":
+            headers["WARC-Filename"] = os.path.basename(self.path)
+        headers.update(extra or {})
+        headers["Content-Type"] = content_type
+        headers["Content-Length"] = str(len(block))
+        record = (
+            b"WARC/1.1\r\n" + self._fields(headers) + b"\r\n" + block + b"\r\n\r\n"
+        )
+        member = gzip.compress(record)
+        self._file.write(member)
+        self._offset += len(member)
+
+        return record_id
@@ -0,0 +1,198 @@
+"""Sherlock Journal Module
+
+This module supports recording completed queries to an append-only journal,
+so that long runs can be resumed after an interruption without probing the
+same username and site twice.
+"""
+import json
+import os
+from threading import Lock
+from time import monotonic
+
+from sherlock_project.result import QueryResult, QueryStatus
+
+
+class QueryJournal:
+    """Query Journal Object.
+
+    Append-only record of finished (username, site) queries.  Each line of
+    the journal file is one JSON object, so a partially written final line
+    (e.g. after a crash) is simply ignored when the journal is read back.
+    """
+
+    def __init__(self, path, fsync_every=100, fsync_interval=5.0):
+        """Create Query Journal Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path to the journal file.
+                                  The file is created if it does not exist,
+                                  and is always appended to.
+        fsync_every            -- Number of records after which the journal
+                                  is forced to disk.
+                                  Default of 100.
+        fsync_interval         -- Time (in seconds) after which the journal is
+                                  forced to disk, whatever the record count.
+                                  Default of 5 seconds.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        # Records already present in the journal, keyed by (username, site).
+        self.completed = {}
+
+        self._lock = Lock()
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = monotonic()
+
+        return
+
+    def load(self):
+        """Load Journal.
+
+        Read every complete record of an existing journal file so that the
+        queries it describes can be skipped.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Number of records loaded.
+        """
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                        QueryStatus(record["status"])
+                    except (ValueError, KeyError, TypeError):
+                        # Truncated or otherwise damaged line; the query will
+                        # simply be performed again.
+                        continue
+                    self.completed[(record["username"], record["site"])] = record
+        except FileNotFoundError:
+            pass
+
+        return len(self.completed)
+
+    def lookup(self, username, site_name):
+        """Look Up Query.
+
+        Keyword Arguments:
+        self                   -- This object.
+        username               -- String indicating username of query.
+        site_name              -- String which identifies site.
+
+        Return Value:
+        QueryResult() object as returned by sherlock() for the site, or None
+        if the query has not been completed.  Queries which ended with an
+        UNKNOWN status (timeouts, connection errors...) are not considered
+        completed, so that they are tried again.  Response bodies are not
+        journaled.
+        """
+
+        record = self.completed.get((username, site_name))
+        if record is None or record["status"] == QueryStatus.UNKNOWN.value:
+            return None
+
+        http_status = record.get("http_status")
+        return QueryResult(
+            username=username,
+            site_name=site_name,
+            site_url_user=record.get("url_user", ""),
+            status=QueryStatus(record["status"]),
+            query_time=record.get("query_time"),
+            context=record.get("context"),
+            site_url_main=record.get("url_main"),
+            # Journals written before the status was kept as a number hold
+            # an empty string instead.
+            http_status=http_status if isinstance(http_status, int) else None,
+        )
+
+    def record(self, username, site_name, result):
+        """Record Query.
+
+        Append a finished query to the journal.
+
+        Keyword Arguments:
+        self                   -- This object.
+        username               -- String indicating username of query.
+        site_name              -- String which identifies site.
+        result                 -- QueryResult() object of the query.
+
+        Return Value:
+        Nothing.
+        """
+
+        record = {
+            "username": username,
+            "site": site_name,
+            "url_main": result.site_url_main,
+            "url_user": result.site_url_user,
+            "status": result.status.value,
+            "http_status": result.http_status,
+            "query_time": result.query_time,
+            "context": result.context,
+        }
+        line = json.dumps(record, separators=(",", ":")) + "\n"
+
+        with self._lock:
+            if self._file is None:
+                self._file = open(self.path, "a", encoding="utf-8")
+            self._file.write(line)
+            # Hand every record to the operating system right away, so that
+            # it survives the process being killed.  Forcing it to the disk
+            # is comparatively expensive and is only done periodically.
+            self._file.flush()
+            self._unsynced += 1
+            if (self._unsynced >= self.fsync_every
+                    or monotonic() - self._last_sync >= self.fsync_interval):
+                self._sync()
+            self.completed[(username, site_name)] = record
+
+        return
+
+    def _sync(self):
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = monotonic()
+
+    def close(self):
+        """Close Journal.
+
+        Flush all pending records to disk.  It is safe to call this more
+        than once.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            if self._file is not None:
+                self._file.flush()
+                self._sync()
+                self._file.close()
+                self._file = None
+
+        return
+
+    def __len__(self):
+        """Length For Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Number of queries recorded in the journal.
+        """
+        return len(self.completed)
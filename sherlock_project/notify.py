@@ -3,12 +3,12 @@
 This module defines the objects for notifying the caller about the
 results of queries.
 """
+import sys
+from queue import Queue
+from threading import Lock, Thread, Timer
+
 from sherlock_project.result import QueryStatus
 from colorama import Fore, Style
-import webbrowser
-
-# Global variable to count the number of results.
-globvar = 0
 
 
 class QueryNotify:
@@ -77,6 +77,44 @@ class QueryNotify:
 
         # return
 
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Notify method for several query results at once, as delivered by a
+        batching QueryNotifyMulti().  By default, each result is passed on to
+        update(); classes paying a cost per call (e.g. taking a lock, or
+        writing to a file) may override it to handle the batch at once.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult(), in
+                                  the order they arrived.
+
+        Return Value:
+        Nothing.
+        """
+
+        for result in results:
+            self.update(result)
+
+        # return
+
+    def flush(self):
+        """Notify Flush.
+
+        Notify method asking for everything notified so far to be written
+        out (e.g. before printing something else).  This method will
+        typically be overridden by classes buffering their output.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        # return
+
     def finish(self, message=None):
         """Notify Finish.
 
@@ -108,13 +146,198 @@ class QueryNotify:
         return str(self.result)
 
 
+class QueryNotifyMulti(QueryNotify):
+    """Query Notify Multi Object.
+
+    Query notify class that passes every notification on to several others,
+    e.g. one printing the results and others writing them to files.  It may
+    be notified from several threads at once:  the notifiers are always
+    notified one at a time, and in the same order.
+
+    Results may be delivered in batches, through update_batch(), once
+    batch_size results are waiting or batch_interval seconds have passed
+    since the first of them arrived.  Waiting results are always delivered
+    before any other notification.
+    """
+
+    def __init__(self, notifiers, result=None, batch_size=1, batch_interval=None):
+        """Create Query Notify Multi Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        notifiers              -- List of objects with base type of
+                                  QueryNotify() to notify, in order.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+        batch_size             -- Integer indicating the number of results
+                                  delivered at once.
+                                  Default is 1, for no batching.
+        batch_interval         -- Time in seconds after which waiting results
+                                  are delivered, whatever their number.
+                                  Default is None, for no time limit.
+
+        Return Value:
+        Nothing.
+        """
+
+        super().__init__(result)
+        self.notifiers = list(notifiers)
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+
+        self._pending = []
+        self._timer = None
+        # Guards the waiting results, and the delivery to the notifiers.
+        self._lock = Lock()
+        self._deliver_lock = Lock()
+
+        return
+
+    def start(self, message=None):
+        """Notify Start.
+
+        Delivers the waiting results, then passes the notification on.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- Object that is passed on to the notifiers.
+
+        Return Value:
+        Nothing.
+        """
+
+        self._deliver()
+        with self._deliver_lock:
+            for notifier in self.notifiers:
+                notifier.start(message)
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Passes the result on, or keeps it waiting for its batch.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = result
+        if self.batch_size <= 1 and self.batch_interval is None:
+            with self._deliver_lock:
+                for notifier in self.notifiers:
+                    notifier.update(result)
+            return
+
+        with self._lock:
+            self._pending.append(result)
+            if len(self._pending) < self.batch_size:
+                if len(self._pending) == 1 and self.batch_interval is not None:
+                    self._timer = Timer(self.batch_interval, self._deliver)
+                    self._timer.daemon = True
+                    self._timer.start()
+                return
+        self._deliver()
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        for result in results:
+            self.update(result)
+
+        return
+
+    def _deliver(self):
+        # Taken first, so that batches are delivered in the order they were
+        # gathered.
+        with self._deliver_lock:
+            with self._lock:
+                results = self._pending
+                self._pending = []
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            if results:
+                for notifier in self.notifiers:
+                    notifier.update_batch(results)
+
+    def flush(self):
+        """Notify Flush.
+
+        Delivers the waiting results to the notifiers, then has them write
+        out everything notified so far.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        self._deliver()
+        with self._deliver_lock:
+            for notifier in self.notifiers:
+                notifier.flush()
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Delivers the waiting results, then passes the notification on.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- Object that is passed on to the notifiers.
+                                  Default is None, which leaves each notifier
+                                  its own default message.
+
+        Return Value:
+        Nothing.
+        """
+
+        self._deliver()
+        with self._deliver_lock:
+            for notifier in self.notifiers:
+                # Leave each notifier its own default message.
+                if message is None:
+                    notifier.finish()
+                else:
+                    notifier.finish(message)
+
+        return
+
+
 class QueryNotifyPrint(QueryNotify):
     """Query Notify Print Object.
 
-    Query notify class that prints results.
+    Query notify class that prints results.  When the standard output is a
+    terminal, colored lines are written every refresh_interval seconds;
+    otherwise (e.g. a pipe or a file) plain lines are written in blocks.
+    Found sites are opened in the web browser by a background thread, so as
+    not to hold up the results.
     """
 
-    def __init__(self, result=None, verbose=False, print_all=False, browse=False):
+    # Size in characters of the blocks written when not on a terminal.
+    block_size = 65536
+
+    def __init__(self, result=None, verbose=False, print_all=False, browse=False,
+                 color=None, refresh_interval=0.05):
         """Create Query Notify Print Object.
 
         Contains information about a specific method of notifying the results
@@ -127,6 +350,12 @@ class QueryNotifyPrint(QueryNotify):
         verbose                -- Boolean indicating whether to give verbose output.
         print_all              -- Boolean indicating whether to only print all sites, including not found.
         browse                 -- Boolean indicating whether to open found sites in a web browser.
+        color                  -- Boolean indicating whether to color the output.
+                                  Default is None, for coloring it when the
+                                  standard output is a terminal.
+        refresh_interval       -- Time in seconds after which lines printed
+                                  to a terminal are written.
+                                  Default is 0.05 seconds.
 
         Return Value:
         Nothing.
@@ -136,9 +365,93 @@ class QueryNotifyPrint(QueryNotify):
         self.verbose = verbose
         self.print_all = print_all
         self.browse = browse
+        self.color = color
+        self.refresh_interval = refresh_interval
+
+        # Number of sites the usernames were found on.
+        self.results = 0
+        # Whether the standard output is a terminal, once known.
+        self._tty = None
+        self._lines = []
+        self._size = 0
+        self._timer = None
+        self._browser = None
+        self._lock = Lock()
+
+        return
+
+    def _detect(self):
+        # The standard output may be redirected once this object is made
+        # (e.g. by --ndjson -), so it is only looked at when first needed.
+        if self._tty is None:
+            self._tty = sys.stdout.isatty()
+            if self.color is None:
+                self.color = self._tty
+
+    def _write(self, lines, flush=False):
+        self._detect()
+        with self._lock:
+            self._lines.extend(lines)
+            self._size += sum(len(line) for line in lines)
+            if flush or (not self._tty and self._size >= self.block_size):
+                self._flush()
+            elif self._tty and self._lines and self._timer is None:
+                self._timer = Timer(self.refresh_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush(self):
+        # Called with the lock held.
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._lines:
+            self._lines.append("")
+            if self._tty:
+                # Clear the line first, in case a status line is drawn on it
+                # (see QueryNotifyProgress).
+                sys.stdout.write("\x1b[K")
+            sys.stdout.write("\n".join(self._lines))
+            sys.stdout.flush()
+            self._lines = []
+            self._size = 0
+
+    def flush(self):
+        """Flush Output.
+
+        Writes the lines printed so far.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            self._flush()
 
         return
 
+    def _open(self, url):
+        # Opening a browser may take a while; a single thread does it, in the
+        # order the sites were found.
+        with self._lock:
+            if self._browser is None:
+                self._browser = Queue()
+                Thread(target=self._browse, args=(self._browser,), daemon=True).start()
+        self._browser.put(url)
+
+    @staticmethod
+    def _browse(urls):
+        import webbrowser
+        while True:
+            url = urls.get()
+            try:
+                webbrowser.open(url, 2)
+            finally:
+                urls.task_done()
+
     def start(self, message):
         """Notify Start.
 
@@ -155,13 +468,17 @@ class QueryNotifyPrint(QueryNotify):
 
         title = "Checking username"
 
-        print(Style.BRIGHT + Fore.GREEN + "[" +
-              Fore.YELLOW + "*" +
-              Fore.GREEN + f"] {title}" +
-              Fore.WHITE + f" {message}" +
-              Fore.GREEN + " on:")
+        self._detect()
+        if self.color:
+            line = (Style.BRIGHT + Fore.GREEN + "[" +
+                    Fore.YELLOW + "*" +
+                    Fore.GREEN + f"] {title}" +
+                    Fore.WHITE + f" {message}" +
+                    Fore.GREEN + " on:" + Style.RESET_ALL)
+        else:
+            line = f"[*] {title} {message} on:"
         # An empty line between first line and the result(more clear output)
-        print('\r')
+        self._write([line, "\r"], flush=True)
 
         return
 
@@ -175,14 +492,12 @@ class QueryNotifyPrint(QueryNotify):
         Return Value:
         The number of results by the time we call the function.
         """
-        global globvar
-        globvar += 1
-        return globvar
-
-    def update(self, result):
-        """Notify Update.
+        with self._lock:
+            self.results += 1
+            return self.results
 
-        Will print the query result to the standard output.
+    def _line(self, result):
+        """Format Result Line.
 
         Keyword Arguments:
         self                   -- This object.
@@ -190,70 +505,102 @@ class QueryNotifyPrint(QueryNotify):
                                   results for this query.
 
         Return Value:
-        Nothing.
+        String to print for the result, or None if it is not printed.
         """
-        self.result = result
 
         response_time_text = ""
-        if self.result.query_time is not None and self.verbose is True:
-            response_time_text = f" [{round(self.result.query_time * 1000)}ms]"
+        if result.query_time is not None and self.verbose is True:
+            response_time_text = f" [{round(result.query_time * 1000)}ms]"
 
-        # Output to the terminal is desired.
         if result.status == QueryStatus.CLAIMED:
-            self.countResults()
-            print(Style.BRIGHT + Fore.WHITE + "[" +
-                  Fore.GREEN + "+" +
-                  Fore.WHITE + "]" +
-                  response_time_text +
-                  Fore.GREEN +
-                  f" {self.result.site_name}: " +
-                  Style.RESET_ALL +
-                  f"{self.result.site_url_user}")
-            if self.browse:
-                webbrowser.open(self.result.site_url_user, 2)
-
-        elif result.status == QueryStatus.AVAILABLE:
-            if self.print_all:
-                print(Style.BRIGHT + Fore.WHITE + "[" +
-                      Fore.RED + "-" +
-                      Fore.WHITE + "]" +
-                      response_time_text +
-                      Fore.GREEN + f" {self.result.site_name}:" +
-                      Fore.YELLOW + " Not Found!")
-
+            if not self.color:
+                return f"[+]{response_time_text} {result.site_name}: {result.site_url_user}"
+            return (Style.BRIGHT + Fore.WHITE + "[" +
+                    Fore.GREEN + "+" +
+                    Fore.WHITE + "]" +
+                    response_time_text +
+                    Fore.GREEN +
+                    f" {result.site_name}: " +
+                    Style.RESET_ALL +
+                    f"{result.site_url_user}")
+
+        if result.status == QueryStatus.AVAILABLE:
+            text = response_time_text
+            plain = " Not Found!"
+            colored = Fore.YELLOW + plain
         elif result.status == QueryStatus.UNKNOWN:
-            if self.print_all:
-                print(Style.BRIGHT + Fore.WHITE + "[" +
-                      Fore.RED + "-" +
-                      Fore.WHITE + "]" +
-                      Fore.GREEN + f" {self.result.site_name}:" +
-                      Fore.RED + f" {self.result.context}" +
-                      Fore.YELLOW + " ")
-
+            text = ""
+            plain = f" {result.context} "
+            colored = Fore.RED + f" {result.context}" + Fore.YELLOW + " "
         elif result.status == QueryStatus.ILLEGAL:
-            if self.print_all:
-                msg = "Illegal Username Format For This Site!"
-                print(Style.BRIGHT + Fore.WHITE + "[" +
-                      Fore.RED + "-" +
-                      Fore.WHITE + "]" +
-                      Fore.GREEN + f" {self.result.site_name}:" +
-                      Fore.YELLOW + f" {msg}")
-                
+            text = ""
+            plain = " Illegal Username Format For This Site!"
+            colored = Fore.YELLOW + plain
         elif result.status == QueryStatus.WAF:
-            if self.print_all:
-                print(Style.BRIGHT + Fore.WHITE + "[" +
-                      Fore.RED + "-" +
-                      Fore.WHITE + "]" +
-                      Fore.GREEN + f" {self.result.site_name}:" +
-                      Fore.RED + " Blocked by bot detection" +
-                      Fore.YELLOW + " (proxy may help)")
-
+            text = ""
+            plain = " Blocked by bot detection (proxy may help)"
+            colored = Fore.RED + " Blocked by bot detection" + Fore.YELLOW + " (proxy may help)"
         else:
             # It should be impossible to ever get here...
             raise ValueError(
-                f"Unknown Query Status '{result.status}' for site '{self.result.site_name}'"
+                f"Unknown Query Status '{result.status}' for site '{result.site_name}'"
             )
 
+        if not self.print_all:
+            return None
+        if not self.color:
+            return f"[-]{text} {result.site_name}:{plain}"
+        return (Style.BRIGHT + Fore.WHITE + "[" +
+                Fore.RED + "-" +
+                Fore.WHITE + "]" +
+                text +
+                Fore.GREEN + f" {result.site_name}:" +
+                colored + Style.RESET_ALL)
+
+    def update(self, result):
+        """Notify Update.
+
+        Will print the query result to the standard output.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.update_batch([result])
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Will print the query results to the standard output.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = results[-1]
+        self._detect()
+        lines = []
+        for result in results:
+            line = self._line(result)
+            if line is not None:
+                lines.append(line)
+            if result.status == QueryStatus.CLAIMED:
+                self.countResults()
+                if self.browse:
+                    self._open(result.site_url_user)
+        self._write(lines)
+
         return
 
     def finish(self, message="The processing has been finished."):
@@ -265,14 +612,22 @@ class QueryNotifyPrint(QueryNotify):
         Return Value:
         Nothing.
         """
-        NumberOfResults = self.countResults() - 1
-
-        print(Style.BRIGHT + Fore.GREEN + "[" +
-              Fore.YELLOW + "*" +
-              Fore.GREEN + "] Search completed with" +
-              Fore.WHITE + f" {NumberOfResults} " +
-              Fore.GREEN + "results" + Style.RESET_ALL
-              )
+        NumberOfResults = self.results
+
+        self._detect()
+        if self.color:
+            line = (Style.BRIGHT + Fore.GREEN + "[" +
+                    Fore.YELLOW + "*" +
+                    Fore.GREEN + "] Search completed with" +
+                    Fore.WHITE + f" {NumberOfResults} " +
+                    Fore.GREEN + "results" + Style.RESET_ALL)
+        else:
+            line = f"[*] Search completed with {NumberOfResults} results"
+        self._write([line], flush=True)
+
+        # Let the browser catch up before leaving.
+        if self._browser is not None:
+            self._browser.join()
 
     def __str__(self):
         """Convert Object To String.
@@ -0,0 +1,255 @@
+"""Sherlock Progress Module
+
+This module defines the query notify object showing a live status line for
+long runs:  throughput, concurrency, latency, error rates, expected time left
+and the requests holding up the run.
+"""
+import shutil
+import sys
+from collections import deque
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+
+
+def format_duration(seconds):
+    """Format Duration.
+
+    Keyword Arguments:
+    seconds                -- Number of seconds.
+
+    Return Value:
+    Short string for the duration, e.g. "850ms", "12.3s", "9m32s", "1h05m".
+    """
+
+    if seconds < 1:
+        return f"{round(seconds * 1000)}ms"
+    if seconds < 60:
+        return f"{seconds:.1f}s"
+    minutes, seconds = divmod(round(seconds), 60)
+    if minutes < 60:
+        return f"{minutes}m{seconds:02d}s"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m"
+
+
+class QueryNotifyProgress(QueryNotify):
+    """Query Notify Progress Object.
+
+    Query notify class that keeps tallies of the results, and shows them in a
+    status line refreshed by a background thread, so that notifications only
+    cost a few counter updates.  On a terminal the line is redrawn in place
+    every interval seconds; otherwise a line is written every log_interval
+    seconds.
+    """
+
+    # Number of latest query times kept to estimate latency percentiles.
+    latency_samples = 2048
+    # Time in seconds over which the throughput is measured.
+    rate_window = 5.0
+
+    def __init__(self, total=None, scheduler=None, interval=0.5, log_interval=10.0, slowest=3):
+        """Create Query Notify Progress Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        total                  -- Integer indicating the number of queries of
+                                  the run, to tell the expected time left.
+                                  Default is None, for an unknown number.
+        scheduler              -- Object of type HostScheduler() running the
+                                  requests, to tell the requests in flight.
+                                  Default is None.
+        interval               -- Time in seconds between redraws on a
+                                  terminal.
+                                  Default is 0.5 seconds.
+        log_interval           -- Time in seconds between lines written when
+                                  not on a terminal.
+                                  Default is 10 seconds.
+        slowest                -- Number of slowest outstanding requests
+                                  shown.
+                                  Default is 3.
+
+        Return Value:
+        Nothing.
+        """
+
+        super().__init__()
+        self.total = total
+        self.scheduler = scheduler
+        self.interval = interval
+        self.log_interval = log_interval
+        self.slowest = slowest
+
+        self.done = 0
+        self.counts = {status: 0 for status in QueryStatus}
+        self._latencies = deque(maxlen=self.latency_samples)
+        # (time, queries done) samples to measure the throughput
+        self._samples = deque()
+        self._started = None
+        self._lock = Lock()
+        self._stop = Event()
+        self._thread = None
+
+        return
+
+    def start(self, message=None):
+        """Notify Start.
+
+        Starts the status line, with the first username.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing username that the series
+                                  of queries are about.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._started = monotonic()
+            self._samples.append((self._started, 0))
+            self._thread = Thread(target=self._refresh, daemon=True)
+        self._thread.start()
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.update_batch([result])
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = results[-1]
+        with self._lock:
+            self.done += len(results)
+            for result in results:
+                self.counts[result.status] += 1
+                if result.query_time is not None:
+                    self._latencies.append(result.query_time)
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over, which is of no
+                                  consequence.
+                                  Default is None, for the end of the run:
+                                  the status line is then written a last time.
+
+        Return Value:
+        Nothing.
+        """
+
+        if message is not None or self._thread is None:
+            return
+
+        self._stop.set()
+        self._thread.join()
+        self._draw(final=True)
+
+        return
+
+    def render(self, width=None):
+        """Render Status Line.
+
+        Keyword Arguments:
+        self                   -- This object.
+        width                  -- Integer indicating the maximum length of
+                                  the line.
+                                  Default is None, for no maximum.
+
+        Return Value:
+        String containing the status line.
+        """
+
+        now = monotonic()
+        with self._lock:
+            done = self.done
+            counts = dict(self.counts)
+            latencies = sorted(self._latencies)
+            self._samples.append((now, done))
+            while len(self._samples) > 2 and now - self._samples[1][0] >= self.rate_window:
+                self._samples.popleft()
+            since, done_since = self._samples[0]
+
+        rate = (done - done_since) / (now - since) if now > since else 0.0
+        parts = []
+        if self.total:
+            parts.append(f"{done}/{self.total} {100 * done // self.total}%")
+        else:
+            parts.append(f"{done} done")
+        parts.append(f"{rate:.1f}/s")
+
+        activity = None
+        if self.scheduler is not None:
+            activity = self.scheduler.snapshot(slowest=self.slowest)
+            parts.append(f"in flight {activity['running']}, queued {activity['queued']}")
+        if latencies:
+            p50 = latencies[(len(latencies) - 1) // 2]
+            p95 = latencies[(len(latencies) - 1) * 95 // 100]
+            parts.append(f"p50 {format_duration(p50)} p95 {format_duration(p95)}")
+        if done:
+            errors = 100 * counts[QueryStatus.UNKNOWN] / done
+            waf = 100 * counts[QueryStatus.WAF] / done
+            parts.append(
+                f"found {counts[QueryStatus.CLAIMED]}, errors {errors:.1f}%, WAF {waf:.1f}%"
+            )
+        if self.total and rate > 0 and done < self.total:
+            parts.append(f"ETA {format_duration((self.total - done) / rate)}")
+        if activity and activity["slowest"]:
+            slowest = ", ".join(
+                f"{label} {format_duration(seconds)}" for label, _, seconds in activity["slowest"]
+            )
+            parts.append(f"slowest: {slowest}")
+
+        line = "[~] " + " | ".join(parts)
+        if width is not None and len(line) > width:
+            line = line[:width]
+
+        return line
+
+    def _draw(self, final=False):
+        stream = sys.stderr
+        if stream.isatty():
+            width = shutil.get_terminal_size().columns - 1
+            # Drawn over the previous status line, leaving the cursor at the
+            # start of it so that printed results overwrite it.
+            stream.write("\r\x1b[K" + self.render(width) + ("\n" if final else "\r"))
+        else:
+            stream.write(self.render() + "\n")
+        stream.flush()
+
+    def _refresh(self):
+        interval = self.interval if sys.stderr.isatty() else self.log_interval
+        while not self._stop.wait(interval):
+            self._draw()
@@ -0,0 +1,499 @@
+"""Sherlock Proxies Module
+
+This module supports spreading requests over a pool of proxies (HTTP, SOCKS
+or Tor), keeping track of their health.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread
+from time import monotonic
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from sherlock_project.result import QueryStatus
+from sherlock_project.scheduler import HostScheduler
+
+
+PROXY_CHECK_URL = "https://www.google.com/generate_204"
+
+STRATEGIES = ["least-load", "sticky"]
+
+
+def is_proxy_failure(error):
+    """Is Proxy Failure.
+
+    Keyword Arguments:
+    error                  -- Exception raised while sending a request
+                              through a proxy.
+
+    Return Value:
+    Boolean indicating whether the request failed because the proxy itself
+    could not be reached, rather than the site behind it.
+    """
+
+    if isinstance(error, (requests.exceptions.ProxyError, requests.exceptions.ConnectTimeout)):
+        return True
+    if not isinstance(error, requests.exceptions.ConnectionError):
+        return False
+
+    try:
+        # Installed along with SOCKS support, which raises plain connection
+        # errors when a SOCKS (or Tor) proxy cannot be reached.
+        from socks import ProxyConnectionError
+    except ImportError:
+        return False
+
+    # Look for it down the chain of wrapped exceptions.
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if isinstance(error, ProxyConnectionError):
+            return True
+        seen.add(id(error))
+        reason = getattr(error, "reason", None)
+        if not isinstance(reason, BaseException):
+            reason = error.args[0] if error.args and isinstance(error.args[0], BaseException) else None
+        error = error.__cause__ or reason or error.__context__
+
+    return False
+
+
+class PoolProxy:
+    """Pool Proxy Object.
+
+    Describes one proxy of a ProxyPool, and how it has been doing so far.
+    """
+
+    def __init__(self, url, control_port=None):
+        """Create Pool Proxy Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        url                    -- String containing proxy URL,
+                                  e.g. "socks5h://127.0.0.1:9050".
+        control_port           -- Integer indicating the Tor control port
+                                  used to renew the circuit of this proxy.
+                                  Default of None for proxies which are not
+                                  Tor instances.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.url = url
+        self.control_port = control_port
+
+        self.in_flight = 0
+        self.requests = 0
+        self.failures = 0
+        self.healthy = True
+        self.ejected_at = None
+
+        return
+
+    def renew(self):
+        """Renew Tor Circuit.
+
+        Ask the Tor instance behind this proxy for a new circuit, and so a new
+        exit address.  The control port password, if any, is taken from the
+        TOR_CONTROL_PASSWORD environment variable.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Boolean indicating whether the circuit was renewed.
+        """
+
+        if self.control_port is None:
+            return False
+
+        # Only needed by Tor users, so do not make everybody import it.
+        from stem import Signal
+        from stem.control import Controller
+
+        try:
+            with Controller.from_port(port=self.control_port) as controller:
+                controller.authenticate(password=os.environ.get("TOR_CONTROL_PASSWORD"))
+                controller.signal(Signal.NEWNYM)
+        except Exception:
+            return False
+
+        return True
+
+    def __str__(self):
+        """Convert Object To String.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nicely formatted string to get information about this object.
+        """
+        return self.url
+
+
+class ProxyPool:
+    """Proxy Pool Object.
+
+    Hands out proxies for requests, either to the least loaded proxy or
+    always to the same proxy for a given host ("sticky").  A proxy which fails
+    max_failures times in a row, or fails its health check, is ejected from
+    the pool.  Ejected proxies are given another chance after retry_after
+    seconds (with a new circuit, for Tor instances).
+    """
+
+    def __init__(self, proxies, strategy="least-load", max_failures=3,
+                 retry_after=60.0, renew_every=None, check_url=PROXY_CHECK_URL):
+        """Create Proxy Pool Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        proxies                -- List of proxy URL strings or PoolProxy()
+                                  objects.
+        strategy               -- String indicating how to pick the proxy of
+                                  a request: "least-load" or "sticky".
+                                  Default of "least-load".
+        max_failures           -- Number of failures in a row after which a
+                                  proxy is ejected.
+                                  Default of 3.
+        retry_after            -- Time (in seconds) after which an ejected
+                                  proxy is tried again.
+                                  Default of 60 seconds.
+        renew_every            -- Number of requests after which the circuit
+                                  of a Tor proxy is renewed.
+                                  Default of None, which only renews circuits
+                                  of ejected proxies.
+        check_url              -- String containing URL requested through
+                                  every proxy by check().
+
+        Return Value:
+        Nothing.
+        """
+
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown proxy strategy '{strategy}'")
+        if not proxies:
+            raise ValueError("Proxy pool needs at least one proxy")
+
+        self.proxies = [
+            proxy if isinstance(proxy, PoolProxy) else PoolProxy(proxy)
+            for proxy in proxies
+        ]
+        self.strategy = strategy
+        self.max_failures = max_failures
+        self.retry_after = retry_after
+        self.renew_every = renew_every
+        self.check_url = check_url
+
+        self._lock = Lock()
+        self._sticky = {}
+        self._renewing = set()
+
+        return
+
+    def _usable(self, proxy, now):
+        if proxy.healthy:
+            return True
+        if now - proxy.ejected_at >= self.retry_after:
+            # Give it another chance; one more failure ejects it again.
+            proxy.healthy = True
+            proxy.failures = self.max_failures - 1
+            return True
+        return False
+
+    def acquire(self, host=None):
+        """Acquire Proxy.
+
+        Keyword Arguments:
+        self                   -- This object.
+        host                   -- String containing host name the request is
+                                  for.  Only used by the "sticky" strategy.
+
+        Return Value:
+        Object of type PoolProxy() to send the request through.  It must be
+        handed back with release() once the request is over.
+
+        NOTE:  Will raise requests.exceptions.ProxyError if every proxy of
+               the pool has been ejected.
+        """
+
+        now = monotonic()
+        with self._lock:
+            candidates = [proxy for proxy in self.proxies if self._usable(proxy, now)]
+            if not candidates:
+                raise requests.exceptions.ProxyError("No healthy proxy left in the pool")
+
+            proxy = None
+            if self.strategy == "sticky":
+                proxy = self._sticky.get(host)
+                if proxy is not None and not proxy.healthy:
+                    proxy = None
+            if proxy is None:
+                proxy = min(candidates, key=lambda p: (p.in_flight, p.requests))
+                if self.strategy == "sticky":
+                    self._sticky[host] = proxy
+
+            proxy.in_flight += 1
+            proxy.requests += 1
+
+        return proxy
+
+    def release(self, proxy, failed=False):
+        """Release Proxy.
+
+        Keyword Arguments:
+        self                   -- This object.
+        proxy                  -- Object of type PoolProxy() which was
+                                  returned by acquire().
+        failed                 -- Boolean indicating whether the request
+                                  failed because of the proxy.
+
+        Return Value:
+        Nothing.
+        """
+
+        renew = False
+        with self._lock:
+            proxy.in_flight -= 1
+            if not failed:
+                proxy.failures = 0
+            else:
+                proxy.failures += 1
+                if proxy.healthy and proxy.failures >= self.max_failures:
+                    self._eject(proxy)
+                    renew = True
+            if self.renew_every and proxy.requests % self.renew_every == 0:
+                renew = True
+
+        if renew:
+            self._renew(proxy)
+
+        return
+
+    def _renew(self, proxy):
+        # The control port may be slow to answer, so the circuit is renewed
+        # in the background rather than by the worker thread of the request,
+        # and only once at a time per proxy.
+        if proxy.control_port is None:
+            return
+        with self._lock:
+            if proxy in self._renewing:
+                return
+            self._renewing.add(proxy)
+
+        def renew():
+            try:
+                proxy.renew()
+            finally:
+                with self._lock:
+                    self._renewing.discard(proxy)
+
+        Thread(target=renew, daemon=True).start()
+
+    def _eject(self, proxy):
+        # Must be called with the lock held.
+        proxy.healthy = False
+        proxy.ejected_at = monotonic()
+
+    def check(self, timeout=10):
+        """Check Proxies.
+
+        Request check_url through every proxy of the pool at once, and eject
+        the proxies which fail.
+
+        Keyword Arguments:
+        self                   -- This object.
+        timeout                -- Time in seconds to wait for each proxy.
+                                  Default of 10 seconds.
+
+        Return Value:
+        Number of healthy proxies.
+        """
+
+        def probe(proxy):
+            try:
+                response = requests.get(
+                    self.check_url,
+                    proxies={"http": proxy.url, "https": proxy.url},
+                    timeout=timeout,
+                )
+                return response.status_code < 500
+            except requests.exceptions.RequestException:
+                return False
+
+        with ThreadPoolExecutor(max_workers=len(self.proxies)) as executor:
+            verdicts = list(executor.map(probe, self.proxies))
+
+        with self._lock:
+            for proxy, ok in zip(self.proxies, verdicts):
+                if ok:
+                    proxy.healthy = True
+                    proxy.failures = 0
+                elif proxy.healthy:
+                    self._eject(proxy)
+
+        return len(self.healthy())
+
+    def healthy(self):
+        """Get Healthy Proxies.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        List of PoolProxy() objects which are currently in use.
+        """
+        return [proxy for proxy in self.proxies if proxy.healthy]
+
+    def __len__(self):
+        """Length For Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Number of proxies in the pool, healthy or not.
+        """
+        return len(self.proxies)
+
+
+class ProxyPoolAdapter(HTTPAdapter):
+    """Proxy Pool Adapter Object.
+
+    Transport adapter sending every request through a proxy of a ProxyPool.
+    The proxy is picked when the request is actually sent, so load is
+    measured on requests really in flight.
+    """
+
+    def __init__(self, pool, **kwargs):
+        """Create Proxy Pool Adapter Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        pool                   -- Object of type ProxyPool().
+        kwargs                 -- Keyword arguments for HTTPAdapter.
+
+        Return Value:
+        Nothing.
+        """
+
+        super().__init__(**kwargs)
+        self.pool = pool
+
+        return
+
+    def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+        """Send Request.
+
+        Keyword Arguments:
+        self                   -- This object.
+        request                -- Object of type requests.PreparedRequest.
+        stream                 -- See HTTPAdapter.send().
+        timeout                -- See HTTPAdapter.send().
+        verify                 -- See HTTPAdapter.send().
+        cert                   -- See HTTPAdapter.send().
+        proxies                -- Ignored; the proxy comes from the pool.
+
+        Return Value:
+        Response object.
+        """
+
+        proxy = self.pool.acquire(urlsplit(request.url).hostname)
+        failed = False
+        try:
+            return super().send(
+                request, stream=stream, timeout=timeout, verify=verify, cert=cert,
+                proxies={"http": proxy.url, "https": proxy.url},
+            )
+        except requests.exceptions.RequestException as error:
+            failed = is_proxy_failure(error)
+            raise
+        finally:
+            self.pool.release(proxy, failed=failed)
+
+
+class FallbackRoute:
+    """Fallback Route Object.
+
+    Describes the slower path through which queries are performed a second
+    time when the direct path got them blocked (WAF page or HTTP 429), or
+    from the start for sites flagged with "fallback" in the manifest.
+    """
+
+    def __init__(self, proxy=None, proxy_pool=None, max_workers=4, max_per_host=1):
+        """Create Fallback Route Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        proxy                  -- String indicating the proxy URL to use.
+                                  Default of None.
+        proxy_pool             -- Object of type ProxyPool() to use instead
+                                  of a single proxy.
+                                  Default of None.
+        max_workers            -- Maximum number of requests in flight
+                                  through the fallback, all hosts combined.
+                                  Default of 4.
+        max_per_host           -- Maximum number of requests in flight
+                                  through the fallback to any single host.
+                                  Default of 1.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.proxy = proxy
+        self.proxy_pool = proxy_pool
+        self.scheduler = HostScheduler(max_workers=max_workers, max_per_host=max_per_host)
+
+        return
+
+    def should_retry(self, result):
+        """Should Query Be Retried.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- QueryResult() object of the query.
+
+        Return Value:
+        Boolean indicating whether the query should be performed again
+        through this route.
+        """
+
+        return result.status == QueryStatus.WAF or result.http_status == 429
+
+    def shutdown(self):
+        """Shut Down Route.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.scheduler.shutdown(wait=False, cancel_futures=True)
+
+        return
+
+
+def parse_tor_instance(value):
+    """Parse Tor Instance.
+
+    Keyword Arguments:
+    value                  -- String of the form "SOCKS_PORT" or
+                              "SOCKS_PORT:CONTROL_PORT", for a Tor instance
+                              running on the local host.
+
+    Return Value:
+    Object of type PoolProxy().
+
+    NOTE:  Will raise ValueError if the value is malformed.
+    """
+
+    socks_port, _, control_port = value.partition(":")
+    return PoolProxy(
+        f"socks5h://127.0.0.1:{int(socks_port)}",
+        control_port=int(control_port) if control_port else None,
+    )
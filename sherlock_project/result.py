@@ -30,10 +30,22 @@ class QueryStatus(Enum):
 class QueryResult():
     """Query Result Object.
 
-    Describes result of query about a given username.
+    Describes result of query about a given username, along with what the
+    probe saw (HTTP status, timing, URLs).  One of these is all that is kept
+    per site, so it is slotted.
+
+    For code written against the dictionaries sherlock() used to return for
+    each site, it can also be indexed by their keys ("url_main", "url_user",
+    "status", "http_status", "response_text" and "bytes"), "status" giving
+    the object itself.
     """
+    __slots__ = ("username", "site_name", "site_url_user", "status",
+                 "query_time", "context", "site_url_main", "http_status",
+                 "response_text", "transferred")
+
     def __init__(self, username, site_name, site_url_user, status,
-                 query_time=None, context=None):
+                 query_time=None, context=None, site_url_main=None,
+                 http_status=None, response_text=None, transferred=None):
         """Create Query Result Object.
 
         Contains information about a specific method of detecting usernames on
@@ -57,6 +69,16 @@ class QueryResult():
                                   an error, this might indicate the type of
                                   error that occurred.
                                   Default of None.
+        site_url_main          -- String containing URL for home of site.
+                                  Default of None.
+        http_status            -- Integer HTTP status code of the response
+                                  the verdict was based on.
+                                  Default of None (no response).
+        response_text          -- Bytes containing the body of that response.
+                                  Default of None (not kept).
+        transferred            -- Tuple of integers counting the bytes sent,
+                                  received and decoded for the query.
+                                  Default of None (not counted).
 
         Return Value:
         Nothing.
@@ -68,9 +90,59 @@ class QueryResult():
         self.status        = status
         self.query_time    = query_time
         self.context       = context
+        self.site_url_main = site_url_main
+        self.http_status   = http_status
+        self.response_text = response_text
+        self.transferred   = transferred
 
         return
 
+    def __getitem__(self, key):
+        """Get Legacy Result Field.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- String naming a field of the dictionaries
+                                  sherlock() used to return for each site.
+
+        Return Value:
+        Value of the field.  As in those dictionaries, a missing HTTP status
+        or response body is an empty string.
+
+        NOTE:  Will raise KeyError for unknown fields, and for "bytes" when
+               the transfer was not counted.
+        """
+        if key == "status":
+            return self
+        if key == "url_main":
+            return self.site_url_main
+        if key == "url_user":
+            return self.site_url_user
+        if key == "http_status":
+            return "" if self.http_status is None else self.http_status
+        if key == "response_text":
+            return "" if self.response_text is None else self.response_text
+        if key == "bytes" and self.transferred is not None:
+            return dict(zip(("sent", "received", "decoded"), self.transferred))
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        """Get Legacy Result Field, Or Default.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- String naming the field.  See __getitem__().
+        default                -- Value to return for unknown fields.
+                                  Default of None.
+
+        Return Value:
+        Value of the field, or the default.
+        """
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
     def __str__(self):
         """Convert Object To String.
 
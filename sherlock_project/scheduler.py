@@ -0,0 +1,379 @@
+"""Sherlock Scheduler Module
+
+This module defines the executor which runs the requests of one or more
+queries, limiting how many requests each host sees at the same time.
+"""
+from collections import OrderedDict, deque
+from concurrent.futures import Executor, Future, ThreadPoolExecutor
+from threading import Condition, Lock
+from time import monotonic
+from urllib.parse import urlsplit
+
+
+class HostScheduler:
+    """Host Scheduler Object.
+
+    Runs requests on a shared pool of worker threads, while making sure that
+    no single host has more than a given number of requests in flight.
+
+    Pending requests are kept per host, and per lane within each host (there
+    is normally one lane per username).  Whenever a worker becomes free, the
+    next host with pending work and a free slot is picked in round-robin
+    order, and within that host the next lane is picked in round-robin order
+    too.  Many usernames can therefore be queried at the same time without
+    any single site seeing a burst of requests.
+    """
+
+    def __init__(self, max_workers=20, max_per_host=4):
+        """Create Host Scheduler Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        max_workers            -- Maximum number of requests in flight, all
+                                  hosts combined.
+                                  Default of 20.
+        max_per_host           -- Maximum number of requests in flight to any
+                                  single host, unless overridden with
+                                  set_host_limit().
+                                  Default of 4.
+
+        Return Value:
+        Nothing.
+        """
+
+        if max_workers < 1 or max_per_host < 1:
+            raise ValueError("max_workers and max_per_host must be at least 1")
+
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._lock = Lock()
+        self._idle = Condition(self._lock)
+        self._host_limits = {}
+        self._in_flight = {}
+        self._running = 0
+        # future -> (label, lane key, start time) of the running jobs
+        self._started = {}
+        # host -> lane key -> deque of pending jobs
+        self._pending = OrderedDict()
+        self._shutdown = False
+
+        return
+
+    def set_host_limit(self, host, limit):
+        """Set Host Limit.
+
+        Keyword Arguments:
+        self                   -- This object.
+        host                   -- String containing host name.
+        limit                  -- Maximum number of requests in flight to this
+                                  host.  If several limits are set for the
+                                  same host (e.g. by several sites sharing
+                                  it), the lowest one is kept.
+
+        Return Value:
+        Nothing.
+        """
+
+        if limit < 1:
+            raise ValueError(f"Invalid concurrency limit {limit} for host '{host}'")
+
+        with self._lock:
+            self._host_limits[host] = min(limit, self._host_limits.get(host, limit))
+            self._dispatch()
+
+        return
+
+    def host_limit(self, host):
+        """Get Host Limit.
+
+        Keyword Arguments:
+        self                   -- This object.
+        host                   -- String containing host name.
+
+        Return Value:
+        Maximum number of requests in flight allowed to this host.
+        """
+        return self._host_limits.get(host, self.max_per_host)
+
+    def lane(self, key):
+        """Get Lane.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- Hashable identifying the lane, typically the
+                                  username being queried.
+
+        Return Value:
+        Executor submitting its work into the given lane of this scheduler.
+        It is suitable as the executor of a FuturesSession.
+        """
+        return SchedulerLane(self, key)
+
+    def submit(self, key, host, fn, /, *args, **kwargs):
+        """Submit Job.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- Hashable identifying the lane of the job.
+        host                   -- String containing host name the job talks to.
+        fn                     -- Callable to run.
+        args                   -- Arguments.
+        kwargs                 -- Keyword arguments.
+
+        Return Value:
+        Future for the result of the callable.
+        """
+
+        return self.submit_labelled(key, host, None, fn, *args, **kwargs)
+
+    def submit_labelled(self, key, host, label, fn, /, *args, **kwargs):
+        """Submit Labelled Job.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- Hashable identifying the lane of the job.
+        host                   -- String containing host name the job talks to.
+        label                  -- String telling what the job is about (e.g.
+                                  the site it queries), reported by
+                                  snapshot(), or None for the host.
+        fn                     -- Callable to run.
+        args                   -- Arguments.
+        kwargs                 -- Keyword arguments.
+
+        Return Value:
+        Future for the result of the callable.
+        """
+
+        future = Future()
+        with self._lock:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            lanes = self._pending.setdefault(host, OrderedDict())
+            lanes.setdefault(key, deque()).append((future, label, fn, args, kwargs))
+            self._dispatch()
+
+        return future
+
+    def _dispatch(self):
+        # Must be called with the lock held.
+        while self._running < self.max_workers and self._pending:
+            for host, lanes in self._pending.items():
+                if self._in_flight.get(host, 0) < self.host_limit(host):
+                    break
+            else:
+                # Every host with pending work is at its limit.
+                return
+
+            key, jobs = next(iter(lanes.items()))
+            future, label, fn, args, kwargs = jobs.popleft()
+            if jobs:
+                lanes.move_to_end(key)
+            else:
+                del lanes[key]
+            if lanes:
+                self._pending.move_to_end(host)
+            else:
+                del self._pending[host]
+
+            if not future.set_running_or_notify_cancel():
+                # Cancelled while it was waiting.
+                continue
+
+            self._running += 1
+            self._in_flight[host] = self._in_flight.get(host, 0) + 1
+            self._started[future] = (label or host, key, monotonic())
+            self._executor.submit(self._run, host, future, fn, args, kwargs)
+
+    def _run(self, host, future, fn, args, kwargs):
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as error:
+            self._release(host, future)
+            future.set_exception(error)
+        else:
+            self._release(host, future)
+            future.set_result(result)
+
+    def _release(self, host, future):
+        with self._lock:
+            del self._started[future]
+            self._running -= 1
+            self._in_flight[host] -= 1
+            if not self._in_flight[host]:
+                del self._in_flight[host]
+            self._dispatch()
+            if not self._running and not self._pending:
+                self._idle.notify_all()
+            close = self._shutdown and not self._pending
+        if close:
+            self._executor.shutdown(wait=False)
+
+    def snapshot(self, slowest=3):
+        """Snapshot Activity.
+
+        Keyword Arguments:
+        self                   -- This object.
+        slowest                -- Number of longest running jobs to report.
+                                  Default of 3.
+
+        Return Value:
+        Dictionary with the number of jobs "running" and "queued", and the
+        "slowest" running jobs, as a list of (label, lane key, seconds running)
+        tuples, longest first.  The label of jobs submitted without one is
+        their host.
+        """
+
+        now = monotonic()
+        with self._lock:
+            queued = sum(
+                len(jobs) for lanes in self._pending.values() for jobs in lanes.values()
+            )
+            started = sorted(self._started.values(), key=lambda job: job[2])[:slowest]
+
+        return {
+            "running": len(self._started),
+            "queued": queued,
+            "slowest": [(label, key, now - start) for label, key, start in started],
+        }
+
+    def cancel(self, key=None):
+        """Cancel Pending Jobs.
+
+        Jobs which are already running are not affected.
+
+        Keyword Arguments:
+        self                   -- This object.
+        key                    -- Lane whose jobs should be cancelled.
+                                  Default of None cancels the jobs of every
+                                  lane.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            for host in list(self._pending):
+                lanes = self._pending[host]
+                for lane_key in list(lanes):
+                    if key is None or lane_key == key:
+                        for future, *_ in lanes.pop(lane_key):
+                            future.cancel()
+                if not lanes:
+                    del self._pending[host]
+
+        return
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        """Shut Down Scheduler.
+
+        Keyword Arguments:
+        self                   -- This object.
+        wait                   -- Boolean indicating whether to wait for the
+                                  jobs to finish.
+        cancel_futures         -- Boolean indicating whether to cancel the
+                                  jobs which have not started yet.  If False,
+                                  they are still run.  No new jobs are
+                                  accepted either way.
+
+        Return Value:
+        Nothing.
+        """
+
+        if cancel_futures:
+            self.cancel()
+        with self._lock:
+            self._shutdown = True
+            if wait:
+                while self._pending or self._running:
+                    self._idle.wait()
+            if self._pending:
+                # The worker threads are released by _release() once the last
+                # pending job has been started.
+                return
+        self._executor.shutdown(wait=wait)
+
+        return
+
+
+class SchedulerLane(Executor):
+    """Scheduler Lane Object.
+
+    Executor submitting requests into one lane of a HostScheduler.  The host
+    of each request is taken from its URL.
+    """
+
+    def __init__(self, scheduler, key):
+        """Create Scheduler Lane Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        scheduler              -- Object of type HostScheduler().
+        key                    -- Hashable identifying the lane.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.scheduler = scheduler
+        self.key = key
+
+        return
+
+    def submit(self, fn, /, *args, **kwargs):
+        """Submit Request.
+
+        Called by FuturesSession as submit(fn, method, url, **kwargs).
+
+        Keyword Arguments:
+        self                   -- This object.
+        fn                     -- Callable performing the request.
+        args                   -- Arguments.
+        kwargs                 -- Keyword arguments.
+
+        Return Value:
+        Future for the response.
+        """
+
+        return self.submit_labelled(None, fn, *args, **kwargs)
+
+    def submit_labelled(self, label, fn, /, *args, **kwargs):
+        """Submit Labelled Request.
+
+        Keyword Arguments:
+        self                   -- This object.
+        label                  -- String telling what the request is about
+                                  (e.g. the site it queries), or None.
+        fn                     -- Callable performing the request.
+        args                   -- Arguments.
+        kwargs                 -- Keyword arguments.
+
+        Return Value:
+        Future for the response.
+        """
+
+        url = kwargs.get("url") if len(args) < 2 else args[1]
+        host = urlsplit(url).hostname if url else None
+        return self.scheduler.submit_labelled(self.key, host, label, fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, *, cancel_futures=False):
+        """Shut Down Lane.
+
+        The underlying scheduler is shared and keeps running; only the pending
+        jobs of this lane can be cancelled.
+
+        Keyword Arguments:
+        self                   -- This object.
+        wait                   -- Ignored.
+        cancel_futures         -- Boolean indicating whether to cancel the
+                                  jobs of this lane which have not started.
+
+        Return Value:
+        Nothing.
+        """
+
+        if cancel_futures:
+            self.scheduler.cancel(self.key)
+
+        return
@@ -16,15 +16,18 @@ except ImportError:
     print("This is an outdated method. Please see https://sherlockproject.xyz/installation for up to date instructions.")
     sys.exit(1)
 
-import csv
-import signal
-import pandas as pd
 import os
 import re
+import warnings
 from argparse import ArgumentParser, RawDescriptionHelpFormatter
-from json import loads as json_loads
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import ExitStack, redirect_stdout
+from functools import partial
+from threading import Thread
+from json import dumps as json_dumps, loads as json_loads
 from time import monotonic, sleep
-from typing import Optional
+from typing import Callable, Optional
+from urllib.parse import urlsplit
 
 import requests
 from requests_futures.sessions import FuturesSession
@@ -39,18 +42,48 @@ from sherlock_project.__init__ import (
 from sherlock_project.result import QueryStatus
 from sherlock_project.result import QueryResult
 from sherlock_project.notify import QueryNotify
+from sherlock_project.notify import QueryNotifyMulti
 from sherlock_project.notify import QueryNotifyPrint
+from sherlock_project.progress import QueryNotifyProgress
+from sherlock_project.sinks import (
+    QueryNotifyCsv,
+    QueryNotifyDataset,
+    QueryNotifyNdjson,
+    QueryNotifyTxt,
+    QueryNotifyXlsx,
+)
 from sherlock_project.sites import SitesInformation
-from colorama import init
+from sherlock_project.cache import ResourceCache
+from sherlock_project.journal import QueryJournal
+from sherlock_project.store import QueryNotifyStore, query_store
+from sherlock_project.batch import BatchProbe
+from sherlock_project.capture import WarcCapture
+from sherlock_project.scheduler import HostScheduler
+from sherlock_project.bandwidth import BandwidthMeter, measure, probe_method
+from sherlock_project.tuning import (
+    RANGE_BYTES,
+    calibrate,
+    default_overlay_path,
+    load_overlay,
+    save_overlay,
+)
+from sherlock_project.proxies import (
+    FallbackRoute,
+    ProxyPool,
+    ProxyPoolAdapter,
+    STRATEGIES as PROXY_STRATEGIES,
+    parse_tor_instance,
+)
 from argparse import ArgumentTypeError
 
 
 class SherlockFuturesSession(FuturesSession):
-    def request(self, method, url, hooks=None, *args, **kwargs):
+    def request(self, method, url, hooks=None, *args, verdict=None, label=None, **kwargs):
         """Request URL.
 
         This extends the FuturesSession request method to calculate a response
-        time metric to each request.
+        time metric to each request, and optionally to reach the verdict of
+        the request in the worker thread which performed it.
 
         It is taken (almost) directly from the following Stack Overflow answer:
         https://github.com/ross/requests-futures#working-in-the-background
@@ -62,10 +95,19 @@ class SherlockFuturesSession(FuturesSession):
         hooks                  -- Dictionary containing hooks to execute after
                                   request finishes.
         args                   -- Arguments.
+        verdict                -- Function called by the worker thread with a
+                                  finished Future holding the response, or
+                                  the exception raised by the request.
+                                  Default is None, for no verdict.
+        label                  -- String telling what the request is about
+                                  (e.g. the site), for executors taking
+                                  labelled jobs such as SchedulerLane().
+                                  Only used along with verdict.
+                                  Default is None.
         kwargs                 -- Keyword arguments.
 
         Return Value:
-        Request object.
+        Future for the response, or for the return value of verdict if given.
         """
         # Record the start time for the request.
         if hooks is None:
@@ -105,9 +147,31 @@ class SherlockFuturesSession(FuturesSession):
             # No response hook was already defined, so install it ourselves.
             hooks["response"] = [response_time]
 
-        return super(SherlockFuturesSession, self).request(
-            method, url, hooks=hooks, *args, **kwargs
-        )
+        if verdict is None:
+            return super(SherlockFuturesSession, self).request(
+                method, url, hooks=hooks, *args, **kwargs
+            )
+
+        if self.session:
+            send = self.session.request
+        else:
+            send = partial(requests.Session.request, self)
+
+        def probe(method, url, *args, **kwargs):
+            # A response hook would not run for failed requests, so the
+            # outcome is wrapped in a Future whatever it is, as if the
+            # request had been awaited by the caller.
+            outcome = Future()
+            try:
+                outcome.set_result(send(method, url, *args, **kwargs))
+            except Exception as error:
+                outcome.set_exception(error)
+            return verdict(outcome)
+
+        submit = self.executor.submit
+        if label is not None and hasattr(self.executor, "submit_labelled"):
+            submit = partial(self.executor.submit_labelled, label)
+        return submit(probe, method, url, *args, hooks=hooks, **kwargs)
 
 
 def get_response(request_future, error_type, social_network):
@@ -140,6 +204,214 @@ def get_response(request_future, error_type, social_network):
     return response, error_context, exception_text
 
 
+def evaluate_response(
+    request_future: Future,
+    username: str,
+    social_network: str,
+    net_info: dict,
+    url: str,
+    keep_response_text: bool = True,
+    meter: Optional[BandwidthMeter] = None,
+    reservation: int = 0,
+    capture: Optional[WarcCapture] = None,
+) -> QueryResult:
+    """Evaluate Response.
+
+    Reaches the verdict of a query from the outcome of its request.  It is
+    run by the worker thread which performed the request, right after it, so
+    that responses are analysed in parallel.
+
+    Keyword Arguments:
+    request_future         -- Future holding the outcome of the request,
+                              already finished.
+    username               -- String indicating username of query.
+    social_network         -- String which identifies site.
+    net_info               -- Dictionary containing the site data of the site.
+    url                    -- String containing the URL of the user on the
+                              site.
+    keep_response_text     -- Boolean indicating if the body of the response
+                              is kept in the result.
+                              Default is True.
+    meter                  -- Object of type BandwidthMeter() the bytes
+                              transferred are recorded to.
+                              Default is None.
+    reservation            -- Integer indicating the bytes reserved for the
+                              probe with the meter.
+                              Default is 0.
+    capture                -- Object of type WarcCapture() the exchange is
+                              written to.
+                              Default is None.
+
+    Return Value:
+    QueryResult() object for the query.
+    """
+
+    # Get the expected error type
+    error_type = net_info["errorType"]
+    if isinstance(error_type, str):
+        error_type: list[str] = [error_type]
+
+    r, error_text, exception_text = get_response(
+        request_future=request_future, error_type=error_type, social_network=social_network
+    )
+
+    transferred = None
+    if meter is not None:
+        transferred = measure(r) if r is not None else (0, 0, 0)
+        meter.record(social_network, net_info, reservation, *transferred)
+
+    # Get response time for response of our request.
+    try:
+        response_time = r.elapsed
+    except AttributeError:
+        response_time = None
+
+    # Attempt to get request information
+    try:
+        http_status = r.status_code
+    except Exception:
+        http_status = None
+    response_text = None
+    if keep_response_text:
+        try:
+            response_text = r.text.encode(r.encoding or "UTF-8")
+        except Exception:
+            pass
+
+    query_status = QueryStatus.UNKNOWN
+    error_context = None
+
+    # As WAFs advance and evolve, they will occasionally block Sherlock and
+    # lead to false positives and negatives. Fingerprints should be added
+    # here to filter results that fail to bypass WAFs. Fingerprints should
+    # be highly targetted. Comment at the end of each fingerprint to
+    # indicate target and date fingerprinted.
+    WAFHitMsgs = [
+        r'.loading-spinner{visibility:hidden}body.no-js .challenge-running{display:none}body.dark{background-color:#222;color:#d9d9d9}body.dark a{color:#fff}body.dark a:hover{color:#ee730a;text-decoration:underline}body.dark .lds-ring div{border-color:#999 transparent transparent}body.dark .font-red{color:#b20f03}body.dark', # 2024-05-13 Cloudflare
+        r'<span id="challenge-error-text">', # 2024-11-11 Cloudflare error page
+        r'AwsWafIntegration.forceRefreshToken', # 2024-11-11 Cloudfront (AWS)
+        r'{return l.onPageView}}),Object.defineProperty(r,"perimeterxIdentifiers",{enumerable:' # 2024-04-09 PerimeterX / Human Security
+    ]
+
+    if error_text is not None:
+        error_context = error_text
+
+    elif any(hitMsg in r.text for hitMsg in WAFHitMsgs):
+        query_status = QueryStatus.WAF
+
+    else:
+        if any(errtype not in ["message", "status_code", "response_url", "location", "content_length", "header"] for errtype in error_type):
+            error_context = f"Unknown error type '{error_type}' for {social_network}"
+            query_status = QueryStatus.UNKNOWN
+        else:
+            if "message" in error_type:
+                # error_flag True denotes no error found in the HTML
+                # error_flag False denotes error found in the HTML
+                error_flag = True
+                errors = net_info.get("errorMsg")
+                # errors will hold the error message
+                # it can be string or list
+                # by isinstance method we can detect that
+                # and handle the case for strings as normal procedure
+                # and if its list we can iterate the errors
+                if isinstance(errors, str):
+                    # Checks if the error message is in the HTML
+                    # if error is present we will set flag to False
+                    if errors in r.text:
+                        error_flag = False
+                else:
+                    # If it's list, it will iterate all the error message
+                    for error in errors:
+                        if error in r.text:
+                            error_flag = False
+                            break
+                if error_flag:
+                    query_status = QueryStatus.CLAIMED
+                else:
+                    query_status = QueryStatus.AVAILABLE
+
+            if "status_code" in error_type and query_status is not QueryStatus.AVAILABLE:
+                error_codes = net_info.get("errorCode")
+                query_status = QueryStatus.CLAIMED
+
+                # Type consistency, allowing for both singlets and lists in manifest
+                if isinstance(error_codes, int):
+                    error_codes = [error_codes]
+
+                if error_codes is not None and r.status_code in error_codes:
+                    query_status = QueryStatus.AVAILABLE
+                elif r.status_code >= 300 or r.status_code < 200:
+                    query_status = QueryStatus.AVAILABLE
+
+            if "response_url" in error_type and query_status is not QueryStatus.AVAILABLE:
+                # For this detection method, we have turned off the redirect.
+                # So, there is no need to check the response URL: it will always
+                # match the request.  Instead, we will ensure that the response
+                # code indicates that the request was successful (i.e. no 404, or
+                # forward to some odd redirect).
+                if 200 <= r.status_code < 300:
+                    query_status = QueryStatus.CLAIMED
+                else:
+                    query_status = QueryStatus.AVAILABLE
+
+            if "location" in error_type and query_status is not QueryStatus.AVAILABLE:
+                # Redirects are not followed for this detection method
+                # either:  the site redirects to one of the given
+                # locations (e.g. a sign up page) if the username is
+                # not claimed.
+                error_locations = net_info.get("errorLocation")
+                if isinstance(error_locations, str):
+                    error_locations = [error_locations]
+                location = r.headers.get("Location")
+                if location is not None and any(error_location in location for error_location in error_locations):
+                    query_status = QueryStatus.AVAILABLE
+                else:
+                    query_status = QueryStatus.CLAIMED
+
+            if "content_length" in error_type and query_status is not QueryStatus.AVAILABLE:
+                # Pages of unclaimed usernames have a known size, as
+                # announced by the Content-Length header.
+                length_range = net_info.get("errorContentLength")
+                content_length = r.headers.get("Content-Length", "")
+                if not content_length.isdigit():
+                    error_context = "No Content-Length"
+                    query_status = QueryStatus.UNKNOWN
+                elif length_range.get("min", 0) <= int(content_length) <= length_range.get("max", int(content_length)):
+                    query_status = QueryStatus.AVAILABLE
+                else:
+                    query_status = QueryStatus.CLAIMED
+
+            if "header" in error_type and query_status is not QueryStatus.AVAILABLE:
+                # Responses for unclaimed usernames carry one of the
+                # given headers (with a value containing the given
+                # text, unless that is null).  Redirects are not
+                # followed, as such headers are often set on them.
+                query_status = QueryStatus.CLAIMED
+                for header, error_value in net_info.get("errorHeader").items():
+                    value = r.headers.get(header)
+                    if value is not None and (error_value is None or error_value in value):
+                        query_status = QueryStatus.AVAILABLE
+                        break
+
+    result = QueryResult(
+        username=username,
+        site_name=social_network,
+        site_url_user=url,
+        status=query_status,
+        query_time=response_time,
+        context=error_context,
+        site_url_main=net_info.get("urlMain"),
+        http_status=http_status,
+        response_text=response_text,
+        transferred=transferred,
+    )
+
+    if capture is not None:
+        capture.record(result, r)
+
+    return result
+
+
 def interpolate_string(input_object, username):
     if isinstance(input_object, str):
         return input_object.replace("{}", username)
@@ -158,6 +430,9 @@ def check_for_parameter(username):
 
 checksymbols = ["_", "-", "."]
 
+# Capture file written for the deprecated --dump-response.
+DUMP_RESPONSE_CAPTURE = "responses.warc.gz"
+
 
 def multiple_usernames(username):
     """replace the parameter with with symbols and return a list of usernames"""
@@ -174,7 +449,15 @@ def sherlock(
     dump_response: bool = False,
     proxy: Optional[str] = None,
     timeout: int = 60,
-) -> dict[str, dict[str, str | QueryResult]]:
+    journal: Optional[QueryJournal] = None,
+    scheduler: Optional[HostScheduler] = None,
+    proxy_pool: Optional[ProxyPool] = None,
+    fallback: Optional[FallbackRoute] = None,
+    meter: Optional[BandwidthMeter] = None,
+    keep_response_text: bool = True,
+    batch: Optional[BatchProbe] = None,
+    capture: Optional[WarcCapture] = None,
+) -> dict[str, QueryResult]:
     """Run Sherlock Analysis.
 
     Checks for existence of username on various social media sites.
@@ -186,51 +469,205 @@ def sherlock(
     query_notify           -- Object with base type of QueryNotify().
                               This will be used to notify the caller about
                               query results.
+    dump_response          -- Ignored, as responses are no longer printed.
+                              Pass a WarcCapture() as capture to keep them.
     proxy                  -- String indicating the proxy URL
     timeout                -- Time in seconds to wait before timing out request.
                               Default is 60 seconds.
+    journal                -- Object of type QueryJournal().  Finished
+                              queries are recorded to it, and queries it
+                              already holds are not performed again.
+                              Default is None.
+    scheduler              -- Object of type HostScheduler() running the
+                              requests.  Sharing one scheduler between the
+                              queries of several usernames limits the load
+                              put on each host by all of them combined.
+                              Default is None, which runs the requests on a
+                              private scheduler of (at most) 20 workers.
+    proxy_pool             -- Object of type ProxyPool().  If given, every
+                              request is sent through one of its proxies,
+                              and the proxy argument is ignored.
+                              Default is None.
+    fallback               -- Object of type FallbackRoute().  If given,
+                              queries blocked by a WAF or rate limited are
+                              performed a second time through it, and so are
+                              the queries of sites flagged with "fallback" in
+                              the manifest (and only through it).
+                              Default is None.
+    meter                  -- Object of type BandwidthMeter().  If given, the
+                              bytes transferred by each probe are counted,
+                              and probes are skipped when they do not fit
+                              its budget any more.
+                              Default is None.
+    keep_response_text     -- Boolean indicating if the body of each response
+                              is kept in the results.  Bodies are by far the
+                              largest part of them.
+                              Default is True.
+    batch                  -- Object of type BatchProbe().  Queries it can
+                              answer, for sites with a batch probe, are not
+                              performed on their own.
+                              Default is None.
+    capture                -- Object of type WarcCapture().  The exchanges
+                              of the probes it wants are written to it.
+                              Default is None.
 
     Return Value:
     Dictionary containing results from report. Key of dictionary is the name
-    of the social network site, and the value is another dictionary with
-    the following keys:
-        url_main:      URL of main site.
-        url_user:      URL of user on site (if account exists).
-        status:        QueryResult() object indicating results of test for
-                       account existence.
-        http_status:   HTTP status code of query which checked for existence on
-                       site.
-        response_text: Text that came back from request.  May be None if
-                       there was an HTTP error when checking for existence.
+    of the social network site, and the value is the QueryResult() object
+    for it:  besides the result of the test for account existence, it holds
+    the URL of the main site (site_url_main), the HTTP status code of the
+    query (http_status, None if there was no response), the text that came
+    back (response_text, None if not kept or there was no response) and, if
+    a meter was given and a probe was made, the number of bytes sent,
+    received (over the wire) and decoded by the probe (transferred).
+
+    For code written against the dictionaries once returned for each site,
+    results[site]["status"] and the other keys of those still work.
     """
 
+    if dump_response:
+        warnings.warn(
+            "dump_response is deprecated and ignored; use capture instead",
+            DeprecationWarning, stacklevel=2,
+        )
+
     # Notify caller that we are starting the query.
     query_notify.start(username)
 
+    if fallback is None:
+        return query_sites(
+            username, site_data, query_notify,
+            proxy=proxy, timeout=timeout,
+            journal=journal, scheduler=scheduler, proxy_pool=proxy_pool,
+            meter=meter, keep_response_text=keep_response_text, batch=batch,
+            capture=capture,
+        )
+
+    # Most sites are fine with the direct path, which is the fast one.  The
+    # results of the others are held back until the fallback has had a go.
+    direct_sites = {}
+    fallback_sites = {}
+    for site_name, net_info in site_data.items():
+        if net_info.get("fallback", False):
+            fallback_sites[site_name] = net_info
+        else:
+            direct_sites[site_name] = net_info
+
+    results_total = query_sites(
+        username, direct_sites, query_notify,
+        proxy=proxy, timeout=timeout,
+        journal=journal, scheduler=scheduler, proxy_pool=proxy_pool,
+        meter=meter, keep_response_text=keep_response_text, batch=batch,
+        capture=capture, hold=fallback.should_retry,
+    )
+    for site_name, result in results_total.items():
+        if fallback.should_retry(result):
+            fallback_sites[site_name] = site_data[site_name]
+
+    if fallback_sites:
+        results_total.update(query_sites(
+            username, fallback_sites, query_notify,
+            proxy=fallback.proxy, timeout=timeout,
+            journal=journal, scheduler=fallback.scheduler,
+            proxy_pool=fallback.proxy_pool, meter=meter,
+            keep_response_text=keep_response_text, capture=capture,
+        ))
+
+    # Keep the order of the site data.
+    return {site_name: results_total[site_name] for site_name in site_data}
+
+
+def query_sites(
+    username: str,
+    site_data: dict[str, dict[str, str]],
+    query_notify: QueryNotify,
+    proxy: Optional[str] = None,
+    timeout: int = 60,
+    journal: Optional[QueryJournal] = None,
+    scheduler: Optional[HostScheduler] = None,
+    proxy_pool: Optional[ProxyPool] = None,
+    meter: Optional[BandwidthMeter] = None,
+    keep_response_text: bool = True,
+    batch: Optional[BatchProbe] = None,
+    capture: Optional[WarcCapture] = None,
+    hold: Optional[Callable[[QueryResult], bool]] = None,
+) -> dict[str, QueryResult]:
+    """Query Sites.
+
+    Performs one pass of queries for a username, without notifying the
+    caller of its start.  See sherlock() for the common arguments and the
+    return value.
+
+    Keyword Arguments:
+    hold                   -- Function called with the QueryResult() of
+                              each query.  If it returns True, the result is
+                              neither notified nor journaled, as the caller
+                              intends to perform the query again.
+                              Default is None.
+    """
+
     # Normal requests
     underlying_session = requests.session()
 
-    # Limit number of workers to 20.
-    # This is probably vastly overkill.
-    if len(site_data) >= 20:
-        max_workers = 20
-    else:
-        max_workers = len(site_data)
+    if proxy_pool is not None:
+        # Spread the requests over the proxies of the pool.
+        proxy_adapter = ProxyPoolAdapter(proxy_pool)
+        underlying_session.mount("http://", proxy_adapter)
+        underlying_session.mount("https://", proxy_adapter)
+
+    owned_scheduler = scheduler is None
+    if owned_scheduler:
+        # Limit number of workers to 20.
+        # This is probably vastly overkill.
+        scheduler = HostScheduler(max_workers=max(1, min(len(site_data), 20)))
 
-    # Create multi-threaded session for all requests.
+    # Create multi-threaded session for all requests.  The requests of this
+    # username are run by the scheduler, in a lane of their own.
     session = SherlockFuturesSession(
-        max_workers=max_workers, session=underlying_session
+        executor=scheduler.lane(username),
+        session=underlying_session,
+        adapter_kwargs={
+            "pool_connections": scheduler.max_workers,
+            "pool_maxsize": scheduler.max_workers,
+        },
     )
 
     # Results from analysis of all sites
     results_total = {}
+    # Futures of the results of the requests still running (None for those
+    # of a failed batch request)
+    request_futures = {}
+    reservations = {}
+    # Sites whose batch request failed
+    batch_failed = {}
+
+    site_items = site_data.items()
+    if meter is not None and meter.max_bytes is not None:
+        # Cheapest probes first, so that as many sites as possible fit
+        # within the budget.
+        site_items = sorted(site_items, key=lambda item: meter.estimate(*item))
 
     # First create futures for all requests. This allows for the requests to run in parallel
-    for social_network, net_info in site_data.items():
-        # Results from analysis of this specific site
-        results_site = {"url_main": net_info.get("urlMain")}
-
-        # Record URL of main site
+    for social_network, net_info in site_items:
+        if journal is not None:
+            result = journal.lookup(username, social_network)
+            if result is not None:
+                # Query was completed by an earlier, interrupted run.
+                if hold is None or not hold(result):
+                    query_notify.update(result)
+                results_total[social_network] = result
+                continue
+
+        if batch is not None:
+            future = batch.submit(
+                username, social_network, session,
+                proxy=proxy, timeout=timeout, meter=meter, capture=capture,
+            )
+            if future is not None:
+                # Query is answered by the batch probe of the site, whose
+                # request is run by the scheduler like the others.
+                request_futures[social_network] = future
+                continue
 
         # A user agent is needed because some sites don't return the correct
         # information since they think that we are bots (Which we actually are...)
@@ -249,16 +686,15 @@ def sherlock(
         regex_check = net_info.get("regexCheck")
         if regex_check and re.search(regex_check, username) is None:
             # No need to do the check at the site: this username is not allowed.
-            results_site["status"] = QueryResult(
-                username, social_network, url, QueryStatus.ILLEGAL
+            result = QueryResult(
+                username, social_network, url, QueryStatus.ILLEGAL,
+                site_url_main=net_info.get("urlMain"),
             )
-            results_site["url_user"] = ""
-            results_site["http_status"] = ""
-            results_site["response_text"] = ""
-            query_notify.update(results_site["status"])
+            query_notify.update(result)
+            if journal is not None:
+                journal.record(username, social_network, result)
+            results_total[social_network] = result
         else:
-            # URL of user on site (if it exists)
-            results_site["url_user"] = url
             url_probe = net_info.get("urlProbe")
             request_method = net_info.get("request_method")
             request_payload = net_info.get("request_payload")
@@ -288,10 +724,10 @@ def sherlock(
                 url_probe = interpolate_string(url_probe, username)
 
             if request is None:
-                if net_info["errorType"] == "status_code":
-                    # In most cases when we are detecting by status code,
-                    # it is not necessary to get the entire body:  we can
-                    # detect fine with just the HEAD response.
+                if probe_method(net_info) == "HEAD":
+                    # In most cases when we are detecting by status code (or
+                    # other headers), it is not necessary to get the entire
+                    # body:  we can detect fine with just the HEAD response.
                     request = session.head
                 else:
                     # Either this detect method needs the content associated
@@ -299,16 +735,52 @@ def sherlock(
                     # not respond properly unless we request the whole page.
                     request = session.get
 
-            if net_info["errorType"] == "response_url":
+            error_types = net_info["errorType"]
+            if isinstance(error_types, str):
+                error_types = [error_types]
+            if any(errtype in ("response_url", "location", "header") for errtype in error_types):
                 # Site forwards request to a different URL if username not
                 # found.  Disallow the redirect so we can capture the
-                # http status from the original URL request.
+                # http status (and headers) from the original URL request.
                 allow_redirects = False
             else:
                 # Allow whatever redirect that the site wants to do.
                 # The final result of the request will be what is available.
                 allow_redirects = True
 
+            if meter is not None:
+                reservations[social_network] = meter.admit(social_network, net_info)
+                if reservations[social_network] is None:
+                    # Not enough budget left for a probe this expensive.
+                    result = QueryResult(
+                        username, social_network, url, QueryStatus.UNKNOWN,
+                        context="Bandwidth budget exhausted",
+                        site_url_main=net_info.get("urlMain"),
+                    )
+                    query_notify.update(result)
+                    results_total[social_network] = result
+                    continue
+
+            if "maxConcurrency" in net_info:
+                # Site does not tolerate as many parallel requests as others.
+                scheduler.set_host_limit(
+                    urlsplit(url_probe).hostname, net_info["maxConcurrency"]
+                )
+
+            # The response is analysed by the worker thread which performed
+            # the request, so that the future holds the result of the query.
+            verdict = partial(
+                evaluate_response,
+                username=username,
+                social_network=social_network,
+                net_info=net_info,
+                url=url,
+                keep_response_text=keep_response_text,
+                meter=meter,
+                reservation=reservations.get(social_network, 0),
+                capture=capture,
+            )
+
             # This future starts running the request in a new thread, doesn't block the main thread
             if proxy is not None:
                 proxies = {"http": proxy, "https": proxy}
@@ -319,6 +791,8 @@ def sherlock(
                     allow_redirects=allow_redirects,
                     timeout=timeout,
                     json=request_payload,
+                    verdict=verdict,
+                    label=social_network,
                 )
             else:
                 future = request(
@@ -327,207 +801,168 @@ def sherlock(
                     allow_redirects=allow_redirects,
                     timeout=timeout,
                     json=request_payload,
+                    verdict=verdict,
+                    label=social_network,
                 )
 
-            # Store future in data for access later
-            net_info["request_future"] = future
-
-        # Add this site's results into final dictionary with all the other results.
-        results_total[social_network] = results_site
+            # Store future for access later.  It is not stored in the site
+            # data itself, which may be shared by concurrent queries.
+            request_futures[social_network] = future
 
     # Rate limiting: sleep between requests to avoid IP bans
     sleep(0.5)
 
-    # Open the file containing account links
-    for social_network, net_info in site_data.items():
-        # Retrieve results again
-        results_site = results_total.get(social_network)
-
-        # Retrieve other site information again
-        url = results_site.get("url_user")
-        status = results_site.get("status")
-        if status is not None:
-            # We have already determined the user doesn't exist here
-            continue
-
-        # Get the expected error type
-        error_type = net_info["errorType"]
-        if isinstance(error_type, str):
-            error_type: list[str] = [error_type]
-
-        # Retrieve future and ensure it has finished
-        future = net_info["request_future"]
-        r, error_text, exception_text = get_response(
-            request_future=future, error_type=error_type, social_network=social_network
-        )
+    try:
+        # Open the file containing account links
+        for social_network, net_info in site_data.items():
+            if social_network in results_total:
+                # We have already determined the result without a request
+                continue
+
+            # The verdict was reached by the worker thread of the request.
+            result = request_futures.pop(social_network).result()
+            if result is None:
+                # The batch request of the site failed:  the site is asked
+                # about the username on its own below.
+                batch_failed[social_network] = net_info
+                continue
+
+            if hold is None or not hold(result):
+                query_notify.update(result)
+                if journal is not None:
+                    journal.record(username, social_network, result)
+
+            # Add this site's results into final dictionary with all of the other results.
+            results_total[social_network] = result
+
+        if batch_failed:
+            results_total.update(query_sites(
+                username, batch_failed, query_notify,
+                proxy=proxy, timeout=timeout,
+                journal=journal, scheduler=scheduler, proxy_pool=proxy_pool,
+                meter=meter, keep_response_text=keep_response_text,
+                capture=capture, hold=hold,
+            ))
+    except BaseException:
+        # Interrupted (e.g. CTRL-C):  do not wait for the requests which have
+        # not even started yet.  Everything finished so far is already in the
+        # journal, if there is one.
+        session.executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        if owned_scheduler:
+            scheduler.shutdown(wait=False)
+
+    # Keep the order of the site data.
+    return {site_name: results_total[site_name] for site_name in site_data}
 
-        # Get response time for response of our request.
-        try:
-            response_time = r.elapsed
-        except AttributeError:
-            response_time = None
 
-        # Attempt to get request information
-        try:
-            http_status = r.status_code
-        except Exception:
-            http_status = "?"
-        try:
-            response_text = r.text.encode(r.encoding or "UTF-8")
-        except Exception:
-            response_text = ""
+def timeout_check(value):
+    """Check Timeout Argument.
 
-        query_status = QueryStatus.UNKNOWN
-        error_context = None
+    Checks timeout for validity.
 
-        # As WAFs advance and evolve, they will occasionally block Sherlock and
-        # lead to false positives and negatives. Fingerprints should be added
-        # here to filter results that fail to bypass WAFs. Fingerprints should
-        # be highly targetted. Comment at the end of each fingerprint to
-        # indicate target and date fingerprinted.
-        WAFHitMsgs = [
-            r'.loading-spinner{visibility:hidden}body.no-js .challenge-running{display:none}body.dark{background-color:#222;color:#d9d9d9}body.dark a{color:#fff}body.dark a:hover{color:#ee730a;text-decoration:underline}body.dark .lds-ring div{border-color:#999 transparent transparent}body.dark .font-red{color:#b20f03}body.dark', # 2024-05-13 Cloudflare
-            r'<span id="challenge-error-text">', # 2024-11-11 Cloudflare error page
-            r'AwsWafIntegration.forceRefreshToken', # 2024-11-11 Cloudfront (AWS)
-            r'{return l.onPageView}}),Object.defineProperty(r,"perimeterxIdentifiers",{enumerable:' # 2024-04-09 PerimeterX / Human Security
-        ]
+    Keyword Arguments:
+    value                  -- Time in seconds to wait before timing out request.
 
-        if error_text is not None:
-            error_context = error_text
+    Return Value:
+    Floating point number representing the time (in seconds) that should be
+    used for the timeout.
 
-        elif any(hitMsg in r.text for hitMsg in WAFHitMsgs):
-            query_status = QueryStatus.WAF
+    NOTE:  Will raise an exception if the timeout in invalid.
+    """
 
-        else:
-            if any(errtype not in ["message", "status_code", "response_url"] for errtype in error_type):
-                error_context = f"Unknown error type '{error_type}' for {social_network}"
-                query_status = QueryStatus.UNKNOWN
-            else:
-                if "message" in error_type:
-                    # error_flag True denotes no error found in the HTML
-                    # error_flag False denotes error found in the HTML
-                    error_flag = True
-                    errors = net_info.get("errorMsg")
-                    # errors will hold the error message
-                    # it can be string or list
-                    # by isinstance method we can detect that
-                    # and handle the case for strings as normal procedure
-                    # and if its list we can iterate the errors
-                    if isinstance(errors, str):
-                        # Checks if the error message is in the HTML
-                        # if error is present we will set flag to False
-                        if errors in r.text:
-                            error_flag = False
-                    else:
-                        # If it's list, it will iterate all the error message
-                        for error in errors:
-                            if error in r.text:
-                                error_flag = False
-                                break
-                    if error_flag:
-                        query_status = QueryStatus.CLAIMED
-                    else:
-                        query_status = QueryStatus.AVAILABLE
+    float_value = float(value)
 
-                if "status_code" in error_type and query_status is not QueryStatus.AVAILABLE:
-                    error_codes = net_info.get("errorCode")
-                    query_status = QueryStatus.CLAIMED
+    if float_value <= 0:
+        raise ArgumentTypeError(
+            f"Invalid timeout value: {value}. Timeout must be a positive number."
+        )
 
-                    # Type consistency, allowing for both singlets and lists in manifest
-                    if isinstance(error_codes, int):
-                        error_codes = [error_codes]
+    return float_value
 
-                    if error_codes is not None and r.status_code in error_codes:
-                        query_status = QueryStatus.AVAILABLE
-                    elif r.status_code >= 300 or r.status_code < 200:
-                        query_status = QueryStatus.AVAILABLE
 
-                if "response_url" in error_type and query_status is not QueryStatus.AVAILABLE:
-                    # For this detection method, we have turned off the redirect.
-                    # So, there is no need to check the response URL: it will always
-                    # match the request.  Instead, we will ensure that the response
-                    # code indicates that the request was successful (i.e. no 404, or
-                    # forward to some odd redirect).
-                    if 200 <= r.status_code < 300:
-                        query_status = QueryStatus.CLAIMED
-                    else:
-                        query_status = QueryStatus.AVAILABLE
+def positive_int_check(value):
+    """Check Positive Integer Argument.
 
-        if dump_response:
-            print("+++++++++++++++++++++")
-            print(f"TARGET NAME   : {social_network}")
-            print(f"USERNAME      : {username}")
-            print(f"TARGET URL    : {url}")
-            print(f"TEST METHOD   : {error_type}")
-            try:
-                print(f"STATUS CODES  : {net_info['errorCode']}")
-            except KeyError:
-                pass
-            print("Results...")
-            try:
-                print(f"RESPONSE CODE : {r.status_code}")
-            except Exception:
-                pass
-            try:
-                print(f"ERROR TEXT    : {net_info['errorMsg']}")
-            except KeyError:
-                pass
-            print(">>>>> BEGIN RESPONSE TEXT")
-            try:
-                print(r.text)
-            except Exception:
-                pass
-            print("<<<<< END RESPONSE TEXT")
-            print("VERDICT       : " + str(query_status))
-            print("+++++++++++++++++++++")
-
-        # Notify caller about results of query.
-        result: QueryResult = QueryResult(
-            username=username,
-            site_name=social_network,
-            site_url_user=url,
-            status=query_status,
-            query_time=response_time,
-            context=error_context,
-        )
-        query_notify.update(result)
+    Keyword Arguments:
+    value                  -- String containing the argument.
 
-        # Save status of request
-        results_site["status"] = result
+    Return Value:
+    Integer value of the argument.
 
-        # Save results from request
-        results_site["http_status"] = http_status
-        results_site["response_text"] = response_text
+    NOTE:  Will raise an exception if the value is not a positive integer.
+    """
 
-        # Add this site's results into final dictionary with all of the other results.
-        results_total[social_network] = results_site
+    try:
+        int_value = int(value)
+    except ValueError:
+        int_value = 0
 
-    return results_total
+    if int_value <= 0:
+        raise ArgumentTypeError(
+            f"Invalid value: {value}. Must be a positive integer."
+        )
 
+    return int_value
 
-def timeout_check(value):
-    """Check Timeout Argument.
 
-    Checks timeout for validity.
+def bytes_check(value):
+    """Check Bytes Argument.
 
     Keyword Arguments:
-    value                  -- Time in seconds to wait before timing out request.
+    value                  -- String containing a number of bytes, optionally
+                              followed by a K, M or G suffix (powers of 1024).
 
     Return Value:
-    Floating point number representing the time (in seconds) that should be
-    used for the timeout.
+    Integer number of bytes.
 
-    NOTE:  Will raise an exception if the timeout in invalid.
+    NOTE:  Will raise an exception if the value is invalid.
     """
 
-    float_value = float(value)
+    multipliers = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+    number = value.strip().upper().rstrip("B")
+    multiplier = 1
+    if number and number[-1] in multipliers:
+        multiplier = multipliers[number[-1]]
+        number = number[:-1]
 
-    if float_value <= 0:
+    try:
+        int_value = int(float(number) * multiplier)
+    except ValueError:
+        int_value = 0
+
+    if int_value <= 0:
         raise ArgumentTypeError(
-            f"Invalid timeout value: {value}. Timeout must be a positive number."
+            f"Invalid number of bytes: {value}. Must be a positive number, e.g. 500M or 2G."
         )
 
-    return float_value
+    return int_value
+
+
+def capture_status_check(value):
+    """Check Capture Status Argument.
+
+    Keyword Arguments:
+    value                  -- String containing the name of a result status
+                              (e.g. "claimed"), or an HTTP status code.
+
+    Return Value:
+    QueryStatus() value, or integer HTTP status code.
+
+    NOTE:  Will raise an exception if the value is neither.
+    """
+
+    if value.isdigit() and 100 <= int(value) <= 599:
+        return int(value)
+    for status in QueryStatus:
+        if status.value.lower() == value.lower():
+            return status
+
+    raise ArgumentTypeError(
+        f"Invalid status: {value}. Must be one of "
+        f"{', '.join(status.value.lower() for status in QueryStatus)}, or an HTTP status code."
+    )
 
 
 def proxy_check(value):
@@ -547,10 +982,10 @@ def proxy_check(value):
         return value
 
     # Basic validation for proxy URL formats
-    valid_schemes = ['http://', 'https://', 'socks4://', 'socks5://']
+    valid_schemes = ['http://', 'https://', 'socks4://', 'socks4a://', 'socks5://', 'socks5h://']
     if not any(value.startswith(scheme) for scheme in valid_schemes):
         raise ArgumentTypeError(
-            f"Invalid proxy URL: {value}. Must start with http://, https://, socks4://, or socks5://"
+            f"Invalid proxy URL: {value}. Must start with http://, https://, socks4://, socks4a://, socks5://, or socks5h://"
         )
 
     # Check for basic URL structure
@@ -562,6 +997,27 @@ def proxy_check(value):
     return value
 
 
+def tor_instance_check(value):
+    """Check Tor Instance Argument.
+
+    Keyword Arguments:
+    value                  -- String of the form "SOCKS_PORT" or
+                              "SOCKS_PORT:CONTROL_PORT".
+
+    Return Value:
+    PoolProxy() object for the Tor instance.
+
+    NOTE:  Will raise an exception if the value is malformed.
+    """
+
+    try:
+        return parse_tor_instance(value)
+    except ValueError:
+        raise ArgumentTypeError(
+            f"Invalid Tor instance: {value}. Must be SOCKS_PORT or SOCKS_PORT:CONTROL_PORT"
+        )
+
+
 def handler(signal_received, frame):
     """Exit gracefully without throwing errors
 
@@ -570,85 +1026,578 @@ def handler(signal_received, frame):
     sys.exit(0)
 
 
-def main() -> None:
+def check_for_update(cache):
+    """Check For Update.
+
+    Keyword Arguments:
+    cache                  -- Object of type ResourceCache() through which
+                              the latest release is looked up.
+
+    Return Value:
+    String telling the user about a newer version of Sherlock, or None if
+    this is the latest version.
+    """
+
+    latest_release_json = json_loads(cache.fetch(forge_api_latest_release, timeout=10))
+    latest_remote_tag = latest_release_json.get("tag_name")
+
+    if latest_remote_tag and latest_remote_tag.lstrip('v') != __version__:
+        return (
+            f"Update available! {__version__} --> {latest_remote_tag.lstrip('v')}"
+            f"\n{latest_release_json.get('html_url', '')}"
+        )
+
+    return None
+
+
+def start_update_check(cache):
+    """Start Update Check.
+
+    Run check_for_update() on a background thread, so that it never holds up
+    the queries.  The thread does not keep the process alive.
+
+    Keyword Arguments:
+    cache                  -- Object of type ResourceCache().
+
+    Return Value:
+    Future for the result of check_for_update().
+    """
+
+    future = Future()
+
+    def run():
+        try:
+            future.set_result(check_for_update(cache))
+        except Exception as error:
+            future.set_exception(error)
+
+    Thread(target=run, daemon=True).start()
+
+    return future
+
+
+def compile_manifest(argv) -> None:
+    """Compile Manifest.
+
+    Entry point of "sherlock manifest compile", which writes the site list
+    and the upstream exclusions to a snapshot file for --json.
+
+    Keyword Arguments:
+    argv                   -- List of command line arguments following
+                              "manifest compile".
+
+    Return Value:
+    Nothing.
+    """
+
     parser = ArgumentParser(
-        formatter_class=RawDescriptionHelpFormatter,
-        description=f"{__longname__} (Version {__version__})",
-    )
-    parser.add_argument(
-        "--version",
-        action="version",
-        version=f"{__shortname__} v{__version__}",
-        help="Display version information and dependencies.",
-    )
-    parser.add_argument(
-        "--verbose",
-        "-v",
-        "-d",
-        "--debug",
-        action="store_true",
-        dest="verbose",
-        default=False,
-        help="Display extra debugging information and metrics.",
+        prog="sherlock manifest compile",
+        description="Compile the site list and the upstream exclusions into a "
+        "snapshot file, which loads in a single read when given to --json.",
     )
     parser.add_argument(
-        "--folderoutput",
-        "-fo",
-        dest="folderoutput",
-        help="If using multiple usernames, the output of the results will be saved to this folder.",
+        "--json",
+        "-j",
+        metavar="JSON_FILE",
+        dest="json_file",
+        action="append",
+        default=None,
+        help="Compile data from a JSON file or an online, valid, JSON file "
+        "(Default: the online site list). Repeat to merge several files.",
     )
     parser.add_argument(
         "--output",
         "-o",
+        metavar="SNAPSHOT_FILE",
         dest="output",
-        help="If using single username, the output of the result will be saved to this file.",
+        default="data.snapshot",
+        help="Snapshot file to write (Default: data.snapshot).",
     )
     parser.add_argument(
-        "--csv",
+        "--ignore-exclusions",
         action="store_true",
-        dest="csv",
+        dest="ignore_exclusions",
         default=False,
-        help="Create Comma-Separated Values (CSV) File.",
+        help="Do not include upstream exclusions in the snapshot.",
     )
     parser.add_argument(
-        "--xlsx",
+        "--no-cache",
         action="store_true",
-        dest="xlsx",
+        dest="no_cache",
         default=False,
-        help="Create the standard file for the modern Microsoft Excel spreadsheet (xlsx).",
-    )
-    parser.add_argument(
-        "--site",
-        action="append",
-        metavar="SITE_NAME",
-        dest="site_list",
-        default=[],
-        help="Limit analysis to just the listed sites. Add multiple options to specify more than one site.",
+        help="Do not use cached copies of the site list and exclusions.",
     )
     parser.add_argument(
-        "--proxy",
-        "-p",
-        metavar="PROXY_URL",
-        action="store",
-        dest="proxy",
-        type=proxy_check,
+        "--cache-dir",
+        metavar="CACHE_DIR",
+        dest="cache_dir",
         default=None,
-        help="Make requests over a proxy. e.g. socks5://127.0.0.1:1080",
+        help="Directory keeping local copies of the site list and exclusions.",
     )
-    parser.add_argument(
-        "--dump-response",
-        action="store_true",
-        dest="dump_response",
-        default=False,
-        help="Dump the HTTP response to stdout for targeted debugging.",
+    args = parser.parse_args(argv)
+
+    if not args.output.lower().endswith(".snapshot"):
+        print("ERROR:  The snapshot file name must end in '.snapshot'.")
+        sys.exit(1)
+
+    try:
+        sites = SitesInformation(
+            data_file_path=args.json_file,
+            honor_exclusions=not args.ignore_exclusions,
+            cache=None if args.no_cache else ResourceCache(directory=args.cache_dir),
+        )
+        sites.save_snapshot(args.output)
+    except Exception as error:
+        print(f"ERROR:  {error}")
+        sys.exit(1)
+
+    print(f"Compiled {len(sites)} sites into '{args.output}'.")
+
+
+def calibrate_manifest(argv) -> None:
+    """Calibrate Manifest.
+
+    Entry point of "sherlock manifest calibrate", which finds the cheapest
+    probe telling claimed and unclaimed usernames apart for each site, and
+    records it in the overlay file used by later runs.
+
+    Keyword Arguments:
+    argv                   -- List of command line arguments following
+                              "manifest calibrate".
+
+    Return Value:
+    Nothing.
+    """
+
+    parser = ArgumentParser(
+        prog="sherlock manifest calibrate",
+        description="Probe each site with HEAD, ranged GET and full GET requests, "
+        "and record the cheapest one which still tells claimed and unclaimed "
+        "usernames apart in the overlay file used by later runs.",
+    )
+    parser.add_argument(
+        "--json",
+        "-j",
+        metavar="JSON_FILE",
+        dest="json_file",
+        action="append",
+        default=None,
+        help="Calibrate the sites of a JSON file or an online, valid, JSON file "
+        "(Default: the online site list). Repeat to merge several files.",
+    )
+    parser.add_argument(
+        "--site",
+        action="append",
+        metavar="SITE_NAME",
+        dest="site_list",
+        default=[],
+        help="Limit calibration to just the listed sites. Add multiple options "
+        "to specify more than one site.",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        metavar="OVERLAY_FILE",
+        dest="output",
+        default=None,
+        help="Overlay file to update (Default: overlay.json in the cache directory).",
+    )
+    parser.add_argument(
+        "--range-bytes",
+        metavar="BYTES",
+        dest="range_bytes",
+        type=int,
+        default=RANGE_BYTES,
+        help=f"Size of the start of the page requested by ranged probes (Default: {RANGE_BYTES}).",
+    )
+    parser.add_argument(
+        "--timeout",
+        metavar="TIMEOUT",
+        dest="timeout",
+        type=timeout_check,
+        default=30,
+        help="Time (in seconds) to wait for response to requests (Default: 30).",
+    )
+    parser.add_argument(
+        "--proxy",
+        "-p",
+        metavar="PROXY_URL",
+        dest="proxy",
+        type=proxy_check,
+        default=None,
+        help="Make requests over a proxy. e.g. socks5://127.0.0.1:1080",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        dest="no_cache",
+        default=False,
+        help="Do not use cached copies of the site list and exclusions.",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        metavar="CACHE_DIR",
+        dest="cache_dir",
+        default=None,
+        help="Directory keeping local copies of the site list and exclusions.",
+    )
+    args = parser.parse_args(argv)
+
+    output = args.output or default_overlay_path(args.cache_dir)
+    try:
+        sites = SitesInformation(
+            data_file_path=args.json_file,
+            do_not_exclude=args.site_list,
+            cache=None if args.no_cache else ResourceCache(directory=args.cache_dir),
+        )
+        site_data = sites.select(names=args.site_list or None)
+        overlay = load_overlay(output) if os.path.exists(output) else {}
+    except Exception as error:
+        print(f"ERROR:  {error}")
+        sys.exit(1)
+
+    if site_data.missing:
+        site_missing = [f"'{site}'" for site in site_data.missing]
+        print(f"Error: Desired sites not found: {', '.join(site_missing)}.")
+
+    calibrated, failed = calibrate(
+        site_data, timeout=args.timeout, proxy=args.proxy, range_bytes=args.range_bytes
+    )
+    for site_name in site_data:
+        overlay.pop(site_name, None)
+    overlay.update(calibrated)
+    save_overlay(overlay, output)
+
+    probes = {}
+    for entry in calibrated.values():
+        probes[entry["probe"]] = probes.get(entry["probe"], 0) + 1
+    summary = ", ".join(f"{count} {probe}" for probe, count in sorted(probes.items()))
+    print(f"Calibrated {len(calibrated)} sites ({summary or 'none'}) into '{output}'.")
+    if failed:
+        print(f"No probe told the usernames apart for {len(failed)} sites: {', '.join(failed)}.")
+
+
+def query_results(argv) -> None:
+    """Query Results.
+
+    Entry point of "sherlock query", which looks up the results kept by
+    --store.
+
+    Keyword Arguments:
+    argv                   -- List of command line arguments following
+                              "query".
+
+    Return Value:
+    Nothing.
+    """
+
+    statuses = {status.value.lower(): status for status in QueryStatus}
+    parser = ArgumentParser(
+        prog="sherlock query",
+        description="Look up the results kept in a store written with --store.",
+    )
+    parser.add_argument(
+        "store",
+        metavar="STORE_FILE",
+        help="Store file written with --store.",
+    )
+    parser.add_argument(
+        "--username",
+        "-u",
+        action="append",
+        metavar="USERNAME",
+        dest="usernames",
+        default=[],
+        help="Limit to the listed usernames. Add multiple options to specify more than one.",
+    )
+    parser.add_argument(
+        "--site",
+        action="append",
+        metavar="SITE_NAME",
+        dest="sites",
+        default=[],
+        help="Limit to the listed sites. Add multiple options to specify more than one.",
+    )
+    parser.add_argument(
+        "--status",
+        action="append",
+        choices=sorted(statuses),
+        dest="statuses",
+        default=[],
+        help="Limit to the listed statuses. Add multiple options to specify more than one.",
+    )
+    parser.add_argument(
+        "--ndjson",
+        action="store_true",
+        dest="ndjson",
+        default=False,
+        help="Print one JSON record per result, rather than tab separated columns.",
+    )
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.store):
+        print(f"ERROR:  Store file '{args.store}' not found.")
+        sys.exit(1)
+
+    rows = query_store(
+        args.store,
+        usernames=args.usernames,
+        sites=args.sites,
+        statuses=[statuses[status] for status in args.statuses],
+    )
+    try:
+        for row in rows:
+            if args.ndjson:
+                print(json_dumps(row, separators=(",", ":")))
+            else:
+                print("\t".join([row["username"], row["site"], row["status"], row["url_user"] or ""]))
+    except Exception as error:
+        print(f"ERROR:  {error}")
+        sys.exit(1)
+
+
+def main() -> None:
+    # Subcommands are told apart from usernames by their exact words, in
+    # first position.  Usernames spelled like them are searched for when
+    # "--" comes first (e.g. "sherlock -- query"), or after any option.
+    if sys.argv[1:3] == ["manifest", "compile"]:
+        compile_manifest(sys.argv[3:])
+        return
+    if sys.argv[1:3] == ["manifest", "calibrate"]:
+        calibrate_manifest(sys.argv[3:])
+        return
+    if sys.argv[1:2] == ["query"]:
+        query_results(sys.argv[2:])
+        return
+
+    parser = ArgumentParser(
+        formatter_class=RawDescriptionHelpFormatter,
+        description=f"{__longname__} (Version {__version__})",
+        epilog="subcommands:\n"
+        "  sherlock query STORE ...        Look up the results kept with --store.\n"
+        "  sherlock manifest compile ...   Compile the site list into a snapshot.\n"
+        "  sherlock manifest calibrate ... Calibrate the probes of the sites.\n"
+        "\n"
+        "To search for usernames spelled like a subcommand, put \"--\" before\n"
+        "them:  sherlock -- query",
+    )
+    parser.add_argument(
+        "--version",
+        action="version",
+        version=f"{__shortname__} v{__version__}",
+        help="Display version information and dependencies.",
+    )
+    parser.add_argument(
+        "--verbose",
+        "-v",
+        "-d",
+        "--debug",
+        action="store_true",
+        dest="verbose",
+        default=False,
+        help="Display extra debugging information and metrics.",
+    )
+    parser.add_argument(
+        "--folderoutput",
+        "-fo",
+        dest="folderoutput",
+        help="If using multiple usernames, the output of the results will be saved to this folder.",
+    )
+    parser.add_argument(
+        "--output",
+        "-o",
+        dest="output",
+        help="If using single username, the output of the result will be saved to this file.",
+    )
+    parser.add_argument(
+        "--ndjson",
+        nargs="?",
+        const="-",
+        metavar="FILE",
+        dest="ndjson",
+        default=None,
+        help="Write one JSON record per result, as they arrive, to FILE or to the "
+        "standard output (\"-\", the default when FILE is left out, in which case "
+        "everything else is printed to the standard error). Put it after the "
+        "usernames when leaving FILE out.",
+    )
+    parser.add_argument(
+        "--ndjson-summary",
+        action="store_true",
+        dest="ndjson_summary",
+        default=False,
+        help="Also write a summary record once each username is checked.",
+    )
+    parser.add_argument(
+        "--store",
+        metavar="STORE_FILE",
+        dest="store",
+        default=None,
+        help="Keep the results of all the usernames in a single SQLite database, "
+        "replacing earlier results of the same queries. Look them up with "
+        "\"sherlock query STORE_FILE\".",
+    )
+    parser.add_argument(
+        "--dataset",
+        metavar="DIRECTORY",
+        dest="dataset",
+        default=None,
+        help="Write the results of all the usernames to a columnar dataset in DIRECTORY, "
+        "as they arrive, with one partition per run (requires pyarrow).",
+    )
+    parser.add_argument(
+        "--dataset-format",
+        choices=sorted(QueryNotifyDataset.extensions),
+        dest="dataset_format",
+        default="parquet",
+        help="Format of the files of the dataset: Parquet (the default) or Arrow IPC.",
+    )
+    parser.add_argument(
+        "--csv",
+        action="store_true",
+        dest="csv",
+        default=False,
+        help="Create Comma-Separated Values (CSV) File.",
+    )
+    parser.add_argument(
+        "--xlsx",
+        action="store_true",
+        dest="xlsx",
+        default=False,
+        help="Create the standard file for the modern Microsoft Excel spreadsheet (xlsx).",
+    )
+    parser.add_argument(
+        "--xlsx-workbook",
+        metavar="FILE",
+        dest="xlsx_workbook",
+        default=None,
+        help="Write the results of all the usernames to a single Excel workbook FILE, "
+        "with a sheet per username.",
+    )
+    parser.add_argument(
+        "--xlsx-combined",
+        action="store_true",
+        dest="xlsx_combined",
+        default=False,
+        help="Put all the usernames on a single sheet of the --xlsx-workbook.",
+    )
+    parser.add_argument(
+        "--site",
+        action="append",
+        metavar="SITE_NAME",
+        dest="site_list",
+        default=[],
+        help="Limit analysis to just the listed sites. Add multiple options to specify more than one site.",
+    )
+    parser.add_argument(
+        "--proxy",
+        "-p",
+        metavar="PROXY_URL",
+        action="store",
+        dest="proxy",
+        type=proxy_check,
+        default=None,
+        help="Make requests over a proxy. e.g. socks5://127.0.0.1:1080",
+    )
+    parser.add_argument(
+        "--proxy-pool",
+        metavar="PROXY_URL",
+        action="append",
+        dest="proxy_pool",
+        type=proxy_check,
+        default=[],
+        help="Spread requests over a pool of proxies. Add multiple options to specify more than one proxy.",
+    )
+    parser.add_argument(
+        "--proxy-file",
+        metavar="PROXY_FILE",
+        action="store",
+        dest="proxy_file",
+        default=None,
+        help="Add the proxies listed in this file (one URL per line) to the proxy pool.",
+    )
+    parser.add_argument(
+        "--tor",
+        metavar="SOCKS_PORT[:CONTROL_PORT]",
+        action="append",
+        dest="tor_instances",
+        type=tor_instance_check,
+        default=[],
+        help="Add a local Tor instance to the proxy pool. With a control port, its circuit is renewed when it fails.",
+    )
+    parser.add_argument(
+        "--proxy-strategy",
+        action="store",
+        dest="proxy_strategy",
+        choices=PROXY_STRATEGIES,
+        default="least-load",
+        help="How requests are spread over the proxy pool (Default: least-load)",
+    )
+    parser.add_argument(
+        "--fallback-proxy",
+        metavar="PROXY_URL",
+        action="append",
+        dest="fallback_proxy",
+        type=proxy_check,
+        default=[],
+        help="Retry queries blocked by bot detection or rate limiting through this proxy, at a slower rate. Add multiple options to spread retries over several proxies.",
+    )
+    parser.add_argument(
+        "--fallback-workers",
+        action="store",
+        metavar="WORKERS",
+        dest="fallback_workers",
+        type=positive_int_check,
+        default=4,
+        help="Maximum number of retries in flight through the fallback proxy (Default: 4)",
+    )
+    parser.add_argument(
+        "--dump-response",
+        action="store_true",
+        dest="dump_response",
+        default=False,
+        help="Deprecated: capture the responses to "
+        f"{DUMP_RESPONSE_CAPTURE} instead, unless --capture is given.",
+    )
+    parser.add_argument(
+        "--capture",
+        metavar="WARC_FILE",
+        dest="capture",
+        default=None,
+        help="Capture the requests and responses of the probes to a compressed WARC "
+        "file (e.g. results.warc.gz), written in the background, with a CDXJ index "
+        "next to it.",
+    )
+    parser.add_argument(
+        "--capture-site",
+        action="append",
+        metavar="SITE_NAME",
+        dest="capture_sites",
+        default=[],
+        help="Only capture the probes of the listed sites. Add multiple options to "
+        "specify more than one site.",
+    )
+    parser.add_argument(
+        "--capture-status",
+        action="append",
+        metavar="STATUS",
+        dest="capture_statuses",
+        type=capture_status_check,
+        default=[],
+        help="Only capture the probes with the listed results (claimed, available, "
+        "unknown, illegal, waf) or HTTP status codes (e.g. 403). Add multiple options "
+        "to specify more than one.",
     )
     parser.add_argument(
         "--json",
         "-j",
         metavar="JSON_FILE",
         dest="json_file",
+        action="append",
         default=None,
-        help="Load data from a JSON file or an online, valid, JSON file. Upstream PR numbers also accepted.",
+        help="Load data from a JSON file or an online, valid, JSON file. Upstream PR numbers also accepted, "
+        "as well as snapshots written by 'sherlock manifest compile'. "
+        "Repeat to merge several files; sites of later files take precedence.",
     )
     parser.add_argument(
         "--timeout",
@@ -687,6 +1636,14 @@ def main() -> None:
         action="store",
         help="One or more usernames to check with social networks. Check similar usernames using {?} (replace to '_', '-', '.').",
     )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        dest="progress",
+        default=False,
+        help="Show a live status line on the standard error: throughput, requests in "
+        "flight, latency, error and WAF rates, time left and the slowest requests.",
+    )
     parser.add_argument(
         "--browse",
         "-b",
@@ -704,6 +1661,59 @@ def main() -> None:
         help="Force the use of the local data.json file.",
     )
 
+    parser.add_argument(
+        "--cache-dir",
+        metavar="CACHE_DIR",
+        dest="cache_dir",
+        default=None,
+        help="Directory keeping local copies of the site list and exclusions "
+        "(Default: $SHERLOCK_CACHE_DIR, or ~/.cache/sherlock).",
+    )
+
+    parser.add_argument(
+        "--cache-max-age",
+        metavar="SECONDS",
+        dest="cache_max_age",
+        type=timeout_check,
+        default=3600,
+        help="Time (in seconds) during which cached copies of the site list and "
+        "exclusions are used without checking for newer ones (Default: 3600).",
+    )
+
+    parser.add_argument(
+        "--no-update-check",
+        action="store_true",
+        dest="no_update_check",
+        default=False,
+        help="Do not check for a newer version of Sherlock (also disabled by "
+        "setting SHERLOCK_NO_UPDATE_CHECK).",
+    )
+
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        dest="no_cache",
+        default=False,
+        help="Download the site list and exclusions on every run.",
+    )
+
+    parser.add_argument(
+        "--overlay",
+        metavar="OVERLAY_FILE",
+        dest="overlay",
+        default=None,
+        help="Probe the sites as calibrated by \"sherlock manifest calibrate\" "
+        "(Default: overlay.json in the cache directory, if there is one).",
+    )
+
+    parser.add_argument(
+        "--no-overlay",
+        action="store_true",
+        dest="no_overlay",
+        default=False,
+        help="Probe the sites as the site list says, even if they were calibrated.",
+    )
+
     parser.add_argument(
         "--nsfw",
         action="store_true",
@@ -728,25 +1738,105 @@ def main() -> None:
         help="Ignore upstream exclusions (may return more false positives)",
     )
 
+    parser.add_argument(
+        "--journal",
+        metavar="JOURNAL_FILE",
+        dest="journal",
+        default=None,
+        help="Record every finished query to this append-only journal file.",
+    )
+
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        dest="resume",
+        default=False,
+        help="Skip queries already recorded in the journal (requires --journal).",
+    )
+
+    parser.add_argument(
+        "--workers",
+        action="store",
+        metavar="WORKERS",
+        dest="workers",
+        type=positive_int_check,
+        default=20,
+        help="Maximum number of requests in flight, all sites combined (Default: 20)",
+    )
+
+    parser.add_argument(
+        "--max-per-host",
+        action="store",
+        metavar="REQUESTS",
+        dest="max_per_host",
+        type=positive_int_check,
+        default=4,
+        help="Maximum number of requests in flight to any single host (Default: 4)",
+    )
+
+    parser.add_argument(
+        "--parallel-usernames",
+        action="store",
+        metavar="USERNAMES",
+        dest="parallel_usernames",
+        type=positive_int_check,
+        default=1,
+        help="Number of usernames to check at the same time (Default: 1)",
+    )
+
+    parser.add_argument(
+        "--no-batch",
+        action="store_true",
+        dest="no_batch",
+        default=False,
+        help="Query sites with a batch probe about each username on its own, "
+        "even when checking several usernames.",
+    )
+
+    parser.add_argument(
+        "--max-bytes",
+        action="store",
+        metavar="BYTES",
+        dest="max_bytes",
+        type=bytes_check,
+        default=None,
+        help="Stop probing once this many bytes have been transferred, e.g. 500M. Expensive sites are skipped first.",
+    )
+
+    parser.add_argument(
+        "--bytes-report",
+        metavar="REPORT_FILE",
+        dest="bytes_report",
+        default=None,
+        help="Write the number of bytes transferred per site to this CSV file.",
+    )
+
     args = parser.parse_args()
 
-    # If the user presses CTRL-C, exit gracefully without throwing errors
-    signal.signal(signal.SIGINT, handler)
+    # The standard output carries the NDJSON records alone, if they are
+    # written to it:  every message goes to the standard error instead,
+    # from the first one on.
+    stdout = sys.stdout
+    output_redirect = ExitStack()
+    if args.ndjson == "-":
+        output_redirect.enter_context(redirect_stdout(sys.stderr))
 
-    # Check for newer version of Sherlock. If it exists, let the user know about it
-    try:
-        latest_release_raw = requests.get(forge_api_latest_release, timeout=10).text
-        latest_release_json = json_loads(latest_release_raw)
-        latest_remote_tag = latest_release_json.get("tag_name")
-
-        if latest_remote_tag and latest_remote_tag.lstrip('v') != __version__:
-            print(
-                f"Update available! {__version__} --> {latest_remote_tag.lstrip('v')}"
-                f"\n{latest_release_json.get('html_url', '')}"
-            )
+    # Only needed by the command line; kept out of library imports.
+    import signal
+    from colorama import init
 
-    except Exception as error:
-        print(f"A problem occurred while checking for an update: {error}")
+    # If the user presses CTRL-C, or the process is asked to terminate (e.g.
+    # preemption of a spot instance), exit gracefully without throwing errors
+    signal.signal(signal.SIGINT, handler)
+    signal.signal(signal.SIGTERM, handler)
+
+    # Check for newer version of Sherlock in the background; the user is told
+    # about it at the end of the run. Releases are looked up at most once a day.
+    update_check = None
+    if not args.no_update_check and not os.environ.get("SHERLOCK_NO_UPDATE_CHECK"):
+        update_check = start_update_check(
+            ResourceCache(directory=args.cache_dir, max_age=24 * 60 * 60)
+        )
 
     # Make prompts
     if args.proxy is not None:
@@ -769,19 +1859,70 @@ def main() -> None:
         print("You can only use --output with a single username")
         sys.exit(1)
 
+    if args.resume and args.journal is None:
+        print("You can only use --resume together with --journal")
+        sys.exit(1)
+
+    proxy_pool = None
+    pool_proxies = list(args.proxy_pool) + list(args.tor_instances)
+    if args.proxy_file is not None:
+        try:
+            with open(args.proxy_file, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip() and not line.startswith("#"):
+                        pool_proxies.append(proxy_check(line.strip()))
+        except (OSError, ArgumentTypeError) as error:
+            print(f"ERROR:  {error}")
+            sys.exit(1)
+    if pool_proxies:
+        if args.proxy is not None:
+            print("You can only use one of --proxy and a proxy pool.")
+            sys.exit(1)
+        proxy_pool = ProxyPool(pool_proxies, strategy=args.proxy_strategy)
+        healthy = proxy_pool.check(timeout=min(args.timeout, 10))
+        print(f"Using a pool of {len(proxy_pool)} proxies ({healthy} healthy)")
+        if not healthy:
+            print("ERROR:  None of the proxies of the pool is working.")
+            sys.exit(1)
+
+    meter = None
+    if args.max_bytes is not None or args.bytes_report is not None:
+        meter = BandwidthMeter(max_bytes=args.max_bytes)
+
+    fallback = None
+    if len(args.fallback_proxy) == 1:
+        fallback = FallbackRoute(
+            proxy=args.fallback_proxy[0], max_workers=args.fallback_workers
+        )
+    elif args.fallback_proxy:
+        fallback_pool = ProxyPool(args.fallback_proxy, strategy=args.proxy_strategy)
+        healthy = fallback_pool.check(timeout=min(args.timeout, 10))
+        print(f"Using a fallback pool of {len(fallback_pool)} proxies ({healthy} healthy)")
+        if not healthy:
+            print("ERROR:  None of the proxies of the fallback pool is working.")
+            sys.exit(1)
+        fallback = FallbackRoute(
+            proxy_pool=fallback_pool, max_workers=args.fallback_workers,
+        )
+
+    cache = None
+    if not args.no_cache:
+        cache = ResourceCache(directory=args.cache_dir, max_age=args.cache_max_age)
+
     # Create object with all information about sites we are aware of.
     try:
         if args.local:
             sites = SitesInformation(
                 os.path.join(os.path.dirname(__file__), "resources/data.json"),
                 honor_exclusions=False,
+                cache=cache,
             )
         else:
-            json_file_location = args.json_file
-            if args.json_file:
+            json_file_location = []
+            for json_file in args.json_file or []:
                 # If --json parameter is a number, interpret it as a pull request number
-                if args.json_file.isnumeric():
-                    pull_number = args.json_file
+                if json_file.isnumeric():
+                    pull_number = json_file
                     pull_url = f"https://api.github.com/repos/sherlock-project/sherlock/pulls/{pull_number}"
                     pull_request_raw = requests.get(pull_url, timeout=10).text
                     pull_request_json = json_loads(pull_request_raw)
@@ -792,43 +1933,43 @@ def main() -> None:
                         sys.exit(1)
 
                     head_commit_sha = pull_request_json["head"]["sha"]
-                    json_file_location = f"https://raw.githubusercontent.com/sherlock-project/sherlock/{head_commit_sha}/sherlock_project/resources/data.json"
+                    json_file = f"https://raw.githubusercontent.com/sherlock-project/sherlock/{head_commit_sha}/sherlock_project/resources/data.json"
+                json_file_location.append(json_file)
 
             sites = SitesInformation(
                 data_file_path=json_file_location,
                 honor_exclusions=not args.ignore_exclusions,
                 do_not_exclude=args.site_list,
+                cache=cache,
             )
     except Exception as error:
         print(f"ERROR:  {error}")
         sys.exit(1)
 
+    if not args.no_overlay:
+        overlay_file = args.overlay or default_overlay_path(args.cache_dir)
+        try:
+            sites.apply_overlay(load_overlay(overlay_file))
+        except FileNotFoundError:
+            if args.overlay is not None:
+                print(f"ERROR:  Overlay file '{overlay_file}' not found.")
+                sys.exit(1)
+        except (OSError, ValueError) as error:
+            print(f"WARNING:  Ignoring the overlay:  {error}")
+
     if not args.nsfw:
         sites.remove_nsfw_sites(do_not_remove=args.site_list)
 
-    # Create original dictionary from SitesInformation() object.
-    # Eventually, the rest of the code will be updated to use the new object
-    # directly, but this will glue the two pieces together.
-    site_data_all = {site.name: site.information for site in sites}
+    # Site data for the queries, as a view of the SitesInformation() object.
     if args.site_list == []:
         # Not desired to look at a sub-set of sites
-        site_data = site_data_all
+        site_data = sites.select()
     else:
         # User desires to selectively run queries on a sub-set of the site list.
-        # Make sure that the sites are supported & build up pruned site database.
-        site_data = {}
-        site_missing = []
-        for site in args.site_list:
-            counter = 0
-            for existing_site in site_data_all:
-                if site.lower() == existing_site.lower():
-                    site_data[existing_site] = site_data_all[existing_site]
-                    counter += 1
-            if counter == 0:
-                # Build up list of sites not supported for future error message.
-                site_missing.append(f"'{site}'")
-
-        if site_missing:
+        site_data = sites.select(names=args.site_list)
+
+        if site_data.missing:
+            site_missing = [f"'{site}'" for site in site_data.missing]
             print(f"Error: Desired sites not found: {', '.join(site_missing)}.")
 
         if not site_data:
@@ -836,9 +1977,59 @@ def main() -> None:
 
     # Create notify object for query results.
     query_notify = QueryNotifyPrint(
-        result=None, verbose=args.verbose, print_all=args.print_all, browse=args.browse
+        result=None,
+        verbose=args.verbose,
+        print_all=args.print_all,
+        browse=args.browse,
+        color=False if args.no_color else None,
     )
 
+    # Files are written as the results arrive, each username's being
+    # completed as soon as its queries are over.
+    if args.folderoutput:
+        # The usernames results should be stored in a targeted folder.
+        # If the folder doesn't exist, create it first
+        os.makedirs(args.folderoutput, exist_ok=True)
+    claimed_only = args.print_found and not args.print_all
+    sinks = []
+    if args.output_txt:
+        sinks.append(QueryNotifyTxt(
+            args.output or os.path.join(args.folderoutput or "", "{}.txt")
+        ))
+    if args.csv:
+        sinks.append(QueryNotifyCsv(
+            os.path.join(args.folderoutput or "", "{}.csv"),
+            claimed_only=claimed_only,
+        ))
+    if args.xlsx:
+        sinks.append(QueryNotifyXlsx("{}.xlsx", claimed_only=claimed_only))
+    if args.xlsx_workbook is not None:
+        sinks.append(QueryNotifyXlsx(
+            args.xlsx_workbook, claimed_only=claimed_only, combined=args.xlsx_combined
+        ))
+    if args.ndjson is not None:
+        sinks.append(QueryNotifyNdjson(
+            stdout if args.ndjson == "-" else args.ndjson, summaries=args.ndjson_summary
+        ))
+    if args.store is not None:
+        try:
+            sinks.append(QueryNotifyStore(args.store))
+        except Exception as error:
+            print(f"ERROR:  Problem opening store '{args.store}':  {error}")
+            sys.exit(1)
+    if args.dataset is not None:
+        try:
+            sinks.append(QueryNotifyDataset(args.dataset, format=args.dataset_format))
+        except ImportError:
+            print("ERROR:  --dataset requires pyarrow (pip install 'sherlock-project[dataset]').")
+            sys.exit(1)
+
+    journal = None
+    if args.journal is not None:
+        journal = QueryJournal(args.journal)
+        if args.resume:
+            print(f"Resuming: {journal.load()} queries already recorded in {args.journal}")
+
     # Run report on all specified users.
     all_usernames = []
     for username in args.username:
@@ -847,122 +2038,116 @@ def main() -> None:
                 all_usernames.append(name)
         else:
             all_usernames.append(username)
-    for username in all_usernames:
-        results = sherlock(
+    batch = None
+    if len(all_usernames) > 1 and not args.no_batch:
+        # Sites with a batch probe are asked about many usernames at once.
+        batch = BatchProbe(all_usernames, site_data)
+
+    if args.dump_response:
+        print(
+            "WARNING:  --dump-response is deprecated; the responses are "
+            f"captured to '{args.capture or DUMP_RESPONSE_CAPTURE}' instead."
+        )
+        if args.capture is None:
+            args.capture = DUMP_RESPONSE_CAPTURE
+
+    capture = None
+    if args.capture is not None:
+        try:
+            capture = WarcCapture(
+                args.capture, sites=args.capture_sites, statuses=args.capture_statuses
+            )
+        except OSError as error:
+            print(f"ERROR:  Problem opening capture file '{args.capture}':  {error}")
+            sys.exit(1)
+
+    # All requests, whichever username they are for, are run by a single
+    # scheduler, so that no host sees more than its share of them at once.
+    scheduler = HostScheduler(
+        max_workers=args.workers, max_per_host=args.max_per_host
+    )
+
+    notifiers = list(sinks)
+    if args.progress:
+        notifiers.append(QueryNotifyProgress(
+            total=len(all_usernames) * len(site_data), scheduler=scheduler
+        ))
+    if notifiers:
+        # The others take the results in batches, rather than one at a time.
+        query_notify = QueryNotifyMulti(
+            [query_notify] + notifiers, batch_size=256, batch_interval=0.1
+        )
+
+    def report(username):
+        sherlock(
             username,
             site_data,
             query_notify,
-            dump_response=args.dump_response,
             proxy=args.proxy,
             timeout=args.timeout,
+            journal=journal,
+            scheduler=scheduler,
+            proxy_pool=proxy_pool,
+            fallback=fallback,
+            meter=meter,
+            keep_response_text=False,
+            batch=batch,
+            capture=capture,
         )
 
-        if args.output:
-            result_file = args.output
-        elif args.folderoutput:
-            # The usernames results should be stored in a targeted folder.
-            # If the folder doesn't exist, create it first
-            os.makedirs(args.folderoutput, exist_ok=True)
-            result_file = os.path.join(args.folderoutput, f"{username}.txt")
+        # Write out the results still waiting before completing the files.
+        query_notify.flush()
+        for sink in sinks:
+            sink.finish(username)
+
+        if args.progress and sys.stdout.isatty():
+            # Over the status line, which is drawn again afterwards.
+            print("\x1b[K")
         else:
-            result_file = f"{username}.txt"
-
-        if args.output_txt:
-            with open(result_file, "w", encoding="utf-8") as file:
-                exists_counter = 0
-                for website_name in results:
-                    dictionary = results[website_name]
-                    if dictionary.get("status").status == QueryStatus.CLAIMED:
-                        exists_counter += 1
-                        file.write(dictionary["url_user"] + "\n")
-                file.write(f"Total Websites Username Detected On : {exists_counter}\n")
-
-        if args.csv:
-            result_file = f"{username}.csv"
-            if args.folderoutput:
-                # The usernames results should be stored in a targeted folder.
-                # If the folder doesn't exist, create it first
-                os.makedirs(args.folderoutput, exist_ok=True)
-                result_file = os.path.join(args.folderoutput, result_file)
-
-            with open(result_file, "w", newline="", encoding="utf-8") as csv_report:
-                writer = csv.writer(csv_report)
-                writer.writerow(
-                    [
-                        "username",
-                        "name",
-                        "url_main",
-                        "url_user",
-                        "exists",
-                        "http_status",
-                        "response_time_s",
-                    ]
-                )
-                for site in results:
-                    if (
-                        args.print_found
-                        and not args.print_all
-                        and results[site]["status"].status != QueryStatus.CLAIMED
-                    ):
-                        continue
-
-                    response_time_s = results[site]["status"].query_time
-                    if response_time_s is None:
-                        response_time_s = ""
-                    writer.writerow(
-                        [
-                            username,
-                            site,
-                            results[site]["url_main"],
-                            results[site]["url_user"],
-                            str(results[site]["status"].status),
-                            results[site]["http_status"],
-                            response_time_s,
-                        ]
-                    )
-        if args.xlsx:
-            usernames = []
-            names = []
-            url_main = []
-            url_user = []
-            exists = []
-            http_status = []
-            response_time_s = []
-
-            for site in results:
-                if (
-                    args.print_found
-                    and not args.print_all
-                    and results[site]["status"].status != QueryStatus.CLAIMED
-                ):
-                    continue
+            print()
 
-                if response_time_s is None:
-                    response_time_s.append("")
-                else:
-                    response_time_s.append(results[site]["status"].query_time)
-                usernames.append(username)
-                names.append(site)
-                url_main.append(results[site]["url_main"])
-                url_user.append(results[site]["url_user"])
-                exists.append(str(results[site]["status"].status))
-                http_status.append(results[site]["http_status"])
-
-            DataFrame = pd.DataFrame(
-                {
-                    "username": usernames,
-                    "name": names,
-                    "url_main": url_main,
-                    "url_user": url_user,
-                    "exists": exists,
-                    "http_status": http_status,
-                    "response_time_s": response_time_s,
-                }
-            )
-            DataFrame.to_excel(f"{username}.xlsx", sheet_name="sheet1", index=False)
+    username_pool = None
+    try:
+        if args.parallel_usernames > 1:
+            username_pool = ThreadPoolExecutor(max_workers=args.parallel_usernames)
+            for _ in username_pool.map(report, all_usernames):
+                pass
+        else:
+            for username in all_usernames:
+                report(username)
+    finally:
+        # Drop whatever has not started yet when interrupted, and make sure
+        # everything finished so far is on disk.
+        scheduler.shutdown(wait=False, cancel_futures=True)
+        if fallback is not None:
+            fallback.shutdown()
+        if username_pool is not None:
+            username_pool.shutdown(wait=False, cancel_futures=True)
+        if journal is not None:
+            journal.close()
+        if capture is not None:
+            capture.close()
+            if capture.failed:
+                print(f"Capture: {capture.failed} exchanges could not be written to {args.capture}")
+        if meter is not None:
+            if args.bytes_report is not None:
+                meter.write_report(args.bytes_report)
+            if meter.refused:
+                print(f"Bandwidth budget: {meter.refused} probes skipped after {meter.spent} bytes")
+        # Complete the files and close the databases of the sinks, even if
+        # the run was interrupted, so that nothing is left half written.
+        query_notify.finish()
+
+    # Only report the update check if it is already over; never wait for it.
+    if update_check is not None and update_check.done():
+        try:
+            update_notice = update_check.result()
+            if update_notice:
+                print(update_notice)
+        except Exception as error:
+            print(f"A problem occurred while checking for an update: {error}")
 
-        print()
-    query_notify.finish()
+    output_redirect.close()
 
 
 if __name__ == "__main__":
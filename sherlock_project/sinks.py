@@ -0,0 +1,818 @@
+"""Sherlock Sinks Module
+
+This module defines the query notify objects writing the results of queries
+to files as they arrive, instead of once all the queries of a username are
+over.
+"""
+import csv
+import json
+import os
+import sys
+from threading import Lock
+from time import gmtime, monotonic, strftime
+
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+
+# JSON string encoder, leaving non-ASCII characters as they are
+_string = json.encoder.encode_basestring
+
+
+class _Output:
+    """State of the file of one username."""
+    __slots__ = ("file", "path", "temporary", "writer", "claimed", "last_flush")
+
+    def __init__(self, file, path, temporary):
+        self.file = file
+        self.path = path
+        self.temporary = temporary
+        self.writer = None
+        self.claimed = 0
+        self.last_flush = monotonic()
+
+
+class QueryNotifyFile(QueryNotify):
+    """Query Notify File Object.
+
+    Base class of the query notify classes writing the results of each
+    username to a file of its own, as they arrive.  The file is written under
+    a temporary name (the file name followed by ".part") and renamed into
+    place once the username is finished, or once the run is over if it is
+    interrupted first, so that files are never seen half written.  Writes are buffered, and flushed at least every flush_interval
+    seconds, so that the temporary file can be followed (e.g. by "tail -f").
+
+    Subclasses override header(), write() and footer().
+    """
+
+    suffix = ".part"
+
+    def __init__(self, path, claimed_only=False, flush_interval=1.0, buffer_size=65536):
+        """Create Query Notify File Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path of the files, where
+                                  "{}" is replaced by the username.
+        claimed_only           -- Boolean indicating whether to only write the
+                                  results of sites where the username was found.
+                                  Default is False.
+        flush_interval         -- Time in seconds after which written results
+                                  are flushed to the file.
+                                  Default is 1 second.
+        buffer_size            -- Integer indicating the size in bytes of the
+                                  write buffer.
+                                  Default is 64 KiB.
+
+        Return Value:
+        Nothing.
+        """
+
+        super().__init__()
+        self.path = path
+        self.claimed_only = claimed_only
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+
+        # username -> _Output()
+        self._outputs = {}
+        self._lock = Lock()
+
+        return
+
+    def _output(self, username):
+        with self._lock:
+            output = self._outputs.get(username)
+            if output is not None:
+                return output
+
+            path = self.path.replace("{}", username)
+            temporary = path + self.suffix
+            file = open(temporary, "w", newline="", encoding="utf-8", buffering=self.buffer_size)
+            output = _Output(file, path, temporary)
+            self.header(output)
+            self._outputs[username] = output
+
+        return output
+
+    def start(self, message=None):
+        """Notify Start.
+
+        Creates the temporary file of the username.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing username that the series
+                                  of queries are about.
+
+        Return Value:
+        Nothing.
+        """
+
+        if message is not None:
+            self._output(message)
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Writes the query result to the file of its username.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = result
+        output = self._output(result.username)
+        if result.status == QueryStatus.CLAIMED:
+            output.claimed += 1
+        elif self.claimed_only:
+            return
+
+        self.write(output, result)
+        now = monotonic()
+        if now - output.last_flush >= self.flush_interval:
+            output.file.flush()
+            output.last_flush = now
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Completes the file of a username, and renames it into place.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over.
+                                  Default is None, for all the usernames.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            if message is None:
+                outputs = list(self._outputs.values())
+                self._outputs.clear()
+            else:
+                outputs = [self._outputs.pop(message)] if message in self._outputs else []
+
+        for output in outputs:
+            self.footer(output)
+            output.file.close()
+            os.replace(output.temporary, output.path)
+
+        return
+
+    def header(self, output):
+        """Write Header.
+
+        Keyword Arguments:
+        self                   -- This object.
+        output                 -- State of the file, whose "file" attribute is
+                                  the open file.
+
+        Return Value:
+        Nothing.
+        """
+
+        return
+
+    def write(self, output, result):
+        """Write Result.
+
+        Keyword Arguments:
+        self                   -- This object.
+        output                 -- State of the file.
+        result                 -- Object of type QueryResult() to write.
+
+        Return Value:
+        Nothing.
+        """
+
+        return
+
+    def footer(self, output):
+        """Write Footer.
+
+        Keyword Arguments:
+        self                   -- This object.
+        output                 -- State of the file, whose "claimed" attribute
+                                  counts the sites where the username was found.
+
+        Return Value:
+        Nothing.
+        """
+
+        return
+
+
+class QueryNotifyTxt(QueryNotifyFile):
+    """Query Notify Text Object.
+
+    Writes the URLs of the accounts found, one per line, followed by their
+    count.
+    """
+
+    def write(self, output, result):
+        if result.status == QueryStatus.CLAIMED:
+            output.file.write(result.site_url_user + "\n")
+
+    def footer(self, output):
+        output.file.write(f"Total Websites Username Detected On : {output.claimed}\n")
+
+
+class QueryNotifyCsv(QueryNotifyFile):
+    """Query Notify CSV Object.
+
+    Writes one row per query result.
+    """
+
+    columns = [
+        "username",
+        "name",
+        "url_main",
+        "url_user",
+        "exists",
+        "http_status",
+        "response_time_s",
+    ]
+
+    def header(self, output):
+        output.writer = csv.writer(output.file)
+        output.writer.writerow(self.columns)
+
+    def write(self, output, result):
+        output.writer.writerow(
+            [
+                result.username,
+                result.site_name,
+                result.site_url_main,
+                result.site_url_user,
+                str(result.status),
+                result["http_status"],
+                result.query_time if result.query_time is not None else "",
+            ]
+        )
+
+
+class QueryNotifyXlsx(QueryNotify):
+    """Query Notify XLSX Object.
+
+    Writes one row per query result to Excel workbooks, with the columns of
+    the CSV files.  Rows are streamed to disk as they arrive (using the write
+    only mode of openpyxl), so memory does not grow with the results.
+
+    With "{}" in the path, each username gets a workbook of its own, saved as
+    soon as its queries are over.  Otherwise one workbook holds the results of
+    all the usernames, with a sheet per username, or a single sheet when
+    combined, and is saved once the run is over.  Workbooks are saved under a
+    temporary name and renamed into place.
+    """
+
+    columns = QueryNotifyCsv.columns
+    suffix = ".part"
+    # Characters not allowed in sheet titles, and their maximum length
+    _title_forbidden = str.maketrans({c: "_" for c in "[]:*?/\\"})
+    _title_length = 31
+
+    def __init__(self, path, claimed_only=False, combined=False):
+        """Create Query Notify XLSX Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path of the workbooks,
+                                  where "{}" is replaced by the username.
+                                  Without "{}", the path of the workbook of
+                                  the whole run.
+        claimed_only           -- Boolean indicating whether to only write the
+                                  results of sites where the username was found.
+                                  Default is False.
+        combined               -- Boolean indicating whether the workbook of
+                                  the whole run has a single sheet, rather
+                                  than a sheet per username.
+                                  Default is False.
+
+        Return Value:
+        Nothing.
+        """
+
+        # Only needed for spreadsheets.
+        from openpyxl import Workbook
+
+        super().__init__()
+        self.path = path
+        self.claimed_only = claimed_only
+        self.combined = combined
+        self._workbook = Workbook
+
+        self.per_username = "{}" in path
+        # username (or None for the whole run) -> workbook
+        self._workbooks = {}
+        # username -> sheet
+        self._sheets = {}
+        self._titles = set()
+        self._lock = Lock()
+
+        return
+
+    def _title(self, username):
+        title = username.translate(self._title_forbidden)[:self._title_length] or "_"
+        number = 1
+        while title.casefold() in self._titles:
+            number += 1
+            ending = f"~{number}"
+            title = title[:self._title_length - len(ending)] + ending
+        self._titles.add(title.casefold())
+        return title
+
+    def _sheet(self, username):
+        # Called with the lock held.
+        sheet = self._sheets.get(username)
+        if sheet is not None:
+            return sheet
+
+        key = username if self.per_username else None
+        workbook = self._workbooks.get(key)
+        if workbook is None:
+            workbook = self._workbooks[key] = self._workbook(write_only=True)
+        if self.combined and not self.per_username and workbook.worksheets:
+            # The single sheet of the run, already headed.
+            sheet = workbook.worksheets[0]
+        else:
+            if self.per_username:
+                title = "sheet1"
+            elif self.combined:
+                title = "results"
+            else:
+                title = self._title(username)
+            sheet = workbook.create_sheet(title)
+            sheet.append(self.columns)
+        self._sheets[username] = sheet
+
+        return sheet
+
+    def start(self, message=None):
+        """Notify Start.
+
+        Creates the sheet of the username, so that sheets are in the order
+        the usernames are started in.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing username that the series
+                                  of queries are about.
+
+        Return Value:
+        Nothing.
+        """
+
+        if message is not None:
+            with self._lock:
+                self._sheet(message)
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Appends the query result to the sheet of its username.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = result
+        if self.claimed_only and result.status != QueryStatus.CLAIMED:
+            return
+
+        row = [
+            result.username,
+            result.site_name,
+            result.site_url_main,
+            result.site_url_user,
+            str(result.status),
+            result.http_status,
+            result.query_time,
+        ]
+        with self._lock:
+            self._sheet(result.username).append(row)
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Saves the workbook of a username, or of the whole run.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over.
+                                  Default is None, for the end of the run.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            if message is None:
+                workbooks = list(self._workbooks.items())
+                self._workbooks.clear()
+                self._sheets.clear()
+            elif self.per_username and message in self._workbooks:
+                workbooks = [(message, self._workbooks.pop(message))]
+                self._sheets.pop(message, None)
+            else:
+                workbooks = []
+
+        for username, workbook in workbooks:
+            path = self.path.replace("{}", username) if self.per_username else self.path
+            workbook.save(path + self.suffix)
+            os.replace(path + self.suffix, path)
+
+        return
+
+
+class QueryNotifyNdjson(QueryNotify):
+    """Query Notify NDJSON Object.
+
+    Writes one compact JSON record per line for every query result, as they
+    arrive, for all the usernames of a run:
+
+        {"type":"result","username":...,"site":...,"url":...,"status":...,
+         "http_status":...,"query_time":...,"context":...}
+
+    Optionally, a summary record follows the results of each username:
+
+        {"type":"summary","username":...,"total":...,"Claimed":...,...}
+
+    counting its results by status.
+    """
+
+    _encode = json.JSONEncoder(
+        ensure_ascii=False, check_circular=False, separators=(",", ":")
+    ).encode
+
+    def __init__(self, path="-", summaries=False, flush_interval=1.0, buffer_size=65536):
+        """Create Query Notify NDJSON Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path of the file, "-"
+                                  for the standard output, or text file
+                                  object to write to (which is left open).
+                                  Default is "-".
+        summaries              -- Boolean indicating whether to write a
+                                  summary record once each username is over.
+                                  Default is False.
+        flush_interval         -- Time in seconds after which written records
+                                  are flushed.
+                                  Default is 1 second.
+        buffer_size            -- Integer indicating the size in bytes of the
+                                  write buffer of a file.
+                                  Default is 64 KiB.
+
+        Return Value:
+        Nothing.
+        """
+
+        super().__init__()
+        self.summaries = summaries
+        self.flush_interval = flush_interval
+        if path == "-":
+            self.file = sys.stdout
+            self._owned = False
+        elif not isinstance(path, str):
+            self.file = path
+            self._owned = False
+        else:
+            self.file = open(path, "w", encoding="utf-8", buffering=buffer_size)
+            self._owned = True
+
+        # username -> {status value: count}
+        self._counts = {}
+        self._last_flush = monotonic()
+        self._lock = Lock()
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Writes the record of the query result.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.update_batch([result])
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Writes the records of the query results at once.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = results[-1]
+        lines = []
+        for result in results:
+            # Records all have the same shape:  only their strings need
+            # escaping, which is much faster than encoding a dictionary.
+            http_status = "null" if result.http_status is None else int(result.http_status)
+            query_time = "null" if result.query_time is None else repr(float(result.query_time))
+            context = "null" if result.context is None else _string(str(result.context))
+            lines.append(
+                f'{{"type":"result","username":{_string(result.username)},'
+                f'"site":{_string(result.site_name)},"url":{_string(result.site_url_user)},'
+                f'"status":"{result.status.value}","http_status":{http_status},'
+                f'"query_time":{query_time},"context":{context}}}'
+            )
+        self._write("\n".join(lines))
+        if self.summaries:
+            with self._lock:
+                for result in results:
+                    counts = self._counts.setdefault(result.username, {})
+                    counts[result.status.value] = counts.get(result.status.value, 0) + 1
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over, to write its summary.
+                                  Default is None, for the end of the run:
+                                  everything is flushed (and the file closed).
+
+        Return Value:
+        Nothing.
+        """
+
+        if message is not None:
+            if self.summaries:
+                with self._lock:
+                    counts = self._counts.pop(message, {})
+                self._write(self._encode({
+                    "type": "summary",
+                    "username": message,
+                    "total": sum(counts.values()),
+                    **counts,
+                }))
+            return
+
+        with self._lock:
+            if self._owned:
+                self.file.close()
+            else:
+                self.file.flush()
+
+        return
+
+    def _write(self, line):
+        with self._lock:
+            self.file.write(line + "\n")
+            now = monotonic()
+            if now - self._last_flush >= self.flush_interval:
+                self.file.flush()
+                self._last_flush = now
+
+
+class QueryNotifyDataset(QueryNotify):
+    """Query Notify Dataset Object.
+
+    Writes the results of all the usernames of a run to a columnar dataset,
+    in Parquet (or Arrow IPC) files, as they arrive.  Results are gathered
+    into row groups, and files are rolled over after a number of rows.  Each
+    run writes to a partition of its own, in the Hive style:
+
+        <directory>/run=<start time>-<process id>/part-00000.parquet
+
+    so that a whole directory of runs loads at once (e.g. in DuckDB, with
+    read_parquet('<directory>/*/*.parquet', hive_partitioning = true)).
+    Files are written under temporary names, and renamed once complete.
+
+    The status is dictionary encoded, and times are stored as floats (in
+    seconds).  Requires pyarrow.
+    """
+
+    extensions = {"parquet": ".parquet", "arrow": ".arrow"}
+
+    def __init__(self, directory, format="parquet", row_group_size=65536,
+                 rows_per_file=1_000_000, run=None):
+        """Create Query Notify Dataset Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        directory              -- String indicating path of the dataset.
+        format                 -- String indicating the format of the files,
+                                  "parquet" or "arrow" (IPC file format).
+                                  Default is "parquet".
+        row_group_size         -- Integer indicating the number of results
+                                  per row group (or record batch).
+                                  Default is 65536.
+        rows_per_file          -- Integer indicating the number of results
+                                  after which a new file is started.
+                                  Default is 1000000.
+        run                    -- String naming the partition of this run.
+                                  Default is None, for the start time and
+                                  process id.
+
+        Return Value:
+        Nothing.
+
+        NOTE:  Will raise ImportError if pyarrow is not installed.
+        """
+
+        # Only needed for datasets, and slow to import.
+        import pyarrow
+
+        super().__init__()
+        if format not in self.extensions:
+            raise ValueError(f"Unknown dataset format '{format}'.")
+        self.format = format
+        self.row_group_size = row_group_size
+        self.rows_per_file = rows_per_file
+        if run is None:
+            run = strftime("%Y%m%dT%H%M%SZ", gmtime()) + f"-{os.getpid()}"
+        self.directory = os.path.join(directory, f"run={run}")
+
+        self._pa = pyarrow
+        self._statuses = list(QueryStatus)
+        self._status_codes = {status: code for code, status in enumerate(self._statuses)}
+        self._status_dictionary = pyarrow.array([status.value for status in self._statuses])
+        self.schema = pyarrow.schema([
+            ("username", pyarrow.string()),
+            ("site", pyarrow.string()),
+            ("url", pyarrow.string()),
+            ("status", pyarrow.dictionary(pyarrow.int8(), pyarrow.string())),
+            ("http_status", pyarrow.int16()),
+            ("query_time", pyarrow.float64()),
+            ("context", pyarrow.string()),
+        ])
+
+        self._columns = tuple([] for _ in self.schema)
+        self._writer = None
+        self._path = None
+        self._files = 0
+        self._file_rows = 0
+        self._lock = Lock()
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Adds the query result to the current row group.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.update_batch([result])
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Adds the query results to the current row group.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = results[-1]
+        rows = [
+            (
+                result.username,
+                result.site_name,
+                result.site_url_user,
+                self._status_codes[result.status],
+                result.http_status,
+                None if result.query_time is None else float(result.query_time),
+                None if result.context is None else str(result.context),
+            )
+            for result in results
+        ]
+        with self._lock:
+            for row in rows:
+                for column, value in zip(self._columns, row):
+                    column.append(value)
+                if len(self._columns[0]) >= self.row_group_size:
+                    self._write_batch()
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over, which is of no
+                                  consequence.
+                                  Default is None, for the end of the run:
+                                  the last row group is written, and the last
+                                  file completed.
+
+        Return Value:
+        Nothing.
+        """
+
+        if message is not None:
+            return
+
+        with self._lock:
+            if self._columns[0]:
+                self._write_batch()
+            self._close_file()
+
+        return
+
+    def _write_batch(self):
+        pa = self._pa
+        username, site, url, status, http_status, query_time, context = self._columns
+        batch = pa.RecordBatch.from_arrays(
+            [
+                pa.array(username, pa.string()),
+                pa.array(site, pa.string()),
+                pa.array(url, pa.string()),
+                pa.DictionaryArray.from_arrays(pa.array(status, pa.int8()), self._status_dictionary),
+                pa.array(http_status, pa.int16()),
+                pa.array(query_time, pa.float64()),
+                pa.array(context, pa.string()),
+            ],
+            schema=self.schema,
+        )
+        for column in self._columns:
+            column.clear()
+
+        if self._writer is None:
+            self._open_file()
+        if self.format == "parquet":
+            self._writer.write_table(pa.Table.from_batches([batch]))
+        else:
+            self._writer.write_batch(batch)
+        self._file_rows += batch.num_rows
+        if self._file_rows >= self.rows_per_file:
+            self._close_file()
+
+    def _open_file(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._path = os.path.join(
+            self.directory, f"part-{self._files:05d}{self.extensions[self.format]}"
+        )
+        self._files += 1
+        self._file_rows = 0
+        if self.format == "parquet":
+            import pyarrow.parquet
+            self._writer = pyarrow.parquet.ParquetWriter(
+                self._path + ".tmp", self.schema, compression="zstd"
+            )
+        else:
+            self._writer = self._pa.ipc.new_file(self._path + ".tmp", self.schema)
+
+    def _close_file(self):
+        if self._writer is None:
+            return
+        self._writer.close()
+        os.replace(self._path + ".tmp", self._path)
+        self._writer = None
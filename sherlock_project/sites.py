@@ -3,15 +3,32 @@
 This module supports storing information about websites.
 This is the raw data that will be used to search for usernames.
 """
-import json
+import os
 import requests
 import secrets
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+
+from sherlock_project.snapshot import (
+    SNAPSHOT_SUFFIX,
+    cached_snapshot,
+    compile_snapshot,
+    dump_snapshot,
+    host_key,
+    load_entry,
+    load_snapshot,
+)
+from sherlock_project.tuning import apply_probe
 
 
 MANIFEST_URL = "https://raw.githubusercontent.com/sherlock-project/sherlock/master/sherlock_project/resources/data.json"
 EXCLUSIONS_URL = "https://raw.githubusercontent.com/sherlock-project/sherlock/refs/heads/exclusions/false_positive_exclusions.txt"
+LOCAL_MANIFEST = os.path.join(os.path.dirname(__file__), "resources", "data.json")
 
 class SiteInformation:
+    __slots__ = ("name", "url_home", "url_username_format", "username_claimed",
+                 "username_unclaimed", "information", "is_nsfw")
+
     def __init__(self, name, url_home, url_username_format, username_claimed,
                 information, is_nsfw, username_unclaimed=secrets.token_urlsafe(10)):
         """Create Site Information Object.
@@ -75,12 +92,152 @@ class SiteInformation:
         return f"{self.name} ({self.url_home})"
 
 
+class SiteCollection(MutableMapping):
+    """Site Collection Object.
+
+    Dictionary of SiteInformation() objects indexed by site name.  Sites are
+    kept in the compact form of snapshot entries, and only turned into
+    SiteInformation() objects when they are first looked up.
+    """
+
+    def __init__(self, names, entries, nsfw=frozenset(), excluded=frozenset()):
+        """Create Site Collection Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        names                  -- List of site names.
+        entries                -- List of snapshot entries of the sites, in the
+                                  same order as the names.
+        nsfw                   -- Set of names of NSFW sites.
+        excluded               -- Set of names of sites to leave out.
+
+        Return Value:
+        Nothing.
+        """
+
+        self._entries = {
+            site_name: entry for site_name, entry in zip(names, entries)
+            if site_name not in excluded
+        }
+        self._nsfw = nsfw
+        self._sites = {}
+
+        return
+
+    def __getitem__(self, site_name):
+        site = self._sites.get(site_name)
+        if site is None:
+            information = load_entry(self._entries[site_name])
+            site = SiteInformation(site_name,
+                                   information["urlMain"],
+                                   information["url"],
+                                   information["username_claimed"],
+                                   information,
+                                   site_name in self._nsfw
+                                   )
+            # Another thread may have got there first; keep a single object.
+            site = self._sites.setdefault(site_name, site)
+        return site
+
+    def __setitem__(self, site_name, site):
+        self._entries[site_name] = None
+        self._sites[site_name] = site
+
+    def __delitem__(self, site_name):
+        del self._entries[site_name]
+        self._sites.pop(site_name, None)
+
+    def __contains__(self, site_name):
+        return site_name in self._entries
+
+    def __iter__(self):
+        return iter(self._entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SitesView(Mapping):
+    """Sites View Object.
+
+    Read-only selection of the sites of a SitesInformation object, as
+    returned by SitesInformation.select().  It maps site names to the site
+    data dictionaries without copying them, so it can be given as is to
+    sherlock() as the site data.
+    """
+
+    def __init__(self, sites, names, missing=()):
+        """Create Sites View Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        sites                  -- Dictionary of SiteInformation() objects,
+                                  indexed by site name.
+        names                  -- List of names of the selected sites, in
+                                  the order in which they are iterated.
+        missing                -- List of requested site names which did not
+                                  match any site.
+
+        Return Value:
+        Nothing.
+        """
+
+        self._sites = sites
+        self._names = names
+        self._members = frozenset(names)
+        self.missing = list(missing)
+
+        return
+
+    def __getitem__(self, site_name):
+        if site_name not in self._members:
+            raise KeyError(site_name)
+        return self._sites[site_name].information
+
+    def __contains__(self, site_name):
+        return site_name in self._members
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def site(self, site_name):
+        """Get Site.
+
+        Keyword Arguments:
+        self                   -- This object.
+        site_name              -- String which identifies site.
+
+        Return Value:
+        Object of type SiteInformation().
+        """
+
+        if site_name not in self._members:
+            raise KeyError(site_name)
+        return self._sites[site_name]
+
+    def site_name_list(self):
+        """Get Site Name List.
+
+        Keyword Arguments:
+        self                   -- This object.
+
+        Return Value:
+        List of strings containing names of selected sites.
+        """
+
+        return sorted(self._names, key=str.lower)
+
+
 class SitesInformation:
     def __init__(
             self,
-            data_file_path: str|None = None,
+            data_file_path: str|list[str]|None = None,
             honor_exclusions: bool = True,
             do_not_exclude: list[str] = [],
+            cache=None,
         ):
         """Create Sites Information Object.
 
@@ -88,8 +245,15 @@ class SitesInformation:
 
         Keyword Arguments:
         self                   -- This object.
-        data_file_path         -- String which indicates path to data file.
-                                  The file name must end in ".json".
+        data_file_path         -- String which indicates path to data file,
+                                  or list of them for site data sharded
+                                  across several files (sites of later
+                                  files replace sites of the same name in
+                                  earlier ones).
+                                  The file name must end in ".json", or in
+                                  ".snapshot" for a snapshot compiled by
+                                  "sherlock manifest compile" (which then
+                                  carries its own exclusions).
 
                                   There are 3 possible formats:
                                    * Absolute File Format
@@ -109,17 +273,164 @@ class SitesInformation:
                                   the file.
 
                                   If this option is not specified, then a
-                                  default site list will be used.
+                                  default site list will be used.  Should it
+                                  be unreachable, the site list packaged with
+                                  Sherlock is used instead.
+        honor_exclusions       -- Boolean indicating whether to remove the
+                                  sites listed in the upstream exclusions.
+        do_not_exclude         -- List of site names to keep even if they
+                                  are listed in the upstream exclusions.
+        cache                  -- Object of type ResourceCache() keeping
+                                  local copies of the data file (when it is
+                                  a URL) and of the exclusions, as well as
+                                  snapshots compiled from them.
+                                  Default of None downloads and parses them
+                                  every time.
 
         Return Value:
         Nothing.
         """
 
-        if not data_file_path:
+        if isinstance(data_file_path, (list, tuple)) and len(data_file_path) == 1:
+            data_file_path = data_file_path[0]
+
+        if isinstance(data_file_path, str) and data_file_path.lower().endswith(SNAPSHOT_SUFFIX):
+            # Compiled by "sherlock manifest compile", exclusions included.
+            try:
+                snapshot = load_snapshot(data_file_path)
+            except OSError:
+                raise FileNotFoundError(f"Problem while attempting to access "
+                                        f"data file '{data_file_path}'."
+                                        )
+        else:
+            exclusions_future = None
+            if honor_exclusions:
+                # Fetch the exclusions while the data file is being loaded.
+                executor = ThreadPoolExecutor(max_workers=1)
+                exclusions_future = executor.submit(self._fetch_exclusions, cache)
+                executor.shutdown(wait=False)
+
             # The default data file is the live data.json which is in the GitHub repo. The reason why we are using
             # this instead of the local one is so that the user has the most up-to-date data. This prevents
             # users from creating issue about false positives which has already been fixed or having outdated data
-            data_file_path = MANIFEST_URL
+            fallback = not data_file_path
+            if fallback:
+                data_file_path = MANIFEST_URL
+
+            try:
+                if isinstance(data_file_path, str):
+                    manifest = self._read(data_file_path, cache)
+                else:
+                    # Shards are read at the same time, as they may be URLs.
+                    with ThreadPoolExecutor(max_workers=min(len(data_file_path), 8)) as executor:
+                        manifest = list(executor.map(lambda path: self._read(path, cache), data_file_path))
+            except FileNotFoundError:
+                if not fallback:
+                    raise
+                print("Warning: Could not load the online site list, using the packaged one instead.")
+                fallback = False
+                data_file_path = LOCAL_MANIFEST
+                manifest = self._read(data_file_path)
+
+            exclusions = None
+            if honor_exclusions:
+                try:
+                    exclusions = exclusions_future.result()
+                except Exception:
+                    # If there was any problem loading the exclusions, just continue without them
+                    print("Warning: Could not load exclusions, continuing without them.")
+
+            try:
+                snapshot = self._compile(manifest, exclusions, data_file_path, cache)
+            except ValueError:
+                if not fallback:
+                    raise
+                print("Warning: Could not load the online site list, using the packaged one instead.")
+                data_file_path = LOCAL_MANIFEST
+                snapshot = self._compile(self._read(data_file_path), exclusions, data_file_path, cache)
+
+        excluded = set()
+        if honor_exclusions:
+            excluded = set(snapshot["excluded"]).difference(do_not_exclude)
+
+        self._snapshot = snapshot
+        self._nsfw = snapshot["nsfw"]
+        self._nsfw_set = frozenset(self._nsfw)
+
+        # Sites are only turned into SiteInformation() objects when used.
+        self.sites = SiteCollection(snapshot["names"], snapshot["entries"], self._nsfw_set, excluded)
+
+        # Indexes from errorType, host and tag to the names of the sites which
+        # have them come with the snapshot.  Positions and case-folded names
+        # are only indexed once select() needs them.
+        self._positions = None
+        self._names = None
+        self._error_types = snapshot["error_types"]
+        self._hosts = snapshot["hosts"]
+        self._tags = snapshot["tags"]
+
+        return
+
+    @staticmethod
+    def _fetch_exclusions(cache=None):
+        """Fetch Exclusions.
+
+        Keyword Arguments:
+        cache                  -- Object of type ResourceCache() to fetch
+                                  the exclusions through.
+                                  Default of None downloads them.
+
+        Return Value:
+        String containing the names of the excluded sites, one per line.
+        """
+
+        if cache is not None:
+            return cache.fetch(EXCLUSIONS_URL, timeout=10).decode("utf-8")
+
+        response = requests.get(url=EXCLUSIONS_URL, timeout=10)
+        if response.status_code != 200:
+            raise FileNotFoundError(f"Bad response while accessing URL '{EXCLUSIONS_URL}'.")
+        return response.text
+
+    @staticmethod
+    def _compile(manifest, exclusions, origin, cache=None):
+        """Compile Data File.
+
+        Keyword Arguments:
+        manifest               -- Bytes containing the JSON site data, or list
+                                  of them (one per shard).
+        exclusions             -- String containing the names of the excluded
+                                  sites, one per line, or None.
+        origin                 -- String indicating path or URL of the data
+                                  file, or list of them, for error messages.
+        cache                  -- Object of type ResourceCache() whose
+                                  directory keeps compiled snapshots.
+                                  Default of None compiles every time.
+
+        Return Value:
+        Dictionary as returned by compile_snapshot().
+        """
+
+        if cache is None:
+            return compile_snapshot(manifest, exclusions, origin)
+        return cached_snapshot(
+            os.path.join(cache.directory, "snapshots"), manifest, exclusions, origin
+        )
+
+    @staticmethod
+    def _read(data_file_path, cache=None):
+        """Read Data File.
+
+        Keyword Arguments:
+        data_file_path         -- String which indicates path or URL of the
+                                  data file.  See __init__().
+        cache                  -- Object of type ResourceCache() to fetch
+                                  URLs through.
+                                  Default of None downloads them.
+
+        Return Value:
+        Bytes containing the JSON site data.
+        """
 
         # Ensure that specified data file has correct extension.
         if not data_file_path.lower().endswith(".json"):
@@ -129,6 +440,8 @@ class SitesInformation:
         if data_file_path.lower().startswith("http"):
             # Reference is to a URL.
             try:
+                if cache is not None:
+                    return cache.fetch(data_file_path, timeout=30)
                 response = requests.get(url=data_file_path, timeout=30)
             except Exception as error:
                 raise FileNotFoundError(
@@ -139,74 +452,34 @@ class SitesInformation:
                 raise FileNotFoundError(f"Bad response while accessing "
                                         f"data file URL '{data_file_path}'."
                                         )
-            try:
-                site_data = response.json()
-            except Exception as error:
-                raise ValueError(
-                    f"Problem parsing json contents at '{data_file_path}':  {error}."
-                )
+            return response.content
+
+        # Reference is to a file.
+        try:
+            with open(data_file_path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Problem while attempting to access "
+                                    f"data file '{data_file_path}'."
+                                    )
 
-        else:
-            # Reference is to a file.
-            try:
-                with open(data_file_path, "r", encoding="utf-8") as file:
-                    try:
-                        site_data = json.load(file)
-                    except Exception as error:
-                        raise ValueError(
-                            f"Problem parsing json contents at '{data_file_path}':  {error}."
-                        )
+    def save_snapshot(self, path):
+        """Save Snapshot.
 
-            except FileNotFoundError:
-                raise FileNotFoundError(f"Problem while attempting to access "
-                                        f"data file '{data_file_path}'."
-                                        )
+        Write the site data this object was created from, with the
+        exclusions, to a snapshot file which can later be given as the data
+        file.  Sites removed by remove_nsfw_sites() are kept.
 
-        site_data.pop('$schema', None)
-
-        if honor_exclusions:
-            try:
-                response = requests.get(url=EXCLUSIONS_URL, timeout=10)
-                if response.status_code == 200:
-                    exclusions = response.text.splitlines()
-                    exclusions = [exclusion.strip() for exclusion in exclusions]
-
-                    for site in do_not_exclude:
-                        if site in exclusions:
-                            exclusions.remove(site)
-
-                    for exclusion in exclusions:
-                        try:
-                            site_data.pop(exclusion, None)
-                        except KeyError:
-                            pass
-
-            except Exception:
-                # If there was any problem loading the exclusions, just continue without them
-                print("Warning: Could not load exclusions, continuing without them.")
-                honor_exclusions = False
-
-        self.sites = {}
-
-        # Add all site information from the json file to internal site list.
-        for site_name in site_data:
-            try:
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path to the snapshot file.
+                                  The file name should end in ".snapshot".
 
-                self.sites[site_name] = \
-                    SiteInformation(site_name,
-                                    site_data[site_name]["urlMain"],
-                                    site_data[site_name]["url"],
-                                    site_data[site_name]["username_claimed"],
-                                    site_data[site_name],
-                                    site_data[site_name].get("isNSFW",False)
+        Return Value:
+        Nothing.
+        """
 
-                                    )
-            except KeyError as error:
-                raise ValueError(
-                    f"Problem parsing json contents at '{data_file_path}':  Missing attribute {error}."
-                )
-            except TypeError:
-                print(f"Encountered TypeError parsing json contents for target '{site_name}' at {data_file_path}\nSkipping target.\n")
+        dump_snapshot(self._snapshot, path)
 
         return
 
@@ -220,13 +493,108 @@ class SitesInformation:
         Return Value:
         None
         """
-        sites = {}
-        do_not_remove = [site.casefold() for site in do_not_remove]
-        for site in self.sites:
-            if self.sites[site].is_nsfw and site.casefold() not in do_not_remove:
+        do_not_remove = {site.casefold() for site in do_not_remove}
+        for site in self._nsfw:
+            if site.casefold() not in do_not_remove and site in self.sites:
+                del self.sites[site]
+
+    def apply_overlay(self, overlay):
+        """Apply Overlay.
+
+        Makes the sites use the probes they were calibrated with.
+
+        Keyword Arguments:
+        self                   -- This object.
+        overlay                -- Dictionary mapping site names to overlay
+                                  entries, as made by tuning.calibrate().
+
+        Return Value:
+        Integer indicating the number of sites the overlay was applied to.
+        Entries calibrated for other versions of the site data are ignored.
+        """
+
+        applied = 0
+        for site_name, entry in overlay.items():
+            if site_name in self.sites and apply_probe(self.sites[site_name].information, entry):
+                applied += 1
+
+        return applied
+
+    def select(self, names=None, nsfw=None, error_type=None, host=None, tags=None):
+        """Select Sites.
+
+        Every criterion is optional; a site is selected if it meets all of
+        the given ones.  Criteria which accept several values select sites
+        which match any of them.  The work done is proportional to the number
+        of candidate sites, not to the size of the manifest.
+
+        Keyword Arguments:
+        self                   -- This object.
+        names                  -- Site name or list of site names, matched
+                                  regardless of case.
+        nsfw                   -- Boolean selecting only NSFW sites (True) or
+                                  only other sites (False).
+        error_type             -- errorType or list of errorTypes.
+        host                   -- Host name (or URL) or list of them, matched
+                                  against the home URL of the sites,
+                                  regardless of case and of a leading "www.".
+        tags                   -- Tag or list of tags.
+
+        Return Value:
+        Object of type SitesView().  Sites are in the order of the requested
+        names if there are any, and in the order of the manifest otherwise.
+        """
+
+        candidates = None
+        missing = []
+        if names is not None:
+            if self._names is None:
+                folded = {}
+                for site_name in self._snapshot["names"]:
+                    # Nearly every name is unique once folded, so only keep
+                    # lists for the few which are not.
+                    other = folded.setdefault(site_name.casefold(), site_name)
+                    if other is not site_name:
+                        folded[site_name.casefold()] = (other if isinstance(other, list) else [other]) + [site_name]
+                self._names = folded
+            candidates = {}
+            for name in [names] if isinstance(names, str) else names:
+                matches = self._names.get(name.casefold(), ())
+                if isinstance(matches, str):
+                    matches = [matches]
+                matches = [site for site in matches if site in self.sites]
+                if not matches:
+                    missing.append(name)
+                candidates.update(dict.fromkeys(matches))
+
+        for index, wanted, key in (
+            (self._error_types, error_type, None),
+            (self._hosts, host, host_key),
+            (self._tags, tags, None),
+        ):
+            if wanted is None:
                 continue
-            sites[site] = self.sites[site]
-        self.sites =  sites
+            matches = {}
+            for value in [wanted] if isinstance(wanted, str) else wanted:
+                matches.update(dict.fromkeys(index.get(key(value) if key else value, ())))
+            if candidates is None:
+                if self._positions is None:
+                    self._positions = {site_name: position for position, site_name in enumerate(self._snapshot["names"])}
+                candidates = {site: None for site in sorted(matches, key=self._positions.get) if site in self.sites}
+            else:
+                candidates = {site: None for site in candidates if site in matches}
+
+        if nsfw is True:
+            if candidates is None:
+                candidates = {site: None for site in self._nsfw if site in self.sites}
+            else:
+                candidates = {site: None for site in candidates if site in self._nsfw_set}
+        elif nsfw is False:
+            if candidates is None:
+                candidates = self.sites
+            candidates = {site: None for site in candidates if site not in self._nsfw_set}
+
+        return SitesView(self.sites, list(self.sites if candidates is None else candidates), missing)
 
     def site_name_list(self):
         """Get Site Name List.
@@ -238,7 +606,7 @@ class SitesInformation:
         List of strings containing names of sites.
         """
 
-        return sorted([site.name for site in self], key=str.lower)
+        return sorted(self.sites, key=str.lower)
 
     def __iter__(self):
         """Iterator For Object.
@@ -0,0 +1,234 @@
+"""Sherlock Snapshot Module
+
+This module supports compiling the site data (and the exclusions) into a
+snapshot which loads in a single read, with no parsing or checking left to do.
+"""
+import hashlib
+import json
+import marshal
+import os
+from urllib.parse import urlsplit
+
+# Bump whenever the layout of snapshots changes, so that old ones are ignored.
+SNAPSHOT_FORMAT = 3
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def parse_exclusions(exclusions):
+    """Parse Exclusions.
+
+    Keyword Arguments:
+    exclusions             -- String containing the names of the excluded
+                              sites, one per line.
+
+    Return Value:
+    List of strings containing names of excluded sites.
+    """
+
+    return [exclusion.strip() for exclusion in exclusions.splitlines() if exclusion.strip()]
+
+
+def host_key(host):
+    """Get Host Key.
+
+    Keyword Arguments:
+    host                   -- String containing host name or URL.
+
+    Return Value:
+    String by which sites are indexed by host: the lower case host name,
+    without any leading "www.".
+    """
+
+    if "/" in host:
+        host = urlsplit(host).hostname or ""
+    host = host.lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def compile_snapshot(manifest, exclusions=None, origin=""):
+    """Compile Snapshot.
+
+    Keyword Arguments:
+    manifest               -- Bytes (or string) containing the JSON site data,
+                              or list of them for site data sharded across
+                              several files.  Sites of later shards replace
+                              sites of the same name in earlier ones.
+    exclusions             -- String containing the names of the excluded
+                              sites, one per line.
+                              Default of None for no exclusions.
+    origin                 -- String indicating where the site data comes
+                              from, for error messages, or list of them (one
+                              per shard).
+
+    Return Value:
+    Dictionary with the names of the sites ("names") and, in the same order,
+    their checked site data, each serialized on its own ("entries", see
+    load_entry()).  The names of the sites are also indexed by whether they
+    are excluded ("excluded") or NSFW ("nsfw"), and by errorType
+    ("error_types"), home host ("hosts") and tag ("tags").
+
+    NOTE:  Will raise ValueError if the site data cannot be parsed or is
+           missing attributes.  Sites which are not objects are skipped.
+    """
+
+    if isinstance(manifest, (bytes, bytearray, str)):
+        manifest = [manifest]
+    if isinstance(origin, str):
+        origin = [origin] * len(manifest)
+
+    sites = {}
+    for shard, shard_origin in zip(manifest, origin):
+        try:
+            site_data = json.loads(shard)
+        except Exception as error:
+            raise ValueError(
+                f"Problem parsing json contents at '{shard_origin}':  {error}."
+            )
+        site_data.pop("$schema", None)
+
+        for site_name, information in site_data.items():
+            try:
+                information["urlMain"], information["url"], information["username_claimed"]
+            except KeyError as error:
+                raise ValueError(
+                    f"Problem parsing json contents at '{shard_origin}':  Missing attribute {error}."
+                )
+            except TypeError:
+                print(f"Encountered TypeError parsing json contents for target '{site_name}' at {shard_origin}\nSkipping target.\n")
+                continue
+            sites[site_name] = information
+
+    nsfw = []
+    error_types = {}
+    hosts = {}
+    tags = {}
+    for site_name, information in sites.items():
+        if information.get("isNSFW", False):
+            nsfw.append(site_name)
+        # errorType is a string, or a list of them for combined methods.
+        site_error_types = information.get("errorType")
+        if not isinstance(site_error_types, list):
+            site_error_types = [site_error_types]
+        for error_type in site_error_types:
+            error_types.setdefault(error_type, []).append(site_name)
+        hosts.setdefault(host_key(information["urlMain"]), []).append(site_name)
+        site_tags = information.get("tags", ())
+        for tag in [site_tags] if isinstance(site_tags, str) else site_tags:
+            tags.setdefault(tag, []).append(site_name)
+
+    excluded = parse_exclusions(exclusions) if exclusions else []
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "names": list(sites),
+        "entries": [marshal.dumps(information) for information in sites.values()],
+        "excluded": [site_name for site_name in excluded if site_name in sites],
+        "nsfw": nsfw,
+        "error_types": error_types,
+        "hosts": hosts,
+        "tags": tags,
+    }
+
+
+def load_entry(entry):
+    """Load Entry.
+
+    Keyword Arguments:
+    entry                  -- Bytes from the "entries" of a snapshot.
+
+    Return Value:
+    Dictionary containing the site data of one site.
+    """
+
+    return marshal.loads(entry)
+
+
+def dump_snapshot(snapshot, path):
+    """Dump Snapshot.
+
+    Keyword Arguments:
+    snapshot               -- Dictionary returned by compile_snapshot().
+    path                   -- String indicating path to the snapshot file.
+                              It is replaced atomically.
+
+    Return Value:
+    Nothing.
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as file:
+        file.write(marshal.dumps(snapshot))
+    os.replace(temporary, path)
+
+    return
+
+
+def load_snapshot(path):
+    """Load Snapshot.
+
+    Keyword Arguments:
+    path                   -- String indicating path to the snapshot file.
+
+    Return Value:
+    Dictionary as returned by compile_snapshot().
+
+    NOTE:  Will raise ValueError if the file is not a snapshot of the
+           current format, and OSError if it cannot be read.
+    """
+
+    with open(path, "rb") as file:
+        content = file.read()
+    try:
+        snapshot = marshal.loads(content)
+    except (EOFError, TypeError, ValueError):
+        raise ValueError(f"Problem loading snapshot '{path}'.")
+    if not isinstance(snapshot, dict) or snapshot.get("format") != SNAPSHOT_FORMAT:
+        raise ValueError(f"Snapshot '{path}' was compiled by another version of Sherlock.")
+
+    return snapshot
+
+
+def cached_snapshot(directory, manifest, exclusions=None, origin=""):
+    """Get Cached Snapshot.
+
+    Snapshots are kept in the given directory, keyed by a hash of the site
+    data and exclusions they were compiled from.  A missing or unreadable
+    snapshot is compiled again.
+
+    Keyword Arguments:
+    directory              -- String indicating path to the snapshot directory.
+    manifest               -- Bytes containing the JSON site data, or list
+                              of them.  See compile_snapshot().
+    exclusions             -- String containing the names of the excluded
+                              sites, one per line.
+                              Default of None for no exclusions.
+    origin                 -- String indicating where the site data comes
+                              from, for error messages, or list of them.
+
+    Return Value:
+    Dictionary as returned by compile_snapshot().
+    """
+
+    key = hashlib.sha256()
+    key.update(f"{SNAPSHOT_FORMAT}:{marshal.version}:".encode())
+    for shard in [manifest] if isinstance(manifest, (bytes, bytearray)) else manifest:
+        key.update(hashlib.sha256(shard).digest())
+    key.update(b"\0" + (exclusions or "").encode("utf-8"))
+    path = os.path.join(directory, key.hexdigest()[:32] + SNAPSHOT_SUFFIX)
+
+    try:
+        return load_snapshot(path)
+    except (OSError, ValueError):
+        pass
+
+    snapshot = compile_snapshot(manifest, exclusions, origin)
+    try:
+        dump_snapshot(snapshot, path)
+    except OSError:
+        # Not being able to cache it only costs time on the next run.
+        pass
+
+    return snapshot
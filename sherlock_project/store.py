@@ -0,0 +1,235 @@
+"""Sherlock Store Module
+
+This module supports keeping the results of many usernames in a single SQLite
+database, rather than in a file per username, and looking them up afterwards
+(see "sherlock query").
+"""
+import sqlite3
+from pathlib import Path
+from threading import Lock
+from time import monotonic, time
+
+from sherlock_project.notify import QueryNotify
+
+# The latest result of each (username, site) query is kept.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    username    TEXT NOT NULL,
+    site        TEXT NOT NULL,
+    url_user    TEXT,
+    url_main    TEXT,
+    status      TEXT NOT NULL,
+    http_status INTEGER,
+    query_time  REAL,
+    context     TEXT,
+    checked     REAL NOT NULL,
+    PRIMARY KEY (username, site)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS results_site ON results (site COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS results_status ON results (status);
+"""
+
+COLUMNS = (
+    "username", "site", "url_user", "url_main", "status",
+    "http_status", "query_time", "context", "checked",
+)
+
+
+def connect(path):
+    """Connect To Store.
+
+    Keyword Arguments:
+    path                   -- String indicating path to the database file.
+                              It is created if it does not exist.
+
+    Return Value:
+    sqlite3.Connection to the store, in write-ahead logging mode, so that it
+    can be read while a run is writing to it.
+
+    NOTE:  Will raise sqlite3.Error if the file is not a database.
+    """
+
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode = WAL")
+    # In WAL mode, a crash may lose the last transactions, never corrupt.
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.executescript(SCHEMA)
+
+    return connection
+
+
+def query_store(path, usernames=None, sites=None, statuses=None):
+    """Query Store.
+
+    Keyword Arguments:
+    path                   -- String indicating path to the database file.
+    usernames              -- List of strings containing the usernames to
+                              look up.
+                              Default is None, for all usernames.
+    sites                  -- List of strings containing the names of the
+                              sites to look up, whatever their case.
+                              Default is None, for all sites.
+    statuses               -- List of QueryStatus() values to look up.
+                              Default is None, for all statuses.
+
+    Return Value:
+    Iterator of dictionaries with the COLUMNS of the matching results,
+    ordered by username and site.
+
+    NOTE:  Will raise sqlite3.Error if the file is missing or not a store.
+    """
+
+    conditions = []
+    parameters = []
+    for column, values, collate in (
+        ("username", usernames, ""),
+        ("site", sites, " COLLATE NOCASE"),
+        ("status", [status.value for status in statuses or []] or None, ""),
+    ):
+        if values:
+            conditions.append(
+                f"{column}{collate} IN ({', '.join('?' * len(values))})"
+            )
+            parameters.extend(values)
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    connection = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro", uri=True)
+    try:
+        cursor = connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM results{where} ORDER BY username, site",
+            parameters,
+        )
+        for row in cursor:
+            yield dict(zip(COLUMNS, row))
+    finally:
+        connection.close()
+
+
+class QueryNotifyStore(QueryNotify):
+    """Query Notify Store Object.
+
+    Writes the results of all the usernames to a SQLite database, replacing
+    earlier results of the same queries.  Results are written in batches, each
+    in a single transaction, once batch_size results are waiting or
+    commit_interval seconds have passed.
+    """
+
+    def __init__(self, path, batch_size=1000, commit_interval=1.0):
+        """Create Query Notify Store Object.
+
+        Keyword Arguments:
+        self                   -- This object.
+        path                   -- String indicating path to the database file.
+                                  It is created if it does not exist.
+        batch_size             -- Integer indicating the number of results
+                                  written per transaction.
+                                  Default is 1000.
+        commit_interval        -- Time in seconds after which waiting results
+                                  are written, whatever their number.
+                                  Default is 1 second.
+
+        Return Value:
+        Nothing.
+
+        NOTE:  Will raise sqlite3.Error if the file is not a database.
+        """
+
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+
+        self._connection = connect(path)
+        self._rows = []
+        self._last_commit = monotonic()
+        self._lock = Lock()
+
+        return
+
+    def update(self, result):
+        """Notify Update.
+
+        Keyword Arguments:
+        self                   -- This object.
+        result                 -- Object of type QueryResult() containing
+                                  results for this query.
+
+        Return Value:
+        Nothing.
+        """
+
+        self.update_batch([result])
+
+        return
+
+    def update_batch(self, results):
+        """Notify Update Batch.
+
+        Keyword Arguments:
+        self                   -- This object.
+        results                -- List of objects of type QueryResult().
+
+        Return Value:
+        Nothing.
+        """
+
+        self.result = results[-1]
+        checked = time()
+        rows = [
+            (
+                result.username,
+                result.site_name,
+                result.site_url_user,
+                result.site_url_main,
+                result.status.value,
+                result.http_status,
+                result.query_time,
+                None if result.context is None else str(result.context),
+                checked,
+            )
+            for result in results
+        ]
+        with self._lock:
+            self._rows.extend(rows)
+            if (len(self._rows) >= self.batch_size
+                    or monotonic() - self._last_commit >= self.commit_interval):
+                self._commit()
+
+        return
+
+    def finish(self, message=None):
+        """Notify Finish.
+
+        Keyword Arguments:
+        self                   -- This object.
+        message                -- String containing the username whose
+                                  queries are all over, whose results are
+                                  then written.
+                                  Default is None, for the end of the run:
+                                  the database is then closed.
+
+        Return Value:
+        Nothing.
+        """
+
+        with self._lock:
+            if self._connection is None:
+                return
+            self._commit()
+            if message is None:
+                self._connection.close()
+                self._connection = None
+
+        return
+
+    def _commit(self):
+        # Called with the lock held.
+        if self._rows:
+            with self._connection:
+                self._connection.executemany(
+                    f"INSERT OR REPLACE INTO results ({', '.join(COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                    self._rows,
+                )
+            self._rows.clear()
+        self._last_commit = monotonic()
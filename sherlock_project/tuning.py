@@ -0,0 +1,243 @@
+"""Sherlock Tuning Module
+
+This module calibrates how each site is probed.  Sites are queried with their
+claimed username and with an unclaimed one, using a HEAD request, a ranged
+GET request and a full GET request.  The cheapest probe which still tells the
+two usernames apart is kept in a local overlay file, which is applied on top
+of the site data.
+"""
+import hashlib
+import json
+import os
+import secrets
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from sherlock_project.bandwidth import BandwidthMeter
+from sherlock_project.cache import default_cache_dir
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from sherlock_project.scheduler import HostScheduler
+
+# Probes, from the cheapest to the most expensive.
+PROBES = ("HEAD", "RANGE", "GET")
+# Size of the start of the page requested by a RANGE probe.
+RANGE_BYTES = 16384
+OVERLAY_NAME = "overlay.json"
+
+
+def default_overlay_path(cache_dir=None):
+    """Get Default Overlay Path.
+
+    Keyword Arguments:
+    cache_dir              -- String indicating path to the cache directory.
+                              Default of None for the default cache directory.
+
+    Return Value:
+    String indicating path to the overlay file kept in the cache directory.
+    """
+
+    return os.path.join(cache_dir or default_cache_dir(), OVERLAY_NAME)
+
+
+def fingerprint(information):
+    """Get Site Fingerprint.
+
+    Keyword Arguments:
+    information            -- Dictionary containing the site data of one site.
+
+    Return Value:
+    String identifying the site data, so that calibrations made for other
+    site data are not applied.
+    """
+
+    canonical = json.dumps(information, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+
+def probe_overrides(probe, information, range_bytes=RANGE_BYTES):
+    """Get Probe Overrides.
+
+    Keyword Arguments:
+    probe                  -- String naming the probe, one of PROBES.
+    information            -- Dictionary containing the site data of one site.
+    range_bytes            -- Integer indicating the size of the start of the
+                              page requested by a RANGE probe.
+                              Default of RANGE_BYTES.
+
+    Return Value:
+    Dictionary of the site data keys making the engine use the probe.
+    """
+
+    if probe == "RANGE":
+        headers = dict(information.get("headers", {}))
+        headers["Range"] = f"bytes=0-{range_bytes - 1}"
+        return {"request_method": "GET", "headers": headers}
+    if probe in PROBES:
+        return {"request_method": probe}
+    raise ValueError(f"Unknown probe '{probe}'.")
+
+
+def apply_probe(information, entry):
+    """Apply Probe.
+
+    Keyword Arguments:
+    information            -- Dictionary containing the site data of one
+                              site.  It is updated in place.
+    entry                  -- Dictionary containing the overlay entry of the
+                              site, as made by calibrate().
+
+    Return Value:
+    Boolean indicating whether the entry was applied.  Entries calibrated
+    for other site data (e.g. an older version of the site list) are not.
+    """
+
+    if entry.get("fingerprint") != fingerprint(information):
+        return False
+    information.update(
+        probe_overrides(entry["probe"], information, entry.get("rangeBytes", RANGE_BYTES))
+    )
+    return True
+
+
+def load_overlay(path):
+    """Load Overlay.
+
+    Keyword Arguments:
+    path                   -- String indicating path to the overlay file.
+
+    Return Value:
+    Dictionary mapping site names to their overlay entries.
+
+    NOTE:  Will raise OSError if the file cannot be read, and ValueError if
+           it cannot be parsed.
+    """
+
+    with open(path, "r", encoding="utf-8") as file:
+        try:
+            overlay = json.load(file)
+        except Exception as error:
+            raise ValueError(f"Problem parsing overlay '{path}':  {error}.")
+    if not isinstance(overlay, dict):
+        raise ValueError(f"Problem parsing overlay '{path}':  Not an object.")
+
+    return overlay
+
+
+def save_overlay(overlay, path):
+    """Save Overlay.
+
+    Keyword Arguments:
+    overlay                -- Dictionary mapping site names to their overlay
+                              entries.
+    path                   -- String indicating path to the overlay file.
+                              It is replaced atomically.
+
+    Return Value:
+    Nothing.
+    """
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as file:
+        json.dump(overlay, file, indent=2, sort_keys=True)
+        file.write("\n")
+    os.replace(temporary, path)
+
+    return
+
+
+def calibrate(site_data, timeout=30, proxy=None, range_bytes=RANGE_BYTES, max_workers=20):
+    """Calibrate Probes.
+
+    Keyword Arguments:
+    site_data              -- Dictionary containing the site data of the
+                              sites to calibrate.  Sites sending a request
+                              body (POST or PUT) are left alone.
+    timeout                -- Time in seconds to wait before timing out request.
+                              Default is 30 seconds.
+    proxy                  -- String indicating the proxy URL.
+                              Default is None.
+    range_bytes            -- Integer indicating the size of the start of the
+                              page requested by RANGE probes.
+                              Default of RANGE_BYTES.
+    max_workers            -- Integer indicating the number of requests run
+                              in parallel.
+                              Default is 20.
+
+    Return Value:
+    Tuple of the overlay entries of the calibrated sites, as a dictionary
+    mapping site names to entries for apply_probe(), and of the list of
+    names of the sites which none of the probes could tell the usernames
+    apart for.
+    """
+
+    # Imported here, as the sherlock module uses this one.
+    from sherlock_project.sherlock import sherlock
+
+    sites = {
+        site_name: information for site_name, information in site_data.items()
+        if information.get("request_method") in (None, "GET", "HEAD")
+    }
+    unclaimed = "".join(secrets.choice(string.ascii_lowercase) for _ in range(12))
+
+    # Sites are queried for their claimed usernames in batches of sites
+    # sharing one, all of them for the unclaimed username.
+    claimed_sites = {}
+    for site_name, information in sites.items():
+        claimed_sites.setdefault(information["username_claimed"], []).append(site_name)
+
+    scheduler = HostScheduler(max_workers=max_workers)
+    # site name -> [(bytes transferred, index of probe)]
+    costs = {}
+    try:
+        for index, probe in enumerate(PROBES):
+            probed = {
+                site_name: {**information, **probe_overrides(probe, information, range_bytes)}
+                for site_name, information in sites.items()
+            }
+            queries = [
+                (username, {site_name: probed[site_name] for site_name in site_names})
+                for username, site_names in claimed_sites.items()
+            ]
+            queries.append((unclaimed, probed))
+
+            def query(username_and_sites):
+                username, query_sites = username_and_sites
+                return username, sherlock(
+                    username, query_sites, QueryNotify(),
+                    proxy=proxy, timeout=timeout, scheduler=scheduler,
+                    meter=BandwidthMeter(), keep_response_text=False,
+                )
+
+            claimed_results = {}
+            unclaimed_results = {}
+            with ThreadPoolExecutor(max_workers=max_workers) as pool:
+                for username, results in pool.map(query, queries):
+                    if username == unclaimed:
+                        unclaimed_results = results
+                    else:
+                        claimed_results.update(results)
+
+            for site_name in sites:
+                claimed = claimed_results[site_name]
+                available = unclaimed_results[site_name]
+                if (claimed.status is QueryStatus.CLAIMED
+                        and available.status is QueryStatus.AVAILABLE):
+                    transferred = sum(claimed.transferred[:2]) + sum(available.transferred[:2])
+                    costs.setdefault(site_name, []).append((transferred, index))
+    finally:
+        scheduler.shutdown(wait=False)
+
+    overlay = {}
+    for site_name, site_costs in costs.items():
+        probe = PROBES[min(site_costs)[1]]
+        entry = {"probe": probe, "fingerprint": fingerprint(sites[site_name])}
+        if probe == "RANGE":
+            entry["rangeBytes"] = range_bytes
+        overlay[site_name] = entry
+    failed = [site_name for site_name in sites if site_name not in overlay]
+
+    return overlay, failed
@@ -1,7 +1,14 @@
 import os
+import re
+import gzip
+import hashlib
 import json
+import http.client
+import threading
 import urllib
+import urllib.parse
 import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from sherlock_project.sites import SitesInformation
 
 def fetch_local_manifest(honor_exclusions: bool = True) -> dict[str, dict[str, str]]:
@@ -49,3 +56,179 @@ def pytest_generate_tests(metafunc):
         params = [{name: data} for name, data in sites_info.items()]
         ids = list(sites_info.keys())
         metafunc.parametrize("chunked_sites", params, ids=ids)
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    """Stand-in for the sites of the manifest, served from localhost
+
+    /status/<name>   -- 200 if the name is claimed, 404 otherwise
+    /message/<name>  -- always 200, with an error message if not claimed
+    /waf/<name>      -- Cloudflare challenge page, unless the request came
+                        through a stub proxy; then as /status/<name>
+    /ratelimit/<name> -- 429, unless the request came through a stub proxy;
+                         then as /status/<name>
+    /big/<name>      -- as /message/<name>, padded to 64 KiB and gzipped
+    /long/<name>     -- as /message/<name>, padded to 32 KiB
+    /late/<name>     -- as /message/<name>, with the message after 32 KiB
+    /files/<name>    -- server.files[name], with an ETag; 304 if unchanged
+    /signup/<name>   -- 200 with a 4 KiB profile if the name is claimed,
+                        otherwise a 302 to /signup, setting a cookie
+    /chunked/<name>  -- empty 200, without Content-Length
+    /batch/<names>   -- JSON listing which of the comma separated names (or,
+                        for a POST, of the "logins" of the payload) are
+                        claimed:  {"data": {"users": [{"login": name}]}}
+    """
+    claimed = {'blue'}
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, code: int, body: bytes, headers: dict = {}):
+        self.server.seen.append((self.command, self.path, dict(self.headers)))
+        match = re.fullmatch(r'bytes=0-(\d+)', self.headers.get('Range', ''))
+        if code == 200 and match and 'Content-Encoding' not in headers:
+            end = min(int(match.group(1)), len(body) - 1)
+            headers = {**headers, 'Content-Range': f'bytes 0-{end}/{len(body)}'}
+            code, body = 206, body[:end + 1]
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/html')
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        route, _, name = self.path.lstrip('/').partition('/')
+        if route in ('waf', 'ratelimit') and 'Via' in self.headers:
+            route = 'status'
+        if route == 'status':
+            self._reply(200 if name in self.claimed else 404, b'<html>profile</html>')
+        elif route == 'message':
+            body = f'<html>Profile of {name}</html>' if name in self.claimed else '<html>User not found</html>'
+            self._reply(200, body.encode())
+        elif route == 'big':
+            text = f'Profile of {name}' if name in self.claimed else 'User not found'
+            body = (text + ' ' * 65536)[:65536].encode()
+            self._reply(200, gzip.compress(body), {'Content-Encoding': 'gzip'})
+        elif route in ('long', 'late'):
+            text = f'Profile of {name}' if name in self.claimed else 'User not found'
+            padding = ' ' * 32768
+            self._reply(200, (text + padding if route == 'long' else padding + text).encode())
+        elif route == 'signup':
+            if name in self.claimed:
+                self._reply(200, b' ' * 4096)
+            else:
+                self._reply(302, b'', {'Location': '/signup?from=profile', 'Set-Cookie': 'flash=no_such_user'})
+        elif route == 'chunked':
+            self.server.seen.append((self.command, self.path, dict(self.headers)))
+            self.send_response(200)
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            if self.command != 'HEAD':
+                self.wfile.write(b'0\r\n\r\n')
+        elif route == 'batch':
+            if self.command == 'POST':
+                length = int(self.headers.get('Content-Length', 0))
+                names = json.loads(self.rfile.read(length))['logins']
+            else:
+                names = urllib.parse.unquote(name).split(',')
+            users = [{'login': n} for n in names if n in self.claimed]
+            self._reply(200, json.dumps({'data': {'users': users}}).encode())
+        elif route == 'waf':
+            self._reply(200, b'<html><span id="challenge-error-text"></span></html>')
+        elif route == 'ratelimit':
+            self._reply(429, b'slow down')
+        elif route == 'files' and name in self.server.files:
+            body = self.server.files[name]
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+            if self.headers.get('If-None-Match') == etag:
+                self._reply(304, b'', {'ETag': etag})
+            else:
+                self._reply(200, body, {'ETag': etag})
+        else:
+            self._reply(404, b'')
+
+    do_HEAD = do_GET
+    do_POST = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSiteHandler)
+    server.seen = []
+    server.files = {}
+    server.url = f'http://127.0.0.1:{server.server_address[1]}'
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def stub_site(server, route: str, **extra) -> dict:
+    """Manifest entry for a site served by the stub server"""
+    entry = {
+        'url': f'{server.url}/{route}/{{}}',
+        'urlMain': f'{server.url}/',
+        'errorType': 'message' if route == 'message' else 'status_code',
+        'username_claimed': 'blue',
+    }
+    if route in ('message', 'big', 'long', 'late'):
+        entry['errorType'] = 'message'
+        entry['errorMsg'] = 'User not found'
+    entry.update(extra)
+    return entry
+
+
+class StubProxyHandler(BaseHTTPRequestHandler):
+    """Minimal forwarding HTTP proxy, for plain HTTP targets only"""
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        self.server.forwarded.append(self.path)
+        target = urllib.parse.urlsplit(self.path)
+        connection = http.client.HTTPConnection(target.hostname, target.port, timeout=10)
+        headers = {k: v for k, v in self.headers.items() if k.lower() not in ('proxy-connection', 'connection')}
+        headers['Via'] = '1.1 stub-proxy'
+        connection.request(self.command, target.path or '/', headers=headers)
+        response = connection.getresponse()
+        body = response.read()
+        connection.close()
+        self.send_response(response.status)
+        for key, value in response.getheaders():
+            if key.lower() not in ('connection', 'transfer-encoding', 'content-length'):
+                self.send_header(key, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    do_HEAD = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_proxies():
+    """Factory starting any number of local forwarding proxies"""
+    servers = []
+
+    def start(count: int = 1) -> list:
+        started = []
+        for _ in range(count):
+            server = ThreadingHTTPServer(('127.0.0.1', 0), StubProxyHandler)
+            server.forwarded = []
+            server.url = f'http://127.0.0.1:{server.server_address[1]}'
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            started.append(server)
+        servers.extend(started)
+        return started
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,69 @@
+import csv
+import pytest
+from sherlock_project.sherlock import sherlock, bytes_check
+from sherlock_project.notify import QueryNotify
+from sherlock_project.bandwidth import BandwidthMeter, DEFAULT_ESTIMATES
+from sherlock_project.result import QueryStatus
+from conftest import stub_site
+
+
+def test_probe_accounting(stub_server, tmp_path):
+    site_data = {
+        'Big': stub_site(stub_server, 'big'),
+        'Small': stub_site(stub_server, 'status'),
+    }
+    meter = BandwidthMeter()
+    results = sherlock('blue', site_data, QueryNotify(), meter=meter)
+
+    assert results['Big']['status'].status is QueryStatus.CLAIMED
+    big = results['Big']['bytes']
+    # Compressed on the wire, 64 KiB once decoded
+    assert 0 < big['received'] < 65536 < big['decoded']
+    assert big['sent'] > 0
+    # HEAD probes download no body at all
+    assert results['Small']['bytes']['received'] < 1000
+    assert meter.spent == sum(r['bytes']['sent'] + r['bytes']['received'] for r in results.values())
+
+    report = tmp_path / 'bytes.csv'
+    meter.write_report(str(report))
+    rows = list(csv.DictReader(report.open()))
+    assert [row['name'] for row in rows] == ['Big', 'Small']
+    assert int(rows[0]['bytes_decoded']) == big['decoded']
+
+
+def test_budget_skips_expensive_sites(stub_server):
+    site_data = {f'Big{i}': stub_site(stub_server, 'big') for i in range(3)}
+    site_data['Small'] = stub_site(stub_server, 'status')
+    # Room for the HEAD probe, but not for the default estimate of a GET probe
+    meter = BandwidthMeter(max_bytes=10_000)
+    results = sherlock('blue', site_data, QueryNotify(), meter=meter)
+
+    assert list(results) == list(site_data)
+    assert results['Small']['status'].status is QueryStatus.CLAIMED
+    for i in range(3):
+        assert results[f'Big{i}']['status'].status is QueryStatus.UNKNOWN
+        assert results[f'Big{i}']['status'].context == 'Bandwidth budget exhausted'
+    assert meter.refused == 3
+    assert meter.spent < 10_000
+
+
+def test_budget_learns_site_cost(stub_server):
+    site_data = {'Big': stub_site(stub_server, 'big')}
+    meter = BandwidthMeter(max_bytes=60_000)
+    # Not measured yet, so assumed to be a typical full page
+    assert meter.estimate('Big', site_data['Big']) == DEFAULT_ESTIMATES['GET']
+    sherlock('blue', site_data, QueryNotify(), meter=meter)
+    assert meter.estimate('Big', site_data['Big']) == meter.spent
+    # Small once compressed, so a second probe easily fits in what is left
+    results = sherlock('nobody', site_data, QueryNotify(), meter=meter)
+    assert results['Big']['status'].status is QueryStatus.AVAILABLE
+
+
+@pytest.mark.parametrize('value,expected', [
+    ('1000', 1000),
+    ('2K', 2048),
+    ('1.5M', 1572864),
+    ('1GB', 1073741824),
+])
+def test_bytes_argument(value, expected):
+    assert bytes_check(value) == expected
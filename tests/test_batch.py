@@ -0,0 +1,77 @@
+import pytest
+from sherlock_project.sherlock import SherlockFuturesSession, sherlock
+from sherlock_project.bandwidth import BandwidthMeter
+from sherlock_project.scheduler import HostScheduler
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from sherlock_project.batch import BatchProbe, extract_claimed
+from conftest import stub_site
+
+
+def batch_site(server, **probe) -> dict:
+    return stub_site(server, 'status', batchProbe={
+        'url': f'{server.url}/batch/{{}}', 'claimed': 'data.users.*.login', 'maxUsernames': 2, **probe,
+    })
+
+
+def test_extract_claimed():
+    document = {'data': {'users': [{'login': 'Blue'}, {'name': 'no login'}]}}
+    assert extract_claimed(document, 'data.users.*.login') == {'blue'}
+    assert extract_claimed({'data': {'users': []}}, 'data.users.*.login') == set()
+    with pytest.raises(KeyError):
+        extract_claimed({'errors': ['rate limited']}, 'data.users.*.login')
+
+
+@pytest.mark.parametrize('probe', [
+    {},
+    {'request_method': 'POST', 'request_payload': {'logins': '{}'}},
+])
+def test_batch_probe(stub_server, probe):
+    usernames = ['blue', 'nobody', 'someone', 'bad name']
+    site_data = {'Batch': batch_site(stub_server, **probe), 'Status': stub_site(stub_server, 'status')}
+    site_data['Batch']['regexCheck'] = r'^\S+$'
+    batch = BatchProbe(usernames, site_data)
+
+    statuses = {}
+    for username in usernames:
+        results = sherlock(username, site_data, QueryNotify(), batch=batch)
+        statuses[username] = results['Batch'].status
+        assert results['Status'].status is statuses[username] or username == 'bad name'
+
+    assert statuses == {
+        'blue': QueryStatus.CLAIMED,
+        'nobody': QueryStatus.AVAILABLE,
+        'someone': QueryStatus.AVAILABLE,
+        'bad name': QueryStatus.ILLEGAL,
+    }
+    # Three legal usernames, two per request
+    assert batch.requests == 2
+    routes = [path.split('/')[1] for _, path, _ in stub_server.seen]
+    assert routes.count('batch') == 2
+    # The site without a batch probe is still asked about each username
+    assert routes.count('status') == 4
+
+
+def test_failed_batch_falls_back(stub_server):
+    site_data = {'Batch': batch_site(stub_server, claimed='missing.*')}
+    batch = BatchProbe(['blue', 'nobody'], site_data)
+    assert sherlock('blue', site_data, QueryNotify(), batch=batch)['Batch'].status is QueryStatus.CLAIMED
+    assert sherlock('nobody', site_data, QueryNotify(), batch=batch)['Batch'].status is QueryStatus.AVAILABLE
+    # The failed batch is not asked again
+    assert batch.requests == 1
+
+
+def test_batch_request_is_scheduled_and_metered(stub_server):
+    site_data = {'Batch': batch_site(stub_server)}
+    batch = BatchProbe(['blue', 'nobody'], site_data)
+    meter = BandwidthMeter()
+    scheduler = HostScheduler(max_workers=2)
+    # Submitted through the session of the query rather than sent right away
+    future = batch.submit('blue', 'Batch', SherlockFuturesSession(executor=scheduler.lane('blue')), meter=meter)
+    assert future.result().status is QueryStatus.CLAIMED
+    assert batch.submit('blue', 'Batch', None) is None
+    assert sherlock('nobody', site_data, QueryNotify(), batch=batch)['Batch'].status is QueryStatus.AVAILABLE
+    assert batch.requests == 1
+    probes, sent, received, _ = meter.sites['Batch']
+    assert probes == 1 and sent and received
+    scheduler.shutdown()
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+import pytest
+from sherlock_project import sites
+from sherlock_project.cache import ResourceCache
+from sherlock_project.sites import SitesInformation
+from conftest import stub_site
+
+
+def requests_for(server, name):
+    return [headers for _, path, headers in server.seen if path == f'/files/{name}']
+
+
+def test_fresh_copy_is_not_refetched(stub_server, tmp_path):
+    stub_server.files['data.json'] = b'{"a": 1}'
+    cache = ResourceCache(directory=str(tmp_path))
+    url = f'{stub_server.url}/files/data.json'
+    assert cache.fetch(url) == b'{"a": 1}'
+    assert cache.fetch(url) == b'{"a": 1}'
+    assert ResourceCache(directory=str(tmp_path)).fetch(url) == b'{"a": 1}'
+    assert len(requests_for(stub_server, 'data.json')) == 1
+
+
+def test_conditional_refresh(stub_server, tmp_path):
+    stub_server.files['data.json'] = b'{"a": 1}'
+    cache = ResourceCache(directory=str(tmp_path), max_age=0, stale_while_revalidate=0)
+    url = f'{stub_server.url}/files/data.json'
+    assert cache.fetch(url) == b'{"a": 1}'
+    assert cache.fetch(url) == b'{"a": 1}'
+    first, second = requests_for(stub_server, 'data.json')
+    assert 'If-None-Match' not in first
+    assert second['If-None-Match'] == json.load(open(cache.path(url) + '.meta'))['etag']
+
+    stub_server.files['data.json'] = b'{"a": 2}'
+    assert cache.fetch(url) == b'{"a": 2}'
+
+
+def test_stale_copy_used_when_unreachable(stub_server, tmp_path):
+    stub_server.files['data.json'] = b'{"a": 1}'
+    cache = ResourceCache(directory=str(tmp_path), max_age=0, stale_while_revalidate=0)
+    url = f'{stub_server.url}/files/data.json'
+    cache.fetch(url)
+    del stub_server.files['data.json']
+    assert cache.fetch(url) == b'{"a": 1}'
+    with pytest.raises(FileNotFoundError):
+        cache.fetch(f'{stub_server.url}/files/other.json')
+
+
+def test_stale_while_revalidate(stub_server, tmp_path):
+    stub_server.files['data.json'] = b'{"a": 1}'
+    cache = ResourceCache(directory=str(tmp_path), max_age=0, stale_while_revalidate=3600)
+    url = f'{stub_server.url}/files/data.json'
+    cache.fetch(url)
+    stub_server.files['data.json'] = b'{"a": 2}'
+    # Served from the cache right away, refreshed in the background
+    assert cache.fetch(url) == b'{"a": 1}'
+    deadline = time.monotonic() + 5
+    while open(cache.path(url), 'rb').read() != b'{"a": 2}':
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    assert cache.fetch(url) == b'{"a": 2}'
+
+
+def test_sites_information_through_cache(stub_server, tmp_path, monkeypatch):
+    stub_server.files['data.json'] = json.dumps({'Status': stub_site(stub_server, 'status')}).encode()
+    stub_server.files['exclusions.txt'] = b'Status\n'
+    cache = ResourceCache(directory=str(tmp_path))
+    url = f'{stub_server.url}/files/data.json'
+    assert SitesInformation(url, honor_exclusions=False, cache=cache).site_name_list() == ['Status']
+    assert len(requests_for(stub_server, 'data.json')) == 1
+
+    monkeypatch.setattr(sites, 'EXCLUSIONS_URL', f'{stub_server.url}/files/exclusions.txt')
+    assert len(SitesInformation(url, cache=cache)) == 0
+    assert len(requests_for(stub_server, 'data.json')) == 1
+
+
+def test_packaged_manifest_fallback(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setattr(sites, 'MANIFEST_URL', f'{stub_server.url}/files/data.json')
+    cache = ResourceCache(directory=str(tmp_path))
+    packaged = SitesInformation(sites.LOCAL_MANIFEST, honor_exclusions=False)
+    assert len(SitesInformation(honor_exclusions=False, cache=cache)) == len(packaged)
+    # Nothing cached from the dead URL; only the snapshot of the packaged list
+    assert os.listdir(tmp_path) == ['snapshots']
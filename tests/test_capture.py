@@ -0,0 +1,86 @@
+import gzip
+import json
+import sys
+import zlib
+import pytest
+from sherlock_project import sherlock as sherlock_module
+from sherlock_project.capture import WarcCapture, surt
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryResult, QueryStatus
+from conftest import stub_site
+
+
+def test_surt():
+    assert surt('https://www.Example.com/Blue?a=1') == 'com,example)/blue?a=1'
+    assert surt('http://127.0.0.1:8080/') == '1,0,0,127:8080)/'
+
+
+def test_capture_writes_indexed_warc(stub_server, tmp_path):
+    site_data = {
+        'Status': stub_site(stub_server, 'status'),
+        'Message': stub_site(stub_server, 'message'),
+        'Other': stub_site(stub_server, 'status'),
+    }
+    path = str(tmp_path / 'run.warc.gz')
+    capture = WarcCapture(path, sites=['status', 'MESSAGE'], statuses=[QueryStatus.CLAIMED, 404])
+    for username in ('blue', 'nobody'):
+        sherlock(username, site_data, QueryNotify(), capture=capture)
+    capture.close()
+    capture.close()
+
+    # Claimed, or answered with a 404, on the two sites asked for
+    assert capture.captured == 3
+    with gzip.open(path, 'rb') as f:
+        records = f.read().split(b'WARC/1.1\r\n')[1:]
+    kinds = [record.split(b'\r\n', 1)[0] for record in records]
+    assert kinds == [b'WARC-Type: warcinfo'] + [b'WARC-Type: request', b'WARC-Type: response', b'WARC-Type: metadata'] * 3
+
+    with open(path + '.cdxj') as f:
+        index = [line.split(' ', 2) for line in f]
+    assert len(index) == 3
+    entries = [json.loads(fields) for _, _, fields in index]
+    assert sorted((e['site'], e['username'], e['verdict']) for e in entries) == [
+        ('Message', 'blue', 'Claimed'), ('Status', 'blue', 'Claimed'), ('Status', 'nobody', 'Available'),
+    ]
+
+    # Each response can be read from its offset alone
+    entry = next(e for e in entries if e['site'] == 'Message')
+    with open(path, 'rb') as f:
+        f.seek(int(entry['offset']))
+        member = f.read(int(entry['length']))
+    record = zlib.decompress(member, wbits=31)
+    assert b'WARC-Type: response' in record and b'HTTP/1.1 200' in record
+    assert record.endswith(b'Content-Length: 28\r\n\r\n<html>Profile of blue</html>\r\n\r\n')
+
+
+def test_dump_response_is_captured(stub_server, tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps({'Message': stub_site(stub_server, 'message')}))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--dump-response',
+    ])
+    sherlock_module.main()
+
+    out = capsys.readouterr().out
+    assert 'deprecated' in out and 'Profile of blue' not in out
+    with gzip.open(tmp_path / 'responses.warc.gz', 'rb') as f:
+        assert b'<html>Profile of blue</html>' in f.read()
+    with pytest.warns(DeprecationWarning):
+        sherlock('blue', {'Message': stub_site(stub_server, 'message')}, QueryNotify(), dump_response=True)
+
+
+def test_capture_counts_failures(stub_server, tmp_path):
+    class Broken:
+        url = 'https://broken.example/blue'
+        request = None
+
+    path = str(tmp_path / 'run.warc.gz')
+    capture = WarcCapture(path)
+    sherlock('blue', {'Status': stub_site(stub_server, 'status')}, QueryNotify(), capture=capture)
+    result = QueryResult('blue', 'Broken', Broken.url, QueryStatus.CLAIMED)
+    capture.record(result, Broken())
+    capture.close()
+    assert (capture.captured, capture.failed) == (1, 1)
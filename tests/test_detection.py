@@ -0,0 +1,98 @@
+import json
+import os
+import threading
+import pytest
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from jsonschema import ValidationError, validate
+from sherlock_project.sherlock import SherlockFuturesSession, sherlock
+from sherlock_project.scheduler import HostScheduler
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from conftest import stub_site
+
+
+@pytest.fixture(scope='module')
+def schema():
+    path = os.path.join(os.path.dirname(__file__), '../sherlock_project/resources/data.schema.json')
+    with open(path) as f:
+        return json.load(f)
+
+
+def header_sites(server) -> dict:
+    return {
+        'Location': stub_site(server, 'signup', errorType='location', errorLocation='/signup'),
+        'Length': stub_site(server, 'signup', errorType='content_length', errorContentLength={'max': 100}),
+        'Header': stub_site(server, 'signup', errorType='header', errorHeader={'Set-Cookie': 'no_such_user'}),
+        'Presence': stub_site(server, 'signup', errorType=['status_code', 'header'], errorHeader={'Location': None}),
+    }
+
+
+@pytest.mark.parametrize('username,expected', [
+    ('blue', QueryStatus.CLAIMED),
+    ('nobody', QueryStatus.AVAILABLE),
+])
+def test_header_detection(stub_server, username, expected):
+    results = sherlock(username, header_sites(stub_server), QueryNotify())
+    assert {site: result.status for site, result in results.items()} == dict.fromkeys(results, expected)
+    # Headers are all these sites need, so no body is downloaded
+    assert {command for command, _, _ in stub_server.seen} == {'HEAD'}
+
+
+def test_missing_content_length_is_unknown(stub_server):
+    site_data = {'Length': stub_site(stub_server, 'chunked', errorType='content_length', errorContentLength={'min': 0})}
+    result = sherlock('blue', site_data, QueryNotify())['Length']
+    assert result.status is QueryStatus.UNKNOWN
+    assert result.context == 'No Content-Length'
+
+
+def test_schema_accepts_header_detection(stub_server, schema):
+    validate(instance=header_sites(stub_server), schema=schema)
+    with pytest.raises(ValidationError):
+        validate(instance={'Site': stub_site(stub_server, 'signup', errorType='location')}, schema=schema)
+    with pytest.raises(ValidationError):
+        validate(instance={'Site': stub_site(stub_server, 'signup', errorType='content_length', errorContentLength={})}, schema=schema)
+
+
+def test_verdicts_reached_in_workers(stub_server):
+    threads = []
+
+    def verdict(outcome):
+        threads.append(threading.get_ident())
+        try:
+            return outcome.result().status_code
+        except requests.exceptions.ConnectionError:
+            return 'refused'
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        session = SherlockFuturesSession(executor=executor, session=requests.session())
+        found = session.get(f'{stub_server.url}/status/blue', verdict=verdict)
+        refused = session.get('http://127.0.0.1:9/', timeout=2, verdict=verdict)
+        assert (found.result(), refused.result()) == (200, 'refused')
+    assert threading.get_ident() not in threads
+
+
+def test_futures_resolve_to_results(stub_server):
+    class Recorder(QueryNotify):
+        def update(self, result):
+            self.thread = threading.get_ident()
+            self.result = result
+
+    query_notify = Recorder()
+    results = sherlock('blue', {'Status': stub_site(stub_server, 'status')}, query_notify)
+    assert results['Status']['status'].status is QueryStatus.CLAIMED
+    # Notifications are still dispatched by the calling thread
+    assert query_notify.thread == threading.get_ident()
+
+
+def test_requests_labelled_with_site(stub_server):
+    scheduler = HostScheduler(max_workers=1)
+    session = SherlockFuturesSession(executor=scheduler.lane('blue'), session=requests.session())
+    seen = []
+    future = session.get(
+        f'{stub_server.url}/status/blue', label='Status',
+        verdict=lambda outcome: seen.append(scheduler.snapshot()['slowest']),
+    )
+    future.result()
+    scheduler.shutdown()
+    assert seen[0][0][:2] == ('Status', 'blue')
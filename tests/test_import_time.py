@@ -0,0 +1,29 @@
+import subprocess
+import sys
+
+# Only needed by some features, so they must not slow every import down
+LAZY_MODULES = ['pandas', 'numpy', 'openpyxl', 'pyarrow', 'stem', 'webbrowser']
+
+
+def loaded_modules(code: str) -> set[str]:
+    proc = subprocess.run(
+        [sys.executable, '-c', f'{code}\nimport sys\nprint(" ".join(sys.modules))'],
+        capture_output=True, text=True, check=True,
+    )
+    return set(proc.stdout.split())
+
+
+def test_library_import_is_light():
+    loaded = loaded_modules('import sherlock_project.sherlock')
+    assert loaded.isdisjoint(LAZY_MODULES)
+
+
+def test_version_is_light():
+    loaded = loaded_modules(
+        'import sys\n'
+        'sys.argv = ["sherlock", "--version"]\n'
+        'from sherlock_project.__main__ import main\n'
+        'main()'
+    )
+    assert 'requests' not in loaded
+    assert 'sherlock_project.sherlock' not in loaded
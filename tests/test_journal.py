@@ -0,0 +1,61 @@
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.journal import QueryJournal
+from sherlock_project.result import QueryStatus
+
+# Nothing listens on the discard port, so any request made would fail
+UNREACHABLE_SITE: dict = {
+    'url': 'http://127.0.0.1:9/{}',
+    'urlMain': 'http://127.0.0.1:9/',
+    'errorType': 'status_code',
+    'username_claimed': 'blue',
+}
+
+
+def test_journal_records_and_reloads(tmp_path):
+    path = tmp_path / 'run.journal'
+    site_data = {'Picky': dict(UNREACHABLE_SITE, regexCheck=r'^[a-z]+$')}
+
+    journal = QueryJournal(str(path))
+    results = sherlock('NOT-ALLOWED', site_data, QueryNotify(), journal=journal)
+    journal.close()
+    assert results['Picky']['status'].status is QueryStatus.ILLEGAL
+
+    reloaded = QueryJournal(str(path))
+    assert reloaded.load() == 1
+    assert reloaded.lookup('NOT-ALLOWED', 'Picky')['status'].status is QueryStatus.ILLEGAL
+    assert reloaded.lookup('someone-else', 'Picky') is None
+
+
+def test_journal_ignores_truncated_line(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text(
+        '{"username":"blue","site":"A","url_user":"u","status":"Claimed"}\n'
+        '{"username":"blue","site":"B","url_u'
+    )
+    journal = QueryJournal(str(path))
+    assert journal.load() == 1
+    assert journal.lookup('blue', 'A')['status'].status is QueryStatus.CLAIMED
+
+
+def test_resume_skips_finished_queries(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text('{"username":"blue","site":"Offline","url_user":"u","status":"Claimed","http_status":200}\n')
+
+    journal = QueryJournal(str(path))
+    journal.load()
+    results = sherlock('blue', {'Offline': dict(UNREACHABLE_SITE)}, QueryNotify(), journal=journal)
+    journal.close()
+
+    # The site is unreachable, so a CLAIMED verdict can only come from the journal
+    assert results['Offline']['status'].status is QueryStatus.CLAIMED
+    assert results['Offline']['http_status'] == 200
+
+
+def test_resume_retries_unknown_results(tmp_path):
+    path = tmp_path / 'run.journal'
+    path.write_text('{"username":"blue","site":"Offline","url_user":"u","status":"Unknown"}\n')
+
+    journal = QueryJournal(str(path))
+    journal.load()
+    assert journal.lookup('blue', 'Offline') is None
@@ -0,0 +1,121 @@
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sherlock_project.notify import QueryNotify, QueryNotifyMulti, QueryNotifyPrint
+from sherlock_project.result import QueryResult, QueryStatus
+
+
+class Recorder(QueryNotify):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    def start(self, message=None):
+        self.calls.append(('start', message))
+
+    def update(self, result):
+        self.calls.append(('update', result.site_name))
+
+    def update_batch(self, results):
+        self.calls.append(('batch', [result.site_name for result in results]))
+
+    def finish(self, message=None):
+        self.calls.append(('finish', message))
+
+
+def result(site, status=QueryStatus.CLAIMED):
+    return QueryResult('blue', site, f'https://{site}.example/blue', status)
+
+
+def test_multi_batches_by_size_and_time():
+    first, second = Recorder(), Recorder()
+    multi = QueryNotifyMulti([first, second], batch_size=2, batch_interval=0.05)
+    multi.start('blue')
+    for site in 'abc':
+        multi.update(result(site))
+    assert first.calls == [('start', 'blue'), ('batch', ['a', 'b'])]
+    # The last one is delivered once the interval is over
+    time.sleep(0.3)
+    assert first.calls[-1] == ('batch', ['c'])
+    multi.update(result('d'))
+    multi.finish()
+    assert first.calls[-2:] == [('batch', ['d']), ('finish', None)]
+    assert second.calls == first.calls
+
+    unbatched = Recorder()
+    QueryNotifyMulti([unbatched]).update(result('a'))
+    assert unbatched.calls == [('update', 'a')]
+
+
+def test_multi_is_thread_safe():
+    class Counter(QueryNotify):
+        def __init__(self):
+            super().__init__()
+            self.count = 0
+
+        def update(self, result):
+            # Not atomic without the fan-out serializing the calls
+            count = self.count
+            time.sleep(0)
+            self.count = count + 1
+
+    counter = Counter()
+    multi = QueryNotifyMulti([counter], batch_size=7, batch_interval=0.01)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: multi.update(result(str(i))), range(2000)))
+    multi.flush()
+    assert counter.count == 2000
+
+
+def test_print_counts_per_instance(capsys):
+    printers = [QueryNotifyPrint(), QueryNotifyPrint()]
+    for status in (QueryStatus.CLAIMED, QueryStatus.AVAILABLE, QueryStatus.CLAIMED):
+        printers[0].update(result('a', status))
+    printers[1].update(result('b'))
+    assert [printer.results for printer in printers] == [2, 1]
+    printers[1].finish()
+    assert ' 1 ' in capsys.readouterr().out.splitlines()[-1]
+
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+
+def test_print_plain_blocks_off_terminal(monkeypatch):
+    out = io.StringIO()
+    monkeypatch.setattr(sys, 'stdout', out)
+    printer = QueryNotifyPrint(print_all=True)
+    printer.update(result('a'))
+    printer.update(result('b', QueryStatus.AVAILABLE))
+    # Held until a block is full, or flushed
+    assert out.getvalue() == ''
+    printer.flush()
+    assert out.getvalue() == '[+] a: https://a.example/blue\n[-] b: Not Found!\n'
+
+
+def test_print_colors_terminal_by_interval(monkeypatch):
+    out = Terminal()
+    monkeypatch.setattr(sys, 'stdout', out)
+    printer = QueryNotifyPrint(refresh_interval=0.05)
+    printer.update(result('a'))
+    assert out.getvalue() == ''
+    time.sleep(0.3)
+    assert '\x1b[' in out.getvalue() and 'https://a.example/blue' in out.getvalue()
+
+    plain = QueryNotifyPrint(color=False)
+    plain.update(result('b'))
+    plain.flush()
+    assert out.getvalue().endswith('[+] b: https://b.example/blue\n')
+
+
+def test_print_browses_in_background(monkeypatch):
+    import webbrowser
+    monkeypatch.setattr(sys, 'stdout', io.StringIO())
+    opened = []
+    monkeypatch.setattr(webbrowser, 'open', lambda url, new: opened.append(url))
+    printer = QueryNotifyPrint(browse=True)
+    printer.update_batch([result('a'), result('b', QueryStatus.AVAILABLE), result('c')])
+    printer.finish()
+    assert opened == ['https://a.example/blue', 'https://c.example/blue']
@@ -0,0 +1,49 @@
+import io
+import sys
+import threading
+from sherlock_project.progress import QueryNotifyProgress, format_duration
+from sherlock_project.result import QueryResult, QueryStatus
+from sherlock_project.scheduler import HostScheduler
+
+
+def result(site, status, query_time=None):
+    return QueryResult('blue', site, f'https://{site}.example/blue', status, query_time=query_time)
+
+
+def test_format_duration():
+    assert [format_duration(s) for s in (0.25, 12.34, 572, 3900)] == ['250ms', '12.3s', '9m32s', '1h05m']
+
+
+def test_status_line(monkeypatch):
+    scheduler = HostScheduler(max_workers=2)
+    release = threading.Event()
+    # Labelled with the site, as the probes are
+    scheduler.submit_labelled('blue', 'slow.example', 'Slow Site', release.wait)
+    scheduler.submit('blue', 'slow.example', release.wait)
+    scheduler.submit('blue', 'next.example', release.wait)
+    try:
+        progress = QueryNotifyProgress(total=10, scheduler=scheduler)
+        progress.update_batch([
+            result('a', QueryStatus.CLAIMED, 0.1),
+            result('b', QueryStatus.AVAILABLE, 0.2),
+            result('c', QueryStatus.UNKNOWN, 2.0),
+            result('d', QueryStatus.WAF),
+        ])
+        line = progress.render()
+    finally:
+        release.set()
+        scheduler.shutdown()
+
+    assert line.startswith('[~] 4/10 40% | ')
+    assert 'in flight 2, queued 1' in line
+    assert 'p50 200ms p95 200ms' in line
+    assert 'found 1, errors 25.0%, WAF 25.0%' in line
+    assert 'slowest: Slow Site ' in line and ', slow.example ' in line
+    assert len(progress.render(width=20)) == 20
+
+    # Off a terminal, the last line is written when the run is over
+    err = io.StringIO()
+    monkeypatch.setattr(sys, 'stderr', err)
+    progress.start('blue')
+    progress.finish()
+    assert err.getvalue().startswith('[~] 4/10 40% | ') and err.getvalue().endswith('\n')
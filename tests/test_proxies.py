@@ -0,0 +1,153 @@
+import json
+import socket
+import sys
+import threading
+import pytest
+import requests
+from sherlock_project import sherlock as sherlock_module
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.proxies import FallbackRoute, ProxyPool, ProxyPoolAdapter, PoolProxy, parse_tor_instance
+from sherlock_project.result import QueryStatus
+from conftest import stub_site
+
+
+def dead_proxy_url() -> str:
+    """URL of a local port nothing listens on"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    return f'http://127.0.0.1:{port}'
+
+
+def test_load_spread_over_pool(stub_server, stub_proxies):
+    proxies = stub_proxies(2)
+    pool = ProxyPool([proxy.url for proxy in proxies])
+    site_data = {f'Site{i}': stub_site(stub_server, 'status') for i in range(10)}
+
+    results = sherlock('blue', site_data, QueryNotify(), proxy_pool=pool)
+
+    assert all(results[site]['status'].status is QueryStatus.CLAIMED for site in site_data)
+    assert len(proxies[0].forwarded) + len(proxies[1].forwarded) == 10
+    assert proxies[0].forwarded and proxies[1].forwarded
+
+
+def test_failing_proxy_is_ejected(stub_server, stub_proxies):
+    working = stub_proxies(1)[0]
+    pool = ProxyPool([dead_proxy_url(), working.url], check_url=f'{stub_server.url}/status/blue')
+    assert pool.check(timeout=2) == 1
+    site_data = {f'Site{i}': stub_site(stub_server, 'status') for i in range(5)}
+
+    results = sherlock('nobody', site_data, QueryNotify(), proxy_pool=pool)
+
+    assert all(results[site]['status'].status is QueryStatus.AVAILABLE for site in site_data)
+    # One health check, then every probe
+    assert len(working.forwarded) == 6
+
+
+def test_passive_ejection_and_retry():
+    pool = ProxyPool(['http://a:1', 'http://b:1'], max_failures=2, retry_after=0.0)
+    proxy = pool.acquire()
+    pool.release(proxy, failed=True)
+    assert proxy.healthy
+    pool.release(pool.acquire(), failed=False)
+    # Two failures in a row eject the proxy
+    for _ in range(2):
+        pool.release(proxy, failed=True)
+    assert not proxy.healthy
+    # retry_after has elapsed, so it is handed out again
+    assert pool.acquire() in pool.proxies
+    assert proxy.healthy
+
+
+def test_no_healthy_proxy():
+    pool = ProxyPool(['http://a:1'], max_failures=1, retry_after=3600)
+    pool.release(pool.acquire(), failed=True)
+    with pytest.raises(requests.exceptions.ProxyError):
+        pool.acquire()
+
+
+def test_dead_socks_proxy_is_ejected(stub_server):
+    pytest.importorskip('socks')
+    dead = dead_proxy_url().replace('http://', 'socks5h://')
+    pool = ProxyPool([dead], max_failures=3, retry_after=3600)
+    session = requests.session()
+    session.mount('http://', ProxyPoolAdapter(pool))
+    for _ in range(3):
+        with pytest.raises(requests.exceptions.ConnectionError):
+            session.get(f'{stub_server.url}/status/blue', timeout=2)
+    assert (pool.proxies[0].failures, pool.proxies[0].healthy) == (3, False)
+
+
+def test_circuit_renewed_in_background():
+    renewed = threading.Event()
+    release = threading.Event()
+
+    class Tor(PoolProxy):
+        def renew(self):
+            renewed.set()
+            release.wait(5)
+            return True
+
+    pool = ProxyPool([Tor('socks5h://127.0.0.1:1', control_port=2)], max_failures=1)
+    # Returns while the control port has not answered
+    pool.release(pool.acquire(), failed=True)
+    assert renewed.wait(5)
+    release.set()
+
+
+def test_sticky_strategy():
+    pool = ProxyPool(['http://a:1', 'http://b:1', 'http://c:1'], strategy='sticky')
+    first = pool.acquire('example.com')
+    assert all(pool.acquire('example.com') is first for _ in range(5))
+    assert pool.acquire('other.example.com') is not first
+
+
+def test_tor_instance_parsing():
+    tor = parse_tor_instance('9050:9051')
+    assert isinstance(tor, PoolProxy)
+    assert tor.url == 'socks5h://127.0.0.1:9050'
+    assert tor.control_port == 9051
+    assert parse_tor_instance('9150').control_port is None
+    with pytest.raises(ValueError):
+        parse_tor_instance('tor')
+
+
+def test_fallback_reroutes_only_blocked_queries(stub_server, stub_proxies):
+    proxy = stub_proxies(1)[0]
+    site_data = {
+        'Direct': stub_site(stub_server, 'status'),
+        'Blocked': stub_site(stub_server, 'waf', errorType='message', errorMsg='User not found'),
+        'Limited': stub_site(stub_server, 'ratelimit'),
+        'Flagged': stub_site(stub_server, 'status', fallback=True),
+    }
+    notified = []
+
+    class Recorder(QueryNotify):
+        def update(self, result):
+            notified.append((result.site_name, result.status))
+
+    fallback = FallbackRoute(proxy=proxy.url)
+    results = sherlock('blue', site_data, Recorder(), fallback=fallback)
+    fallback.shutdown()
+
+    assert list(results) == list(site_data)
+    assert all(results[site]['status'].status is QueryStatus.CLAIMED for site in site_data)
+    # Only the blocked queries went through the fallback, plus the flagged site from the start
+    assert sorted(path.rsplit('/', 2)[1] for path in proxy.forwarded) == ['ratelimit', 'status', 'waf']
+    # First-pass verdicts of blocked queries are never reported
+    assert sorted(notified) == sorted((site, QueryStatus.CLAIMED) for site in site_data)
+
+
+def test_cli_exits_without_working_fallback_proxy(stub_server, tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps({'Status': stub_site(stub_server, 'status')}))
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--fallback-proxy', dead_proxy_url(), '--fallback-proxy', dead_proxy_url(),
+    ])
+    with pytest.raises(SystemExit):
+        sherlock_module.main()
+    out = capsys.readouterr().out
+    assert 'fallback pool of 2 proxies (0 healthy)' in out
+    assert 'None of the proxies of the fallback pool is working' in out
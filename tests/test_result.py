@@ -0,0 +1,48 @@
+import pytest
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryResult, QueryStatus
+from sherlock_project.sites import SiteInformation
+from conftest import stub_site
+
+
+def test_records_are_slotted():
+    result = QueryResult('blue', 'Site', 'https://site.example/blue', QueryStatus.CLAIMED)
+    site = SiteInformation('Site', 'https://site.example/', 'https://site.example/{}', 'blue', {}, False)
+    for record in (result, site):
+        assert not hasattr(record, '__dict__')
+        with pytest.raises(AttributeError):
+            record.extra = True
+
+
+def test_legacy_keys():
+    result = QueryResult(
+        'blue', 'Site', 'https://site.example/blue', QueryStatus.CLAIMED,
+        site_url_main='https://site.example/', transferred=(1, 2, 3),
+    )
+    assert result['status'] is result
+    assert result['url_main'] == 'https://site.example/'
+    assert result['url_user'] == 'https://site.example/blue'
+    assert result['http_status'] == ''
+    assert result['bytes'] == {'sent': 1, 'received': 2, 'decoded': 3}
+    assert result.get('nope', 'default') == 'default'
+    with pytest.raises(KeyError):
+        QueryResult('blue', 'Site', '', QueryStatus.ILLEGAL)['bytes']
+
+
+def test_results_carry_the_probe(stub_server):
+    site_data = {
+        'Status': stub_site(stub_server, 'status'),
+        'Illegal': stub_site(stub_server, 'status', regexCheck='^[0-9]+$'),
+    }
+    results = sherlock('blue', site_data, QueryNotify())
+    status = results['Status']
+    assert status.status is QueryStatus.CLAIMED
+    assert status.http_status == 200
+    assert status.site_url_main == site_data['Status']['urlMain']
+    assert status.response_text is not None
+    assert results['Illegal'].status is QueryStatus.ILLEGAL
+    assert results['Illegal'].http_status is None
+
+    results = sherlock('blue', site_data, QueryNotify(), keep_response_text=False)
+    assert results['Status'].response_text is None
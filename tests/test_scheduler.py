@@ -0,0 +1,102 @@
+import threading
+import time
+import pytest
+from concurrent.futures import CancelledError
+from sherlock_project.scheduler import HostScheduler
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from conftest import stub_site
+
+
+class ConcurrencyProbe:
+    """Callable recording the peak number of simultaneous calls per host"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.current: dict[str, int] = {}
+        self.peak: dict[str, int] = {}
+        self.order: list[tuple[str, str]] = []
+
+    def __call__(self, host: str, lane: str, delay: float = 0.02) -> str:
+        with self.lock:
+            self.current[host] = self.current.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.current[host])
+            self.order.append((host, lane))
+        time.sleep(delay)
+        with self.lock:
+            self.current[host] -= 1
+        return f"{lane}@{host}"
+
+
+def test_per_host_limit():
+    probe = ConcurrencyProbe()
+    scheduler = HostScheduler(max_workers=8, max_per_host=2)
+    scheduler.set_host_limit('slow.example', 1)
+    futures = [
+        scheduler.submit(f'user{i}', host, probe, host, f'user{i}')
+        for i in range(6)
+        for host in ('a.example', 'b.example', 'slow.example')
+    ]
+    assert [f.result() for f in futures][:3] == ['user0@a.example', 'user0@b.example', 'user0@slow.example']
+    scheduler.shutdown()
+    assert probe.peak['a.example'] == 2
+    assert probe.peak['b.example'] == 2
+    assert probe.peak['slow.example'] == 1
+
+
+def test_round_robin_across_lanes():
+    probe = ConcurrencyProbe()
+    scheduler = HostScheduler(max_workers=1, max_per_host=1)
+    # Hold the only worker, so that everything below queues up first
+    blocker = threading.Event()
+    scheduler.submit('blocker', 'x.example', blocker.wait)
+    futures = [scheduler.submit('alice', 'a.example', probe, 'a.example', 'alice', 0) for _ in range(3)]
+    futures += [scheduler.submit('bob', 'a.example', probe, 'a.example', 'bob', 0) for _ in range(3)]
+    blocker.set()
+    for future in futures:
+        future.result()
+    scheduler.shutdown()
+    assert [lane for _, lane in probe.order] == ['alice', 'bob'] * 3
+
+
+def test_cancel_lane():
+    scheduler = HostScheduler(max_workers=1)
+    blocker = threading.Event()
+    scheduler.submit('blocker', 'x.example', blocker.wait)
+    doomed = scheduler.submit('alice', 'a.example', lambda: 'alice')
+    kept = scheduler.submit('bob', 'a.example', lambda: 'bob')
+    scheduler.cancel('alice')
+    blocker.set()
+    assert kept.result() == 'bob'
+    with pytest.raises(CancelledError):
+        doomed.result()
+    scheduler.shutdown()
+    with pytest.raises(RuntimeError):
+        scheduler.submit('carol', 'a.example', lambda: 'carol')
+
+
+def test_shared_scheduler_across_usernames(stub_server):
+    site_data = {
+        'Status': stub_site(stub_server, 'status'),
+        'Message': stub_site(stub_server, 'message', maxConcurrency=1),
+    }
+    scheduler = HostScheduler(max_workers=4, max_per_host=2)
+    results = {}
+
+    def query(username):
+        results[username] = sherlock(username, site_data, QueryNotify(), scheduler=scheduler)
+
+    threads = [threading.Thread(target=query, args=(name,)) for name in ('blue', 'nobody', 'other')]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    scheduler.shutdown()
+
+    assert results['blue']['Status']['status'].status is QueryStatus.CLAIMED
+    assert results['blue']['Message']['status'].status is QueryStatus.CLAIMED
+    for username in ('nobody', 'other'):
+        assert results[username]['Status']['status'].status is QueryStatus.AVAILABLE
+        assert results[username]['Message']['status'].status is QueryStatus.AVAILABLE
+    # Manifest limit applies to the whole host, for every username
+    assert scheduler.host_limit('127.0.0.1') == 1
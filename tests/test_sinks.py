@@ -0,0 +1,197 @@
+import csv
+import json
+import os
+import sys
+import pytest
+from sherlock_project import sherlock as sherlock_module
+from sherlock_project.result import QueryResult, QueryStatus
+from sherlock_project.sinks import (
+    QueryNotifyCsv, QueryNotifyDataset, QueryNotifyNdjson, QueryNotifyTxt, QueryNotifyXlsx,
+)
+from conftest import stub_site
+
+
+def test_files_are_streamed_then_renamed(tmp_path):
+    path = str(tmp_path / '{}.txt')
+    sink = QueryNotifyTxt(path, flush_interval=0)
+    sink.start('blue')
+    sink.update(QueryResult('blue', 'Site', 'https://site.example/blue', QueryStatus.CLAIMED))
+    sink.update(QueryResult('blue', 'Other', 'https://other.example/blue', QueryStatus.AVAILABLE))
+
+    # Visible while the username is still being queried
+    assert (tmp_path / 'blue.txt.part').read_text() == 'https://site.example/blue\n'
+    assert not (tmp_path / 'blue.txt').exists()
+
+    sink.finish('blue')
+    assert os.listdir(tmp_path) == ['blue.txt']
+    assert (tmp_path / 'blue.txt').read_text() == (
+        'https://site.example/blue\nTotal Websites Username Detected On : 1\n'
+    )
+
+
+def test_csv_keeps_usernames_apart(tmp_path):
+    sink = QueryNotifyCsv(str(tmp_path / '{}.csv'), claimed_only=True)
+    for username in ('blue', 'red'):
+        sink.start(username)
+    sink.update(QueryResult('red', 'Site', 'u', QueryStatus.CLAIMED, query_time=0.5, http_status=200))
+    sink.update(QueryResult('blue', 'Site', 'u', QueryStatus.AVAILABLE))
+    sink.finish()
+
+    with open(tmp_path / 'red.csv', newline='') as f:
+        assert list(csv.reader(f)) == [QueryNotifyCsv.columns, ['red', 'Site', '', 'u', 'Claimed', '200', '0.5']]
+    with open(tmp_path / 'blue.csv', newline='') as f:
+        assert list(csv.reader(f)) == [QueryNotifyCsv.columns]
+
+
+def test_cli_writes_files(stub_server, tmp_path, monkeypatch):
+    manifest = {'Status': stub_site(stub_server, 'status'), 'Message': stub_site(stub_server, 'message')}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    out = tmp_path / 'out'
+
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', 'nobody', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--txt', '--csv', '--print-all', '--folderoutput', str(out),
+        '--xlsx-workbook', str(tmp_path / 'run.xlsx'),
+    ])
+    sherlock_module.main()
+
+    assert sorted(os.listdir(out)) == ['blue.csv', 'blue.txt', 'nobody.csv', 'nobody.txt']
+    assert (out / 'nobody.txt').read_text() == 'Total Websites Username Detected On : 0\n'
+    with open(out / 'blue.csv', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert sorted((row['name'], row['exists']) for row in rows) == [('Message', 'Claimed'), ('Status', 'Claimed')]
+    from openpyxl import load_workbook
+    assert load_workbook(tmp_path / 'run.xlsx').sheetnames == ['blue', 'nobody']
+
+
+def test_cli_completes_files_when_interrupted(stub_server, tmp_path, monkeypatch):
+    manifest = {'Status': stub_site(stub_server, 'status')}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    out = tmp_path / 'out'
+    query = sherlock_module.sherlock
+
+    def interrupted(username, site_data, query_notify, **kwargs):
+        if username == 'nobody':
+            query_notify.start(username)
+            query_notify.update(QueryResult('nobody', 'Status', 'u', QueryStatus.AVAILABLE))
+            # As the signal handler does
+            sys.exit(0)
+        return query(username, site_data, query_notify, **kwargs)
+
+    monkeypatch.setattr(sherlock_module, 'sherlock', interrupted)
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', 'nobody', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--csv', '--folderoutput', str(out),
+        '--xlsx-workbook', str(tmp_path / 'run.xlsx'), '--store', str(tmp_path / 'run.db'),
+    ])
+    with pytest.raises(SystemExit):
+        sherlock_module.main()
+
+    assert sorted(os.listdir(out)) == ['blue.csv', 'nobody.csv']
+    assert not [name for name in os.listdir(tmp_path) if name.endswith('.part')]
+    from openpyxl import load_workbook
+    assert load_workbook(tmp_path / 'run.xlsx').sheetnames == ['blue', 'nobody']
+    from sherlock_project.store import query_store
+    assert [row['username'] for row in query_store(str(tmp_path / 'run.db'))] == ['blue', 'nobody']
+
+
+def _rows(sheet):
+    return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+
+def test_xlsx_workbooks(tmp_path):
+    from openpyxl import load_workbook
+    results = [
+        QueryResult('blue', 'Site', 'u', QueryStatus.CLAIMED, query_time=0.5, http_status=200),
+        QueryResult('a:b', 'Site', 'v', QueryStatus.AVAILABLE),
+    ]
+    sinks = [
+        QueryNotifyXlsx(str(tmp_path / '{}.xlsx')),
+        QueryNotifyXlsx(str(tmp_path / 'run.xlsx')),
+        QueryNotifyXlsx(str(tmp_path / 'combined.xlsx'), claimed_only=True, combined=True),
+    ]
+    for sink in sinks:
+        for result in results:
+            sink.start(result.username)
+            sink.update(result)
+        sink.finish('blue')
+    assert sorted(os.listdir(tmp_path)) == ['blue.xlsx']
+    for sink in sinks:
+        sink.finish()
+
+    header = QueryNotifyXlsx.columns
+    claimed = ['blue', 'Site', None, 'u', 'Claimed', 200, 0.5]
+    assert sorted(os.listdir(tmp_path)) == ['a:b.xlsx', 'blue.xlsx', 'combined.xlsx', 'run.xlsx']
+    assert _rows(load_workbook(tmp_path / 'blue.xlsx')['sheet1']) == [header, claimed]
+    run = load_workbook(tmp_path / 'run.xlsx')
+    assert run.sheetnames == ['blue', 'a_b']
+    assert _rows(run['a_b']) == [header, ['a:b', 'Site', None, 'v', 'Available', None, None]]
+    combined = load_workbook(tmp_path / 'combined.xlsx')
+    assert combined.sheetnames == ['results']
+    assert _rows(combined['results']) == [header, claimed]
+
+
+def test_ndjson_records(tmp_path):
+    path = tmp_path / 'results.ndjson'
+    sink = QueryNotifyNdjson(str(path), summaries=True)
+    sink.update(QueryResult('blue', 'Site', 'u', QueryStatus.CLAIMED, query_time=0.25, http_status=200))
+    sink.update(QueryResult('blue', 'Other', 'v', QueryStatus.UNKNOWN, context='Timeout'))
+    sink.finish('blue')
+    sink.finish()
+
+    lines = path.read_text().splitlines()
+    assert lines[0] == (
+        '{"type":"result","username":"blue","site":"Site","url":"u","status":"Claimed",'
+        '"http_status":200,"query_time":0.25,"context":null}'
+    )
+    assert json.loads(lines[1])['context'] == 'Timeout'
+    assert json.loads(lines[2]) == {'type': 'summary', 'username': 'blue', 'total': 2, 'Claimed': 1, 'Unknown': 1}
+
+
+def test_cli_ndjson_on_stdout(stub_server, stub_proxies, tmp_path, monkeypatch, capsys):
+    manifest = {'Status': stub_site(stub_server, 'status')}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--proxy', stub_proxies(1)[0].url, '--ndjson',
+    ])
+    sherlock_module.main()
+    captured = capsys.readouterr()
+    assert [json.loads(line)['status'] for line in captured.out.splitlines()] == ['Claimed']
+    # Including the messages written before the run
+    assert 'Using the proxy' in captured.err
+    assert 'Search completed' in captured.err
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_dataset_sink(tmp_path, format):
+    pa = pytest.importorskip('pyarrow')
+    sink = QueryNotifyDataset(str(tmp_path), format=format, row_group_size=2, rows_per_file=4, run='test')
+    statuses = [QueryStatus.CLAIMED, QueryStatus.AVAILABLE, QueryStatus.UNKNOWN]
+    for i in range(5):
+        sink.update(QueryResult(
+            f'user{i}', 'Site', f'https://site.example/user{i}', statuses[i % 3],
+            query_time=0.5, http_status=200 if i else None,
+        ))
+    sink.finish('user4')
+    # The first file is complete, the last row is waiting for its row group
+    assert os.listdir(tmp_path / 'run=test') == [f'part-00000.{format}']
+    sink.finish()
+
+    names = sorted(os.listdir(tmp_path / 'run=test'))
+    assert names == [f'part-00000.{format}', f'part-00001.{format}']
+    if format == 'parquet':
+        import pyarrow.parquet as pq
+        tables = [pq.read_table(tmp_path / 'run=test' / name) for name in names]
+    else:
+        tables = [pa.ipc.open_file(str(tmp_path / 'run=test' / name)).read_all() for name in names]
+    table = pa.concat_tables(tables)
+    assert table.num_rows == 5
+    assert pa.types.is_dictionary(table.schema.field('status').type)
+    assert table.schema.field('query_time').type == pa.float64()
+    assert table.column('status').to_pylist() == ['Claimed', 'Available', 'Unknown', 'Claimed', 'Available']
+    assert table.column('http_status').to_pylist() == [None, 200, 200, 200, 200]
@@ -0,0 +1,87 @@
+import json
+import pytest
+from sherlock_project.sites import SitesInformation, SitesView
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from conftest import stub_site
+
+
+@pytest.fixture()
+def stub_sites(stub_server, tmp_path) -> SitesInformation:
+    manifest = {
+        'Status': stub_site(stub_server, 'status', tags=['social']),
+        'Message': stub_site(stub_server, 'message', tags=['social', 'forum']),
+        'Adult': stub_site(stub_server, 'status', isNSFW=True, urlMain='https://www.adult.example/', tags='adult'),
+    }
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    return SitesInformation(str(path), honor_exclusions=False)
+
+
+def test_select(stub_sites):
+    assert list(stub_sites.select()) == ['Status', 'Message', 'Adult']
+    assert list(stub_sites.select(names=['message', 'STATUS'])) == ['Message', 'Status']
+    assert stub_sites.select(names=['status', 'Nope']).missing == ['Nope']
+    assert list(stub_sites.select(nsfw=True)) == ['Adult']
+    assert list(stub_sites.select(nsfw=False)) == ['Status', 'Message']
+    assert list(stub_sites.select(error_type='message')) == ['Message']
+    assert list(stub_sites.select(host='ADULT.example')) == ['Adult']
+    assert list(stub_sites.select(host='https://www.adult.example/about')) == ['Adult']
+    assert list(stub_sites.select(tags='forum')) == ['Message']
+    assert list(stub_sites.select(tags='adult')) == ['Adult']
+    assert list(stub_sites.select(tags=['forum', 'social'], error_type='status_code')) == ['Status']
+    assert list(stub_sites.select(names=['Adult', 'Status'], nsfw=False)) == ['Status']
+
+
+def test_select_combined_error_types(stub_server, tmp_path):
+    manifest = {
+        'Status': stub_site(stub_server, 'status'),
+        'Both': stub_site(stub_server, 'message', errorType=['status_code', 'message']),
+    }
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    sites = SitesInformation(str(path), honor_exclusions=False)
+    assert list(sites.select(error_type='message')) == ['Both']
+    assert list(sites.select(error_type='status_code')) == ['Status', 'Both']
+
+
+def test_select_is_a_view(stub_sites):
+    view = stub_sites.select(names='status')
+    assert isinstance(view, SitesView)
+    assert view['Status'] is stub_sites.sites['Status'].information
+    assert 'Message' not in view
+    with pytest.raises(KeyError):
+        view['Message']
+    assert view.site('Status') is stub_sites.sites['Status']
+
+
+def test_remove_nsfw_sites_keeps_indexes(stub_sites):
+    stub_sites.remove_nsfw_sites(do_not_remove=[])
+    assert stub_sites.site_name_list() == ['Message', 'Status']
+    assert list(stub_sites.select(host='adult.example')) == []
+    assert stub_sites.select(names='adult').missing == ['adult']
+
+
+def test_sherlock_on_view(stub_sites):
+    results = sherlock('blue', stub_sites.select(tags='social'), QueryNotify())
+    assert list(results) == ['Status', 'Message']
+    assert all(result['status'].status is QueryStatus.CLAIMED for result in results.values())
+
+
+def test_shards_and_lazy_sites(stub_server, tmp_path):
+    first = {f'Site{i}': stub_site(stub_server, 'status') for i in range(1000)}
+    second = {'Site0': stub_site(stub_server, 'message'), 'Extra': stub_site(stub_server, 'status')}
+    paths = []
+    for name, shard in (('first.json', first), ('second.json', second)):
+        (tmp_path / name).write_text(json.dumps(shard))
+        paths.append(str(tmp_path / name))
+
+    sites = SitesInformation(paths, honor_exclusions=False)
+    assert len(sites) == 1001
+    assert list(sites.select(error_type='message')) == ['Site0']
+    # Nothing has been turned into SiteInformation objects yet
+    assert not sites.sites._sites
+    assert sites.sites['Site0'].information['errorType'] == 'message'
+    assert sites.sites['Site0'] is sites.sites['Site0']
+    assert list(sites.sites._sites) == ['Site0']
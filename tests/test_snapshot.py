@@ -0,0 +1,61 @@
+import json
+import pytest
+from sherlock_interactives import Interactives
+from sherlock_project import snapshot
+from sherlock_project.cache import ResourceCache
+from sherlock_project.sites import SitesInformation, LOCAL_MANIFEST
+from conftest import stub_site
+
+
+def manifest(stub_server) -> dict:
+    return {
+        'Status': stub_site(stub_server, 'status'),
+        'Message': stub_site(stub_server, 'message', isNSFW=True),
+    }
+
+
+def test_compile_and_load(stub_server, tmp_path):
+    compiled = snapshot.compile_snapshot(json.dumps(manifest(stub_server)), 'Message\nUnknown\n')
+    assert compiled['excluded'] == ['Message']
+    assert compiled['nsfw'] == ['Message']
+    path = str(tmp_path / 'sites.snapshot')
+    snapshot.dump_snapshot(compiled, path)
+    assert snapshot.load_snapshot(path) == compiled
+
+    assert SitesInformation(path).site_name_list() == ['Status']
+    assert SitesInformation(path, do_not_exclude=['Message']).site_name_list() == ['Message', 'Status']
+    sites = SitesInformation(path, honor_exclusions=False)
+    sites.remove_nsfw_sites()
+    assert sites.site_name_list() == ['Status']
+
+
+def test_compile_rejects_incomplete_sites():
+    with pytest.raises(ValueError, match='Missing attribute'):
+        snapshot.compile_snapshot(json.dumps({'Broken': {'url': 'x'}}))
+
+
+def test_cached_snapshot(stub_server, tmp_path, monkeypatch):
+    stub_server.files['data.json'] = json.dumps(manifest(stub_server)).encode()
+    url = f'{stub_server.url}/files/data.json'
+    cache = ResourceCache(directory=str(tmp_path))
+    assert len(SitesInformation(url, honor_exclusions=False, cache=cache)) == 2
+    (path,) = (tmp_path / 'snapshots').iterdir()
+
+    # Same source, so loaded from the snapshot without compiling
+    def fail(*args):
+        raise AssertionError('compiled again')
+    monkeypatch.setattr('sherlock_project.snapshot.compile_snapshot', fail)
+    assert len(SitesInformation(url, honor_exclusions=False, cache=cache)) == 2
+    monkeypatch.undo()
+
+    # Unreadable snapshots are compiled again
+    path.write_bytes(b'garbage')
+    assert len(SitesInformation(url, honor_exclusions=False, cache=cache)) == 2
+    assert snapshot.load_snapshot(str(path))['format'] == snapshot.SNAPSHOT_FORMAT
+
+
+def test_manifest_compile_cli(tmp_path):
+    output = tmp_path / 'data.snapshot'
+    assert 'Compiled' in Interactives.run_cli(
+        f'manifest compile --json {LOCAL_MANIFEST} --ignore-exclusions --no-cache -o {output}')
+    assert len(SitesInformation(str(output))) == len(SitesInformation(LOCAL_MANIFEST, honor_exclusions=False))
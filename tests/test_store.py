@@ -0,0 +1,64 @@
+import json
+import sys
+from sherlock_project import sherlock as sherlock_module
+from sherlock_project.result import QueryResult, QueryStatus
+from sherlock_project.store import QueryNotifyStore, query_store
+from conftest import stub_site
+
+
+def test_store_batches_and_replaces(tmp_path):
+    path = str(tmp_path / 'results.db')
+    store = QueryNotifyStore(path, batch_size=2, commit_interval=60)
+    store.update(QueryResult('blue', 'Site', 'u', QueryStatus.UNKNOWN, context='Timeout'))
+    # Waiting for its batch, but readable while the run goes on
+    assert list(query_store(path)) == []
+    store.update(QueryResult('red', 'Site', 'v', QueryStatus.AVAILABLE, http_status=404))
+    assert [row['username'] for row in query_store(path)] == ['blue', 'red']
+
+    store.update(QueryResult('blue', 'Site', 'u', QueryStatus.CLAIMED, query_time=0.5, http_status=200))
+    store.finish()
+
+    rows = list(query_store(path, sites=['SITE'], statuses=[QueryStatus.CLAIMED]))
+    assert len(rows) == 1
+    assert rows[0]['username'] == 'blue'
+    assert (rows[0]['http_status'], rows[0]['query_time'], rows[0]['context']) == (200, 0.5, None)
+    assert [row['status'] for row in query_store(path, usernames=['red', 'green'])] == ['Available']
+
+
+def test_cli_store_and_query(stub_server, tmp_path, monkeypatch, capsys):
+    manifest = {'Status': stub_site(stub_server, 'status'), 'Message': stub_site(stub_server, 'message')}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    store = str(tmp_path / 'results.db')
+
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'blue', 'nobody', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--store', store,
+    ])
+    sherlock_module.main()
+    capsys.readouterr()
+
+    monkeypatch.setattr(sys, 'argv', ['sherlock', 'query', store, '--status', 'claimed'])
+    sherlock_module.main()
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split('\t')[:3] for line in lines] == [['blue', 'Message', 'Claimed'], ['blue', 'Status', 'Claimed']]
+
+    monkeypatch.setattr(sys, 'argv', ['sherlock', 'query', store, '-u', 'nobody', '--site', 'status', '--ndjson'])
+    sherlock_module.main()
+    record = json.loads(capsys.readouterr().out)
+    assert (record['site'], record['status']) == ('Status', 'Available')
+
+
+def test_cli_username_spelled_like_subcommand(stub_server, tmp_path, monkeypatch, capsys):
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps({'Status': stub_site(stub_server, 'status')}))
+    store = str(tmp_path / 'results.db')
+
+    # Searched for, rather than taken as subcommands, after "--"
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', '--json', str(path), '--ignore-exclusions', '--no-overlay',
+        '--no-update-check', '--store', store, '--', 'query', 'manifest',
+    ])
+    sherlock_module.main()
+    capsys.readouterr()
+    assert [row['username'] for row in query_store(store)] == ['manifest', 'query']
@@ -0,0 +1,68 @@
+import json
+import sys
+from sherlock_project import sherlock as sherlock_module
+from sherlock_project.sherlock import sherlock
+from sherlock_project.notify import QueryNotify
+from sherlock_project.result import QueryStatus
+from sherlock_project.sites import SitesInformation
+from sherlock_project.tuning import calibrate, fingerprint, load_overlay
+from conftest import stub_site
+
+
+def test_calibrate_picks_cheapest_probe(stub_server):
+    site_data = {
+        'Status': stub_site(stub_server, 'status'),
+        'Message': stub_site(stub_server, 'message'),
+        'Long': stub_site(stub_server, 'long'),
+        'Late': stub_site(stub_server, 'late'),
+        'Waf': stub_site(stub_server, 'waf'),
+        'Post': stub_site(stub_server, 'status', request_method='POST'),
+    }
+    overlay, failed = calibrate(site_data, timeout=5)
+    assert overlay['Status']['probe'] == 'HEAD'
+    # A short page is cheaper to get whole than with a Range header
+    assert overlay['Message']['probe'] == 'GET'
+    assert overlay['Long']['probe'] == 'RANGE'
+    assert overlay['Late']['probe'] == 'GET'
+    assert overlay['Long']['fingerprint'] == fingerprint(site_data['Long'])
+    assert failed == ['Waf']
+    assert 'Post' not in overlay
+
+
+def test_overlay_is_honoured(stub_server, tmp_path):
+    manifest = {
+        'Message': stub_site(stub_server, 'message'),
+        'Late': stub_site(stub_server, 'late'),
+    }
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    sites = SitesInformation(str(path), honor_exclusions=False)
+    overlay = {
+        'Message': {'probe': 'RANGE', 'rangeBytes': 100, 'fingerprint': fingerprint(manifest['Message'])},
+        # Calibrated for another version of the site data
+        'Late': {'probe': 'RANGE', 'rangeBytes': 100, 'fingerprint': 'stale'},
+        'Gone': {'probe': 'HEAD', 'fingerprint': 'stale'},
+    }
+    assert sites.apply_overlay(overlay) == 1
+
+    results = sherlock('blue', sites.select(), QueryNotify())
+    assert results['Message'].status is QueryStatus.CLAIMED
+    assert results['Message'].http_status == 206
+    ranges = {path.split('/')[1]: headers.get('Range') for _, path, headers in stub_server.seen}
+    assert ranges == {'message': 'bytes=0-99', 'late': None}
+
+
+def test_calibrate_command(stub_server, tmp_path, monkeypatch, capsys):
+    manifest = {'Long': stub_site(stub_server, 'long'), 'Status': stub_site(stub_server, 'status')}
+    path = tmp_path / 'data.json'
+    path.write_text(json.dumps(manifest))
+    output = tmp_path / 'overlay.json'
+    output.write_text(json.dumps({'Other': {'probe': 'HEAD', 'fingerprint': 'x'}}))
+
+    monkeypatch.setattr(sys, 'argv', [
+        'sherlock', 'manifest', 'calibrate', '--json', str(path), '--site', 'long',
+        '--output', str(output), '--no-cache',
+    ])
+    sherlock_module.main()
+    assert "Calibrated 1 sites (1 RANGE)" in capsys.readouterr().out
+    assert set(load_overlay(str(output))) == {'Long', 'Other'}
@@ -1,6 +1,9 @@
+import json
 import os
 from sherlock_interactives import Interactives
 import sherlock_project
+from sherlock_project import sherlock
+from sherlock_project.cache import ResourceCache
 
 def test_versioning() -> None:
     # Ensure __version__ matches version presented to the user
@@ -14,3 +17,16 @@ def test_versioning() -> None:
     ]
     # Sorting is REQUIRED for Mac
     assert sorted(found) == sorted(expected)
+
+
+def test_update_check_is_cached(stub_server, tmp_path, monkeypatch):
+    stub_server.files['latest'] = json.dumps({'tag_name': 'v99.0.0', 'html_url': 'https://example.com'}).encode()
+    monkeypatch.setattr(sherlock, 'forge_api_latest_release', f'{stub_server.url}/files/latest')
+    cache = ResourceCache(directory=str(tmp_path), max_age=24 * 60 * 60)
+    assert sherlock.start_update_check(cache).result(timeout=10).startswith(
+        f"Update available! {sherlock_project.__version__} --> 99.0.0")
+    stub_server.files['latest'] = json.dumps({'tag_name': sherlock_project.__version__}).encode()
+    # Looked up once a day only
+    assert sherlock.check_for_update(cache) is not None
+    assert len([path for _, path, _ in stub_server.seen if path == '/files/latest']) == 1
+    assert sherlock.check_for_update(ResourceCache(directory=str(tmp_path), max_age=0, stale_while_revalidate=0)) is None